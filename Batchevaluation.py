@@ -0,0 +1,48 @@
+"""NumPy encoding and evaluation of many positions at once, e.g. to feed training pipelines or score a batch of leaf positions.
+
+A batch of N positions becomes an array of shape (N,12,8,8): planes[n,piece,row,column] is 1 if ChessPositions[n]
+has the piece (indexed by ChessPieces.value-1) on that square. The bitboards are unpacked bytewise by NumPy,
+so the only Python work per position is reading its twelve integers.
+"""
+import numpy as np
+import Chessposition
+
+def pieceboards(Positions) -> np.ndarray:
+    """Returns: The bitboards of the positions as an (N,12) array of uint64."""
+    return np.array([Position.Pieceboards for Position in Positions],dtype=np.uint64).reshape(-1,12)
+
+def encode(Positions) -> np.ndarray:
+    """Returns: The (N,12,8,8) uint8 piece planes of the positions."""
+    return encode_pieceboards(pieceboards(Positions))
+
+def encode_pieceboards(boards: np.ndarray) -> np.ndarray:
+    """Returns: The (N,12,8,8) uint8 piece planes of an (N,12) array of bitboards, e.g. read from Selfplay shards."""
+    #Bit i of a little endian uint64 is bit i%8 of byte i//8, so unpacking with little bitorder gives square i at index i
+    bits=np.unpackbits(np.ascontiguousarray(boards,dtype="<u8").view(np.uint8),bitorder="little")
+    return bits.reshape(-1,12,8,8)
+
+def encode_state(Positions) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+    """Returns: Side to move (N,) bool, castling rights (N,4) bool indexed like Castlingrights
+    and en-passant file (N,) int8 with -1 where there is none."""
+    whitesmove=np.array([Position.whitesmove for Position in Positions],dtype=bool)
+    castling=np.array([Position.Castlingrights for Position in Positions],dtype=bool).reshape(-1,4)
+    enpassant=np.array([-1 if Position.enpassantablefile is None else Position.enpassantablefile for Position in Positions],dtype=np.int8)
+    return whitesmove,castling,enpassant
+
+def material(planes: np.ndarray) -> np.ndarray:
+    """Returns: eval_by_material of every encoded position, shape (N,)."""
+    counts=planes.reshape(len(planes),12,64).sum(axis=2,dtype=np.int64)
+    return counts@np.array(Chessposition.POINTVALUES,dtype=np.float64)
+
+def placement(planes: np.ndarray) -> np.ndarray:
+    """Returns: eval_by_placement of every encoded position, shape (N,), using the current piece-square tables."""
+    tables=np.array(Chessposition.PLACEMENTVALUES,dtype=np.float64)
+    return np.einsum("npi,pi->n",planes.reshape(len(planes),12,64),tables)
+
+def evaluate(planes: np.ndarray) -> np.ndarray:
+    """Returns: eval_without_depth of every encoded position, shape (N,)."""
+    return material(planes)+placement(planes)
+
+def evaluate_positions(Positions) -> np.ndarray:
+    """Returns: eval_without_depth of every position, from white's point of view."""
+    return evaluate(encode(Positions))
@@ -0,0 +1,356 @@
+"""Bitboard move generation.
+
+Squares are numbered row*8+column, so bit 0 is Board[0][0] (a1) and bit 63 is Board[7][7] (h8).
+A position is described by twelve piece sets indexed like ChessPieces.value-1:
+0-5 are the white pawn, rook, knight, bishop, queen and king, 6-11 the black ones.
+"""
+
+PAWN=0
+ROOK=1
+KNIGHT=2
+BISHOP=3
+QUEEN=4
+KING=5
+WHITE=0
+BLACK=6
+
+FULL=(1<<64)-1
+FILE_A=0x0101010101010101
+FILE_H=FILE_A<<7
+RANK_1=0xFF
+RANK_3=RANK_1<<16
+RANK_6=RANK_1<<40
+RANK_8=RANK_1<<56
+
+def square(row: int, column: int) -> int:
+    return row*8+column
+
+def squares(bitboard: int):
+    """Yields: the index of every set bit, lowest first."""
+    while bitboard:
+        lowest=bitboard&-bitboard
+        yield lowest.bit_length()-1
+        bitboard^=lowest
+
+def _leaper_attacks(offsets: list[tuple[int,int]]) -> list[int]:
+    attacks=[]
+    for sq in range(64):
+        row,column=divmod(sq,8)
+        bitboard=0
+        for rowstep,columnstep in offsets:
+            if 0<=row+rowstep<8 and 0<=column+columnstep<8:
+                bitboard|=1<<square(row+rowstep,column+columnstep)
+        attacks.append(bitboard)
+    return attacks
+
+KNIGHT_ATTACKS=_leaper_attacks([(2,1),(1,2),(-1,2),(-2,1),(-2,-1),(-1,-2),(1,-2),(2,-1)])
+KING_ATTACKS=_leaper_attacks([(i,j) for i in (-1,0,1) for j in (-1,0,1) if (i,j)!=(0,0)])
+#PAWN_ATTACKS[True] are the squares a white pawn attacks, PAWN_ATTACKS[False] those of a black pawn
+PAWN_ATTACKS=[_leaper_attacks([(-1,-1),(-1,1)]),_leaper_attacks([(1,-1),(1,1)])]
+
+#Directions in which the square index grows come first
+STRAIGHT_DIRECTIONS=[(1,0),(0,1),(-1,0),(0,-1)]
+DIAGONAL_DIRECTIONS=[(1,1),(1,-1),(-1,-1),(-1,1)]
+
+def _rays(direction: tuple[int,int]) -> list[int]:
+    rays=[]
+    for sq in range(64):
+        row,column=divmod(sq,8)
+        bitboard=0
+        row+=direction[0]
+        column+=direction[1]
+        while 0<=row<8 and 0<=column<8:
+            bitboard|=1<<square(row,column)
+            row+=direction[0]
+            column+=direction[1]
+        rays.append(bitboard)
+    return rays
+
+STRAIGHT_RAYS=[_rays(direction) for direction in STRAIGHT_DIRECTIONS]
+DIAGONAL_RAYS=[_rays(direction) for direction in DIAGONAL_DIRECTIONS]
+
+def _slider_attacks(sq: int, occupied: int, rays: list[list[int]]) -> int:
+    attacks=0
+    for i in range(2):
+        ray=rays[i][sq]
+        blockers=ray&occupied
+        if blockers:
+            ray^=rays[i][(blockers&-blockers).bit_length()-1]
+        attacks|=ray
+    for i in range(2,4):
+        ray=rays[i][sq]
+        blockers=ray&occupied
+        if blockers:
+            ray^=rays[i][blockers.bit_length()-1]
+        attacks|=ray
+    return attacks
+
+def _between() -> list[list[int]]:
+    between=[[0]*64 for sq in range(64)]
+    for sq in range(64):
+        for rays in (STRAIGHT_RAYS,DIAGONAL_RAYS):
+            for ray in rays:
+                for target in squares(ray[sq]):
+                    between[sq][target]=ray[sq]^ray[target]^(1<<target)
+    return between
+
+#BETWEEN[a][b] are the squares strictly between two squares on a common line, 0 if there is none
+BETWEEN=_between()
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    return _slider_attacks(sq,occupied,STRAIGHT_RAYS)
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    return _slider_attacks(sq,occupied,DIAGONAL_RAYS)
+
+def queen_attacks(sq: int, occupied: int) -> int:
+    return _slider_attacks(sq,occupied,STRAIGHT_RAYS)|_slider_attacks(sq,occupied,DIAGONAL_RAYS)
+
+def from_mailbox(Board: list[list]) -> list[int]:
+    """Returns: the twelve piece sets of a Board of ChessPieces (or None)."""
+    Pieceboards=[0]*12
+    for row in range(8):
+        for column in range(8):
+            piece=Board[row][column]
+            if piece is not None:
+                Pieceboards[piece.value-1]|=1<<square(row,column)
+    return Pieceboards
+
+def occupancy(Pieceboards: list[int], white: bool) -> int:
+    offset=WHITE if white else BLACK
+    return Pieceboards[offset]|Pieceboards[offset+1]|Pieceboards[offset+2]|Pieceboards[offset+3]|Pieceboards[offset+4]|Pieceboards[offset+5]
+
+def attack_map(Pieceboards: list[int], white: bool, occupied: int) -> int:
+    """Returns: every square attacked by the pieces of one colour."""
+    offset=WHITE if white else BLACK
+    pawns=Pieceboards[offset+PAWN]
+    if white:
+        attacks=(((pawns&~FILE_A)<<7)|((pawns&~FILE_H)<<9))&FULL
+    else:
+        attacks=((pawns&~FILE_A)>>9)|((pawns&~FILE_H)>>7)
+    for sq in squares(Pieceboards[offset+KNIGHT]):
+        attacks|=KNIGHT_ATTACKS[sq]
+    for sq in squares(Pieceboards[offset+BISHOP]|Pieceboards[offset+QUEEN]):
+        attacks|=bishop_attacks(sq,occupied)
+    for sq in squares(Pieceboards[offset+ROOK]|Pieceboards[offset+QUEEN]):
+        attacks|=rook_attacks(sq,occupied)
+    for sq in squares(Pieceboards[offset+KING]):
+        attacks|=KING_ATTACKS[sq]
+    return attacks
+
+def square_attacked_by(sq: int, white: bool, Pieceboards: list[int], occupied: int) -> bool:
+    """Returns: Whether a piece of the given colour attacks the square.
+
+    Looks outward from the square: a knight a knight's jump away, a pawn or king next to it or a slider at the end of a ray."""
+    offset=WHITE if white else BLACK
+    if KNIGHT_ATTACKS[sq]&Pieceboards[offset+KNIGHT]:
+        return True
+    if PAWN_ATTACKS[not white][sq]&Pieceboards[offset+PAWN]:
+        return True
+    if KING_ATTACKS[sq]&Pieceboards[offset+KING]:
+        return True
+    queens=Pieceboards[offset+QUEEN]
+    straight=Pieceboards[offset+ROOK]|queens
+    if straight and rook_attacks(sq,occupied)&straight:
+        return True
+    diagonal=Pieceboards[offset+BISHOP]|queens
+    return bool(diagonal and bishop_attacks(sq,occupied)&diagonal)
+
+def attackers_of(sq: int, white: bool, Pieceboards: list[int], occupied: int) -> int:
+    """Returns: The pieces of the given colour attacking the square."""
+    offset=WHITE if white else BLACK
+    queens=Pieceboards[offset+QUEEN]
+    return ((KNIGHT_ATTACKS[sq]&Pieceboards[offset+KNIGHT])|(PAWN_ATTACKS[not white][sq]&Pieceboards[offset+PAWN])
+            |(KING_ATTACKS[sq]&Pieceboards[offset+KING])|(rook_attacks(sq,occupied)&(Pieceboards[offset+ROOK]|queens))
+            |(bishop_attacks(sq,occupied)&(Pieceboards[offset+BISHOP]|queens)))
+
+def pins(kingsquare: int, white: bool, Pieceboards: list[int], occupied: int) -> dict[int,int]:
+    """Returns: The pieces of the given colour pinned to their king, each with the squares it may still move to:
+    the line between the king and the pinning piece, including the pinning piece."""
+    offset=BLACK if white else WHITE
+    queens=Pieceboards[offset+QUEEN]
+    snipers=(rook_attacks(kingsquare,0)&(Pieceboards[offset+ROOK]|queens))|(bishop_attacks(kingsquare,0)&(Pieceboards[offset+BISHOP]|queens))
+    own=occupancy(Pieceboards,white)
+    pinned={}
+    for sniper in squares(snipers):
+        line=BETWEEN[kingsquare][sniper]
+        blockers=line&occupied
+        if blockers and not blockers&(blockers-1) and blockers&own:
+            pinned[blockers.bit_length()-1]=line|(1<<sniper)
+    return pinned
+
+def legal_moves(Pieceboards: list[int], whitesmove: bool, enpassantablefile: int|None, Castlingrights: list[bool], noisy: bool=False,
+                rejected: list[int]|None=None) -> list[tuple[int,int]]:
+    """Returns: (startsquare, endsquare) of every legal move of the side to move, with noisy only of its captures and promotions.
+    Given a one-element list rejected, adds the number of pseudo-legal moves that turned out illegal to it."""
+    return list(iter_legal_moves(Pieceboards,whitesmove,enpassantablefile,Castlingrights,noisy,rejected))
+
+def iter_legal_moves(Pieceboards: list[int], whitesmove: bool, enpassantablefile: int|None, Castlingrights: list[bool], noisy: bool=False,
+                     rejected: list[int]|None=None):
+    """Yields: (startsquare, endsquare) of the legal moves like legal_moves, each one as soon as it has been checked,
+    so a caller that stops early doesn't check the rest. rejected only counts the pseudo-legal moves checked until then.
+
+    The pieces giving check and the pinned pieces are found once, then every pseudo-legal move is checked against them:
+    in double check only the king moves, in single check other pieces have to capture the checker or block,
+    pinned pieces stay on their line and the king doesn't step onto attacked squares.
+    En passant, which removes two pieces from a line at once, gets an exact check."""
+    offset=WHITE if whitesmove else BLACK
+    king=Pieceboards[offset+KING]
+    kingsquare=king.bit_length()-1
+    occupied=occupancy(Pieceboards,True)|occupancy(Pieceboards,False)
+    checkers=attackers_of(kingsquare,not whitesmove,Pieceboards,occupied)
+    if noisy:
+        candidates=noisy_moves(Pieceboards,whitesmove,enpassantablefile)
+    else:
+        candidates=pseudolegal_moves(Pieceboards,whitesmove,enpassantablefile,Castlingrights,include_castling=not checkers)
+    if checkers&(checkers-1):
+        for start,end in candidates:
+            if start==kingsquare and not square_attacked_by(end,not whitesmove,Pieceboards,occupied^king):
+                yield start,end
+            elif rejected is not None:
+                rejected[0]+=1
+        return
+    if checkers:
+        checker=checkers.bit_length()-1
+        allowed=checkers|BETWEEN[kingsquare][checker]
+    else:
+        allowed=FULL
+    pinned=pins(kingsquare,whitesmove,Pieceboards,occupied)
+    pawns=Pieceboards[offset+PAWN]
+    enpassantsquare=-1 if enpassantablefile is None else square(5 if whitesmove else 2,enpassantablefile)
+    for start,end in candidates:
+        if start==kingsquare:
+            #Castling moves come checked already
+            legal=abs(end-start)==2 or not square_attacked_by(end,not whitesmove,Pieceboards,occupied^king)
+        elif end==enpassantsquare and pawns>>start&1:
+            legal=_enpassant_is_legal(Pieceboards,whitesmove,start,end,kingsquare,occupied)
+        else:
+            legal=allowed>>end&1 and (start not in pinned or pinned[start]>>end&1)
+        if legal:
+            yield start,end
+        elif rejected is not None:
+            rejected[0]+=1
+
+def _enpassant_is_legal(Pieceboards: list[int], whitesmove: bool, start: int, end: int, kingsquare: int, occupied: int) -> bool:
+    captured=end-8 if whitesmove else end+8
+    occupied^=(1<<start)|(1<<end)|(1<<captured)
+    offset=BLACK if whitesmove else WHITE
+    queens=Pieceboards[offset+QUEEN]
+    if rook_attacks(kingsquare,occupied)&(Pieceboards[offset+ROOK]|queens) or bishop_attacks(kingsquare,occupied)&(Pieceboards[offset+BISHOP]|queens):
+        return False
+    return not (KNIGHT_ATTACKS[kingsquare]&Pieceboards[offset+KNIGHT] or PAWN_ATTACKS[whitesmove][kingsquare]&Pieceboards[offset+PAWN]&~(1<<captured))
+
+def _add_pawn_moves(moves: list[tuple[int,int]], targets: int, step: int) -> None:
+    for to in squares(targets):
+        moves.append((to-step,to))
+
+def _add_piece_moves(moves: list[tuple[int,int]], start: int, targets: int) -> None:
+    for to in squares(targets):
+        moves.append((start,to))
+
+def pseudolegal_moves(Pieceboards: list[int], whitesmove: bool, enpassantablefile: int|None, Castlingrights: list[bool], include_castling: bool=True) -> list[tuple[int,int]]:
+    """Returns: (startsquare, endsquare) of every move of the side to move. Moves might leave the own king hanging.
+
+    Castlingrights is indexed like Castling values: 1 for white and 2 for the queenside are added up."""
+    offset=WHITE if whitesmove else BLACK
+    own=occupancy(Pieceboards,whitesmove)
+    opponent=occupancy(Pieceboards,not whitesmove)
+    occupied=own|opponent
+    empty=~occupied&FULL
+    moves: list[tuple[int,int]]=[]
+
+    #Pawns
+    pawns=Pieceboards[offset+PAWN]
+    if whitesmove:
+        single=(pawns<<8)&empty
+        _add_pawn_moves(moves,single,8)
+        _add_pawn_moves(moves,((single&RANK_3)<<8)&empty,16)
+        _add_pawn_moves(moves,((pawns&~FILE_A)<<7)&opponent,7)
+        _add_pawn_moves(moves,((pawns&~FILE_H)<<9)&opponent,9)
+    else:
+        single=(pawns>>8)&empty
+        _add_pawn_moves(moves,single,-8)
+        _add_pawn_moves(moves,((single&RANK_6)>>8)&empty,-16)
+        _add_pawn_moves(moves,((pawns&~FILE_A)>>9)&opponent,-9)
+        _add_pawn_moves(moves,((pawns&~FILE_H)>>7)&opponent,-7)
+    if enpassantablefile is not None:
+        target=square(5 if whitesmove else 2,enpassantablefile)
+        if empty>>target&1:
+            for start in squares(PAWN_ATTACKS[not whitesmove][target]&pawns):
+                moves.append((start,target))
+
+    #Pieces
+    notown=~own&FULL
+    for start in squares(Pieceboards[offset+KNIGHT]):
+        _add_piece_moves(moves,start,KNIGHT_ATTACKS[start]&notown)
+    for start in squares(Pieceboards[offset+BISHOP]):
+        _add_piece_moves(moves,start,bishop_attacks(start,occupied)&notown)
+    for start in squares(Pieceboards[offset+ROOK]):
+        _add_piece_moves(moves,start,rook_attacks(start,occupied)&notown)
+    for start in squares(Pieceboards[offset+QUEEN]):
+        _add_piece_moves(moves,start,queen_attacks(start,occupied)&notown)
+    for start in squares(Pieceboards[offset+KING]):
+        _add_piece_moves(moves,start,KING_ATTACKS[start]&notown)
+        if include_castling:
+            moves+=castling_moves(Pieceboards,whitesmove,Castlingrights,start,occupied)
+    return moves
+
+def noisy_moves(Pieceboards: list[int], whitesmove: bool, enpassantablefile: int|None) -> list[tuple[int,int]]:
+    """Returns: (startsquare, endsquare) of the captures, en passant included, and the promotions of the side to move,
+    as pseudolegal_moves would give them. Quiescence search only needs these, so the quiet moves aren't generated at all."""
+    offset=WHITE if whitesmove else BLACK
+    own=occupancy(Pieceboards,whitesmove)
+    opponent=occupancy(Pieceboards,not whitesmove)
+    occupied=own|opponent
+    moves: list[tuple[int,int]]=[]
+
+    #Pawns
+    pawns=Pieceboards[offset+PAWN]
+    if whitesmove:
+        _add_pawn_moves(moves,(pawns<<8)&~occupied&RANK_8,8)
+        _add_pawn_moves(moves,((pawns&~FILE_A)<<7)&opponent,7)
+        _add_pawn_moves(moves,((pawns&~FILE_H)<<9)&opponent,9)
+    else:
+        _add_pawn_moves(moves,(pawns>>8)&~occupied&RANK_1,-8)
+        _add_pawn_moves(moves,((pawns&~FILE_A)>>9)&opponent,-9)
+        _add_pawn_moves(moves,((pawns&~FILE_H)>>7)&opponent,-7)
+    if enpassantablefile is not None:
+        target=square(5 if whitesmove else 2,enpassantablefile)
+        if not occupied>>target&1:
+            for start in squares(PAWN_ATTACKS[not whitesmove][target]&pawns):
+                moves.append((start,target))
+
+    #Pieces
+    for start in squares(Pieceboards[offset+KNIGHT]):
+        _add_piece_moves(moves,start,KNIGHT_ATTACKS[start]&opponent)
+    for start in squares(Pieceboards[offset+BISHOP]):
+        _add_piece_moves(moves,start,bishop_attacks(start,occupied)&opponent)
+    for start in squares(Pieceboards[offset+ROOK]):
+        _add_piece_moves(moves,start,rook_attacks(start,occupied)&opponent)
+    for start in squares(Pieceboards[offset+QUEEN]):
+        _add_piece_moves(moves,start,queen_attacks(start,occupied)&opponent)
+    for start in squares(Pieceboards[offset+KING]):
+        _add_piece_moves(moves,start,KING_ATTACKS[start]&opponent)
+    return moves
+
+def castling_moves(Pieceboards: list[int], whitesmove: bool, Castlingrights: list[bool], kingsquare: int, occupied: int) -> list[tuple[int,int]]:
+    """Returns: the castling king moves that are legal, i.e. the king neither starts on, passes nor lands on an attacked square."""
+    row=0 if whitesmove else 7
+    if kingsquare!=square(row,4):
+        return []
+    rooks=Pieceboards[(WHITE if whitesmove else BLACK)+ROOK]
+    candidates=[]#(squares that have to be empty, squares the king crosses, rook square, king target)
+    if Castlingrights[int(whitesmove)]:
+        candidates.append(([square(row,5),square(row,6)],[square(row,5),square(row,6)],square(row,7),square(row,6)))
+    if Castlingrights[2+int(whitesmove)]:
+        candidates.append(([square(row,1),square(row,2),square(row,3)],[square(row,3),square(row,2)],square(row,0),square(row,2)))
+    moves=[]
+    for emptysquares,kingpath,rooksquare,target in candidates:
+        if not rooks>>rooksquare&1:
+            continue
+        if any(occupied>>sq&1 for sq in emptysquares):
+            continue
+        if any(square_attacked_by(sq,not whitesmove,Pieceboards,occupied) for sq in [kingsquare]+kingpath):
+            continue
+        moves.append((kingsquare,target))
+    return moves
@@ -1,10 +1,11 @@
 from enum import Enum, Flag
-from tabulate import tabulate
-from LegalPieceMoves import *
+import Bitboards
+import Zobrist
+from Transpositiontable import TranspositionTable
+from Search import Search, SearchResult, value_from_table
 import random
 from time import sleep
-from copy import deepcopy
-import math
+from typing import NamedTuple
 
 
 class ChessPieces(Enum):
@@ -100,6 +101,32 @@ class ChessPieces(Enum):
     def castlingcolour(self)->"Castling":
         return Castling.White if self.is_white() else Castling(0)
     
+#pointvalue_in_game of every piece type, indexed by ChessPieces.value-1
+POINTVALUES=[piece.pointvalue_in_game() for piece in ChessPieces]
+
+def _distance_from_centre_table() -> list[float]:
+    return [(abs(3.5-row)+abs(3.5-col))/1000 for row in range(8) for col in range(8)]
+
+#Bonus of a white piece of each type on each square (indexed row*8+col), from white's point of view.
+#Black pieces use the table mirrored vertically with the sign flipped. Change them with set_piece_square_table.
+PIECESQUARETABLES: dict[ChessPieces,list[float]]={piece: _distance_from_centre_table() for piece in ChessPieces if piece.is_white()}
+#PLACEMENTVALUES[ChessPieces.value-1][square] is what a piece on a square adds to eval_by_placement
+PLACEMENTVALUES: list[list[float]]=[]
+
+def _fill_placementvalues() -> None:
+    PLACEMENTVALUES[:]=[PIECESQUARETABLES[piece] if piece.is_white() else [-PIECESQUARETABLES[piece.invertcolor()][sq^56] for sq in range(64)] for piece in ChessPieces]
+
+def set_piece_square_table(piece: ChessPieces, table: list[float]) -> None:
+    """Sets the placement bonus of a piece type on each of the 64 squares (indexed row*8+col, seen from white).
+
+    Positions created before keep their running Placement until recompute_evaluation is called."""
+    if len(table)!=64:
+        raise ValueError("A piece-square table needs a value for each of the 64 squares")
+    PIECESQUARETABLES[piece.white_version_of_self()]=list(table)
+    _fill_placementvalues()
+
+_fill_placementvalues()
+
 class Castling(Flag):
     White=1
     Queenside=2
@@ -127,9 +154,8 @@ class Castling(Flag):
         for col in range(4+increment,rookcol,increment):
             if Position.Board[row][col] is not None:
                 return False
-            if Position.square_attacked(row,col):
-                return False
-        return not Position.square_attacked(row,4)
+        #The king may not start on, pass or land on an attacked square, the rook may pass one
+        return not any(Position.square_attacked(row,col) for col in range(4,self.final_king_col()+increment,increment))
     
     def squares(self)->tuple[tuple[int,int],tuple[int,int]]:
         """Returns: (Startrow,Startcolumn),(Endrow,endcolumn) of king"""
@@ -141,6 +167,9 @@ class Castling(Flag):
     def final_king_col(self):
         return 2 if Castling.Queenside in self else 6
 
+def squarename(row: int, col: int) -> str:
+    return "abcdefgh"[col]+str(row+1)
+
 def castlingcolor(white:bool)->Castling:
     return Castling.White if white else Castling(0)
 
@@ -152,31 +181,88 @@ def enumCastling():
         for j in [Castling(0),Castling.White]:
             yield i|j
 
-def legalkingmoves(row: int, column: int, Board: list[list], castlingrights:list[bool],castlingcolour: Castling)-> list[tuple[int,int]]:
-    castlingmoves=[]
-    if castlingrights[(Castling.Queenside|castlingcolour).value] and all(Board[row][i] is None for i in [1,2,3]):
-        castlingmoves.append((row,2))
-    if castlingrights[castlingcolour.value] and all(Board[row][i] is None for i in [5,6]):
-        castlingmoves.append((row,6))
-    ammounts=[-1,0,1]
-    theoreticalmoves=[(leftstep,rightstep) for leftstep in ammounts for rightstep in ammounts if (leftstep,rightstep)!=(0,0)]
-    return [(row+i,column+j) for (i,j) in theoreticalmoves if (0<=row+i<8 and 0<=column+j<8)]+castlingmoves
-
-def eval_by_randomgames(Position: "ChessPosition", numberofgames: int=100) -> float:
-    score=0
-    #Play random games and figure out and calculate average result.
-    for i in range(numberofgames):
-        Game=Position
-        while (moves:=Game.possibleMoves())!=[]:
-            Game=random.choice(moves)
-        gamevalue=1 if Game.whitesmove else -1
-        gamevalue*=0 if Game.reachablesquares()==[] or Game.only_kings_on_board() else 1
-        score+=gamevalue
-        print(gamevalue)
-    return score/numberofgames 
+class MoveFlags(Flag):
+    Capture=1
+    EnPassant=2
+    Castling=4
+    DoublePawnPush=8
+    Promotion=16
+
+NOFLAGS=MoveFlags(0)
+CAPTURE=MoveFlags.Capture
+ENPASSANT=MoveFlags.Capture|MoveFlags.EnPassant
+NOISY=MoveFlags.Capture|MoveFlags.Promotion
+
+class Move(NamedTuple):
+    startrow: int
+    startcol: int
+    endrow: int
+    endcol: int
+    promotion: ChessPieces|None=None
+    flags: MoveFlags=NOFLAGS#Filled in by legal_moves, make_move doesn't need them
+
+    #Moves are the same if they go from and to the same squares with the same promotion, whether flags are filled in or not
+    def __eq__(self, other) -> bool:
+        return isinstance(other,tuple) and self[:5]==other[:5]
+
+    def __ne__(self, other) -> bool:
+        return not self==other
+
+    def __hash__(self) -> int:
+        return hash(self[:5])
+
+    def is_noisy(self) -> bool:
+        """Returns: Whether the move captures or promotes, going by its flags."""
+        return bool(self.flags&NOISY)
+
+    def __str__(self) -> str:
+        """Returns: The move in coordinate notation, e.g. e2e4 or e7e8q."""
+        promotion="" if self.promotion is None else "qrbn"[[ChessPieces.WhiteQueen,ChessPieces.WhiteRook,ChessPieces.WhiteBishop,ChessPieces.WhiteKnight].index(self.promotion.white_version_of_self())]
+        return f"{squarename(self.startrow,self.startcol)}{squarename(self.endrow,self.endcol)}{promotion}"
+
+class Undo(NamedTuple):
+    """Everything unmake_move needs to take back a move made with make_move."""
+    move: Move
+    movedpiece: ChessPieces
+    capturedpiece: ChessPieces|None
+    enpassant: bool
+    enpassantablefile: int|None
+    Castlingrights: list[bool]
+    promotion: ChessPieces|None
+    Zobristkey: int
+    Material: float
+    Placement: float
+    Halfmoveclock: int
+
+PROMOTIONPIECES={True: [ChessPieces.WhiteQueen,ChessPieces.WhiteRook,ChessPieces.WhiteBishop,ChessPieces.WhiteKnight],
+                 False: [ChessPieces.BlackQueen,ChessPieces.BlackRook,ChessPieces.BlackBishop,ChessPieces.BlackKnight]}
+
+#Index into Castlingrights that is lost once something moves from or to a corner
+CORNERCASTLINGRIGHTS={(0,0): (Castling.White|Castling.Queenside).value,(0,7): Castling.White.value,
+                      (7,0): Castling.Queenside.value,(7,7): Castling(0).value}
+
+FENPIECES={symbol: piece for piece,symbol in zip(ChessPieces,"PRNBQKprnbqk")}
+#FEN castling symbol of each entry of Castlingrights
+FENCASTLING="kKqQ"
+#Size of to_packed: occupied squares, a nibble for each of at most 32 pieces, side to move with castling rights and en-passant file
+PACKEDBYTES=26
+
+def eval_by_randomgames(Position: "ChessPosition", numberofgames: int=100, workers: int|None=1, maxplies: int|None=None, seed: int|None=None) -> float:
+    """Returns: Average result of random games from the position, from white's point of view. See Playouts.playouts (maxplies defaults to Playouts.MAXPLIES)."""
+    import Playouts#Brings in the process pool machinery, which only the random games need
+    return Playouts.playouts(Position,numberofgames,workers,Playouts.MAXPLIES if maxplies is None else maxplies,seed).mean
+
+def new_search(depth0method, table: TranspositionTable|None=None, alphabeta: bool=True, quiescence: bool=True, tablebase=None, stats=None) -> Search:
+    """Returns: A Search, or given a Searchstats.SearchStats an InstrumentedSearch that counts and times into it."""
+    if stats is None:
+        return Search(depth0method,table,alphabeta,quiescence,tablebase)
+    from Searchstats import InstrumentedSearch#Only instrumented searches pay for the timing
+    return InstrumentedSearch(depth0method,table,alphabeta,quiescence,tablebase,stats)
 
 class ChessPosition():
-    def __init__(self, Board: list[list[ChessPieces|None]]|None=None,whitesmove: bool= True,enpassantablefile: int|None=None, Castlingright: list[bool]=[True]*4):
+    __slots__=("Board","whitesmove","enpassantablefile","Castlingrights","Pieceboards","Zobristkey","Material","Placement","Halfmoveclock","History")
+
+    def __init__(self, Board: list[list[ChessPieces|None]]|None=None,whitesmove: bool= True,enpassantablefile: int|None=None, Castlingright: list[bool]=[True]*4, Pieceboards: list[int]|None=None, Zobristkey: int|None=None, Halfmoveclock: int=0):
         if Board == None:
             Board = [[None]*8 for Row in range(8)]
             Board[0] = [ChessPieces.WhiteRook,ChessPieces.WhiteKnight,ChessPieces.WhiteBishop,ChessPieces.WhiteQueen,ChessPieces.WhiteKing,ChessPieces.WhiteBishop,ChessPieces.WhiteKnight,ChessPieces.WhiteRook]
@@ -187,20 +273,130 @@ class ChessPosition():
         self.whitesmove:bool = whitesmove
         self.enpassantablefile:int|None = enpassantablefile
         self.Castlingrights:list[bool] = Castlingright
+        #Bitboards of the twelve piece types, indexed by ChessPieces.value-1. Kept in sync with Board.
+        self.Pieceboards:list[int] = Bitboards.from_mailbox(Board) if Pieceboards is None else Pieceboards
+        #Updated incrementally by make_move
+        self.Zobristkey:int = Zobrist.hash_position(self.Pieceboards,whitesmove,enpassantablefile,Castlingright) if Zobristkey is None else Zobristkey
+        #Running eval_by_material and eval_by_placement, updated by make_move
+        self.Material:float = 0
+        self.Placement:float = 0
+        self.recompute_evaluation()
+        #Plies since the last capture or pawn move and the Zobristkeys of the positions before this one, oldest first.
+        #make_move appends to History and unmake_move pops, so a search shares one list along its path
+        self.Halfmoveclock:int = Halfmoveclock
+        self.History:list[int] = []
         """self.white_can_castle=white_can_castle
         self.white_can_castle_queenside=white_can_castle_queenside
         self.black_can_castle=black_can_castle
         self.black_can_castle_queenside=black_can_castle_queenside"""
         #print(f"Initalizing: {str(self)}")
+    @classmethod
+    def from_fen(cls, fen: str) -> "ChessPosition":
+        """Returns: The position described by a FEN string. The fullmove number is ignored."""
+        fields=fen.split()
+        if len(fields)<4:
+            raise ValueError(f"Not a FEN: {fen}")
+        rows=fields[0].split("/")
+        if len(rows)!=8:
+            raise ValueError(f"Not a FEN: {fen}")
+        Board:list[list[ChessPieces|None]]=[[None]*8 for Row in range(8)]
+        for rownumber,row in zip(range(7,-1,-1),rows):
+            col=0
+            for character in row:
+                if character.isdigit():
+                    col+=int(character)
+                elif character in FENPIECES and col<8:
+                    Board[rownumber][col]=FENPIECES[character]
+                    col+=1
+                else:
+                    raise ValueError(f"Not a FEN: {fen}")
+            if col!=8:
+                raise ValueError(f"Not a FEN: {fen}")
+        if fields[1] not in ["w","b"]:
+            raise ValueError(f"Not a FEN: {fen}")
+        Castlingrights=[symbol in fields[2] for symbol in FENCASTLING]
+        enpassantablefile=None if fields[3]=="-" else "abcdefgh".index(fields[3][0])
+        if len(fields)>4 and not fields[4].isdigit():
+            raise ValueError(f"Not a FEN: {fen}")
+        return cls(Board,fields[1]=="w",enpassantablefile,Castlingrights,Halfmoveclock=int(fields[4]) if len(fields)>4 else 0)
+
+    @classmethod
+    def from_pieceboards(cls, Pieceboards: list[int], whitesmove: bool=True, enpassantablefile: int|None=None, Castlingright: list[bool]=[True]*4) -> "ChessPosition":
+        """Returns: The position with the given twelve piece bitboards."""
+        Board:list[list[ChessPieces|None]]=[[None]*8 for Row in range(8)]
+        for piece in ChessPieces:
+            for sq in Bitboards.squares(Pieceboards[piece.value-1]):
+                Board[sq>>3][sq&7]=piece
+        return cls(Board,whitesmove,enpassantablefile,list(Castlingright),list(Pieceboards))
+
+    def to_fen(self, halfmoveclock: int|None=None, fullmovenumber: int=1) -> str:
+        """Returns: The FEN string of the position with the given move counters, by default its own Halfmoveclock."""
+        if halfmoveclock is None:
+            halfmoveclock=self.Halfmoveclock
+        rows=[]
+        for row in self.Board[::-1]:
+            fenrow=""
+            empty=0
+            for piece in row:
+                if piece is None:
+                    empty+=1
+                    continue
+                if empty:
+                    fenrow+=str(empty)
+                    empty=0
+                fenrow+="PRNBQKprnbqk"[piece.value-1]
+            rows.append(fenrow+(str(empty) if empty else ""))
+        castling="".join(symbol for symbol in "KQkq" if self.Castlingrights[FENCASTLING.index(symbol)]) or "-"
+        enpassant="-" if self.enpassantablefile is None else squarename(5 if self.whitesmove else 2,self.enpassantablefile)
+        return f"{'/'.join(rows)} {'w' if self.whitesmove else 'b'} {castling} {enpassant} {halfmoveclock} {fullmovenumber}"
+
+    def to_packed(self) -> bytes:
+        """Returns: The position in PACKEDBYTES bytes, for hashing, sending to other processes and storing many positions.
+
+        8 bytes of occupied squares, then the piece type (ChessPieces.value-1) of each occupied square from a1 on in 4 bits,
+        one byte with the side to move in bit 0 and Castlingrights in bits 1-4 and one byte with the en-passant file (8 for none)."""
+        occupied=0
+        for bitboard in self.Pieceboards:
+            occupied|=bitboard
+        if occupied.bit_count()>32:
+            raise ValueError("Positions with more than 32 pieces can't be packed")
+        Board=self.Board
+        pieces=0
+        for i,sq in enumerate(Bitboards.squares(occupied)):
+            pieces|=(Board[sq>>3][sq&7].value-1)<<(4*i)
+        flags=int(self.whitesmove)
+        for i,right in enumerate(self.Castlingrights):
+            flags|=int(right)<<(i+1)
+        return occupied.to_bytes(8,"little")+pieces.to_bytes(16,"little")+bytes([flags,8 if self.enpassantablefile is None else self.enpassantablefile])
+
+    @classmethod
+    def from_packed(cls, packed: bytes) -> "ChessPosition":
+        """Returns: The position that to_packed turned into packed."""
+        if len(packed)!=PACKEDBYTES:
+            raise ValueError(f"A packed position has {PACKEDBYTES} bytes, not {len(packed)}")
+        occupied=int.from_bytes(packed[:8],"little")
+        pieces=int.from_bytes(packed[8:24],"little")
+        Pieceboards=[0]*12
+        for i,sq in enumerate(Bitboards.squares(occupied)):
+            Pieceboards[(pieces>>(4*i))&15]|=1<<sq
+        flags=packed[24]
+        return cls.from_pieceboards(Pieceboards,bool(flags&1),None if packed[25]==8 else packed[25],[bool(flags>>(i+1)&1) for i in range(4)])
+
+    def __reduce__(self):
+        """Pickles (and deep-copies) as the packed position with the fifty-move clock and the keys repetitions are checked against."""
+        return (type(self).from_packed,(self.to_packed(),),(self.Halfmoveclock,self.History[max(0,len(self.History)-self.Halfmoveclock):]))
+
+    def __setstate__(self, state: tuple[int,list[int]]):
+        self.Halfmoveclock,History=state
+        self.History=list(History)
+
     def __str__(self):
+        from tabulate import tabulate#Only needed for printing, so engine processes don't pay for importing it
         return tabulate([["" if Piece is None else Piece.symbol() for Piece in row] for row in self.Board[::-1]],tablefmt="grid")
     
     def move_is_legal(self,startrow,startcol,endrow,endcol,allow_hanging_king=True):
         if not allow_hanging_king:
-            if not self.move_is_legal(startrow,startcol,endrow,endcol,True):
-                return False
-            return not self.applymove(startrow,startcol,endrow,endcol).can_take_king()
-            #raise NotImplementedError("move_is_legal can't yet determine wether a move hangs a king")
+            return any(move[:4]==(startrow,startcol,endrow,endcol) for move in self.legal_moves())
         #print(startrow,startcol,endrow,endcol)
         if (startrow,startcol)==(endrow,endcol):
             return False
@@ -249,7 +445,6 @@ class ChessPosition():
             if startrow!=endrow:
                 return False
             for i in enumCastling():
-                print(f"{i = }, {i.Castlinglegal(self) = }, {i.final_king_col() = }")
                 if i.Castlinglegal(self) and endcol==i.final_king_col():
                     return True
             return False
@@ -296,57 +491,132 @@ class ChessPosition():
         #-->Avoiding Check
         #-->Recognizing draw
     def new_pieces_possible_moves(self,row:int,col:int,allow_hanging_king:bool):
-        for endrow in range(8):
-            for endcol in range(8):
-                if self.move_is_legal(row,col,endrow,endcol,allow_hanging_king):
-                    yield endrow,endcol
+        """Yields: Every square the piece on (row, col) can move to."""
+        moves=self.pseudolegal_movelist() if allow_hanging_king else self.legalmovelist()
+        seen=set()
+        for move in moves:
+            if (move.startrow,move.startcol)==(row,col) and (move.endrow,move.endcol) not in seen:
+                seen.add((move.endrow,move.endcol))
+                yield move.endrow,move.endcol
 
-    def possibleMoves(self) -> list["ChessPosition"]:
+    def legalmovelist(self, rejected: list[int]|None=None) -> list[Move]:
+        """Returns: All legal moves of the player to move, one per promotion piece for pawns reaching the last row.
+        rejected counts the pseudo-legal moves thrown out, see Bitboards.legal_moves."""
+        return list(self.legal_moves(rejected))
+
+    def noisy_movelist(self, rejected: list[int]|None=None) -> list[Move]:
+        """Returns: The legal captures and promotions of the player to move, without generating any quiet move."""
         if self.only_kings_on_board():
             return []
-        ReachablePositions=[]
-        for rownumber in range(8):
-            for columnnumber in range(8):
-                piece_on_current_square=self.Board[rownumber][columnnumber]
-                #print(piece_on_current_square)
-                if piece_on_current_square!=None:
-                    if piece_on_current_square.is_white()==self.whitesmove:
-                        piecesmoves=self.piecessemilegalmoves(rownumber,columnnumber)
-                        resulting_positions=[self.applymove(rownumber,columnnumber,*move) for move in piecesmoves]
-                        ReachablePositions.extend([position for position in resulting_positions if not position.nonmovingPlayerinCheck()])
-        return ReachablePositions
+        return list(self._flagged_moves(Bitboards.iter_legal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights,True,rejected)))
+
+    def pseudolegal_movelist(self) -> list[Move]:
+        """Returns: The moves of the player to move with their flags, including those that leave the own king hanging."""
+        if self.only_kings_on_board():
+            return []
+        return list(self._flagged_moves(Bitboards.pseudolegal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights)))
+
+    def _flagged_moves(self, squarepairs):
+        """Yields: The Moves for (startsquare, endsquare) pairs as they come, one per promotion piece for pawns reaching the last row."""
+        Pieceboards=self.Pieceboards
+        offset=Bitboards.WHITE if self.whitesmove else Bitboards.BLACK
+        pawns=Pieceboards[offset+Bitboards.PAWN]
+        king=Pieceboards[offset+Bitboards.KING]
+        opponent=Bitboards.occupancy(Pieceboards,not self.whitesmove)
+        for start,end in squarepairs:
+            flags=CAPTURE if opponent>>end&1 else NOFLAGS
+            if pawns>>start&1:
+                if flags is NOFLAGS and (start-end)&7:
+                    flags=ENPASSANT
+                elif abs(end-start)==16:
+                    flags=MoveFlags.DoublePawnPush
+                elif end>=56 or end<8:
+                    flags|=MoveFlags.Promotion
+                    for promotion in PROMOTIONPIECES[self.whitesmove]:
+                        yield Move(start>>3,start&7,end>>3,end&7,promotion,flags)
+                    continue
+            elif king>>start&1 and abs(end-start)==2:
+                flags=MoveFlags.Castling
+            yield Move(start>>3,start&7,end>>3,end&7,None,flags)
+
+    def is_legal(self, move: Move) -> bool:
+        """Returns: Whether a move from pseudolegal_movelist keeps the own king safe."""
+        undo=self.make_move(move)
+        legal=not self.nonmovingPlayerinCheck()
+        self.unmake_move(undo)
+        return legal
+
+    def legal_moves(self, rejected: list[int]|None=None):
+        """Yields: The legal moves of the player to move one at a time, so callers can stop early or order them before expanding any.
+
+        Checks and pins are worked out once for the position (see Bitboards.iter_legal_moves), no move is made to test it.
+        Each move is checked and turned into a Move only when it is asked for."""
+        if self.only_kings_on_board():
+            return
+        yield from self._flagged_moves(Bitboards.iter_legal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights,False,rejected))
+
+    def has_legal_move(self) -> bool:
+        return next(self.legal_moves(),None) is not None
+
+    def random_legal_move(self, rng=random) -> Move|None:
+        """Returns: A legal move chosen uniformly, or None if there is none."""
+        moves=self.legalmovelist()
+        return rng.choice(moves) if moves else None
+
+    def perft(self, depth: int) -> int:
+        """Returns: The number of legal move sequences of the given length, the usual check of a move generator."""
+        if depth==0:
+            return 1
+        moves=self.legalmovelist()
+        if depth==1:
+            return len(moves)
+        nodes=0
+        for move in moves:
+            undo=self.make_move(move)
+            nodes+=self.perft(depth-1)
+            self.unmake_move(undo)
+        return nodes
+
+    def divide(self, depth: int) -> dict[str,int]:
+        """Returns: perft(depth-1) after each legal move, to find the move on which two move generators disagree."""
+        counts={}
+        for move in self.legalmovelist():
+            undo=self.make_move(move)
+            counts[str(move)]=self.perft(depth-1)
+            self.unmake_move(undo)
+        return counts
+
+    def possibleMoves(self) -> list["ChessPosition"]:
+        return [self.apply(move) for move in self.legal_moves()]
     
     def randommove(self)-> "ChessPosition":
-        return random.choice(self.possibleMoves())
+        move=self.random_legal_move()
+        if move is None:
+            raise IndexError("No legal moves in this position")
+        return self.apply(move)
 
 
     def findnonMovingPlayersKing(self)->tuple[int,int]:
-        searchedKing=ChessPieces.WhiteKing if not self.whitesmove else ChessPieces.BlackKing
-        for rownumber in range(8):
-            for columnnumber in range(8):
-                if self.Board[rownumber][columnnumber]==searchedKing:
-                    return rownumber,columnnumber
-        raise ValueError("Board doesn't seem to have a king")
+        return divmod(self.kingsquare(not self.whitesmove),8)
+
+    def kingsquare(self, white: bool) -> int:
+        kings=self.Pieceboards[(ChessPieces.WhiteKing if white else ChessPieces.BlackKing).value-1]
+        if not kings:
+            raise ValueError("Board doesn't seem to have a king")
+        return kings.bit_length()-1
+
+    def attacked_by(self, row: int, col: int, white: bool) -> bool:
+        """Returns: Whether a piece of the given colour attacks the square."""
+        return Bitboards.square_attacked_by(Bitboards.square(row,col),white,self.Pieceboards,Bitboards.occupancy(self.Pieceboards,True)|Bitboards.occupancy(self.Pieceboards,False))
                 
     def nonmovingPlayerinCheck(self):
-        kingssquare: tuple[int,int]=self.findnonMovingPlayersKing()
-        return kingssquare in self.reachablesquares()
+        return self.attacked_by(*self.findnonMovingPlayersKing(),self.whitesmove)
 
     def reachablesquares(self) -> list[tuple[int,int]]:
         """Returns: All possible moves any piece can make. Move might be illegal if own king hangs afterwards.
         
         Check, if pawn queened or enpassant happened before applying."""
-        ReachableSquares=[]
-        for rownumber in range(8):
-            for columnnumber in range(8):
-                piece_on_current_square=self.Board[rownumber][columnnumber]
-                if piece_on_current_square is not None:
-                    if piece_on_current_square.is_white()==self.whitesmove:
-                        CurrentPiecesMoves=self.piecessemilegalmoves(rownumber,columnnumber)
-                        ReachableSquares+=[newsquare[:2] for newsquare in CurrentPiecesMoves]
-        return ReachableSquares
-        
-
+        return [divmod(end,8) for _,end in Bitboards.pseudolegal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights,include_castling=False)]
 
     def piecessemilegalmoves(self, rowNumber: int, columnNumber: int)-> list:
         """Returns: All possible moves a piece on a certain square can make. Move might be illegal if own king hangs afterwards.
@@ -357,102 +627,155 @@ class ChessPosition():
             raise ValueError("piecessemilegalmoves is not supposed to be called on empty squares!")
         if piece.is_white()!=self.whitesmove:
             raise ValueError("piecessemilegalmoves is not supposed to be called with pieces of the other colour!")
-        Rawmoves:list[tuple[int,int]|tuple[int,int,bool]]=[]
-        match piece:
-            case None:
-                raise ValueError(f"There is no piece on {(rowNumber,columnNumber)}")
-            case ChessPieces.BlackPawn:
-                #print(str(self))
-                Rawmoves=legalPawnmoves(rowNumber,columnNumber,False,self.Board,self.enpassantablefile)
-            case ChessPieces.WhitePawn:
-                #print(str(self))
-                Rawmoves=legalPawnmoves(rowNumber,columnNumber,True,self.Board,self.enpassantablefile)
-            case ChessPieces.BlackKnight|ChessPieces.WhiteKnight:
-                Rawmoves=legalknightmoves(rowNumber,columnNumber,self.Board)
-            case ChessPieces.WhiteBishop|ChessPieces.BlackBishop|ChessPieces.BlackQueen|ChessPieces.WhiteQueen:
-                Rawmoves+=(legaldiagonalmoves(rowNumber,columnNumber,self.Board))
-            case ChessPieces.WhiteRook|ChessPieces.BlackRook|ChessPieces.BlackQueen|ChessPieces.WhiteQueen:
-                Rawmoves+=(legalstraightmoves(rowNumber,columnNumber,self.Board))
-            case ChessPieces.WhiteKing | ChessPieces.BlackKing:
-                Rawmoves+=legalkingmoves(rowNumber,columnNumber,self.Board, self.Castlingrights,self.castlingcolour())
-            case _:
-                ValueError(f"Did not expect {piece =}")
-        Actualmoves=[]
-        for move in Rawmoves:
-            newrow=move[0]
-            newcol=move[1]
-            Beatenpiece=self.Board[newrow][newcol]
-            if Beatenpiece is None:
-                Actualmoves.append((newrow,newcol))
-            elif Beatenpiece.is_white()!=piece.is_white():
-                Actualmoves.append((newrow,newcol))
-        #print(str(self))
-        #print(f"Legal moves of piece on {(rowNumber,columnNumber)} = {Actualmoves}")
-        #sleep(5)
-        return Actualmoves
+        start=Bitboards.square(rowNumber,columnNumber)
+        return [divmod(end,8) for movestart,end in Bitboards.pseudolegal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights) if movestart==start]
     
-    def applymove(self, startrow: int, startcolumn: int, endrow: int, endcolumn: int):
+    def copy(self) -> "ChessPosition":
+        NewPosition=object.__new__(type(self))
+        NewPosition.Board=[row[:] for row in self.Board]
+        NewPosition.whitesmove=self.whitesmove
+        NewPosition.enpassantablefile=self.enpassantablefile
+        NewPosition.Castlingrights=self.Castlingrights#Replaced, never changed in place by make_move
+        NewPosition.Pieceboards=self.Pieceboards[:]
+        NewPosition.Zobristkey=self.Zobristkey
+        NewPosition.Material=self.Material
+        NewPosition.Placement=self.Placement
+        NewPosition.Halfmoveclock=self.Halfmoveclock
+        #Positions before the last capture or pawn move can't come back
+        NewPosition.History=self.History[max(0,len(self.History)-self.Halfmoveclock):]
+        return NewPosition
+
+    def applymove(self, startrow: int, startcolumn: int, endrow: int, endcolumn: int, promotion: ChessPieces|None=None):
         """Returns: Position after the inserted move.
         
         Only use after checking move with move_is_legal"""
-        NewBoard=deepcopy(self.Board)
-        movedpiece=self.Board[startrow][startcolumn]
-        beatenpiece=self.Board[endrow][endcolumn]
+        return self.apply(Move(startrow,startcolumn,endrow,endcolumn,promotion))
+
+    def apply(self, move: Move) -> "ChessPosition":
+        """Returns: A new position after the move, this one stays unchanged."""
+        NewPosition=self.copy()
+        NewPosition.make_move(move)
+        return NewPosition
+
+    def make_move(self, move: Move) -> Undo:
+        """Applies the move to this position in place. Pawns reaching the last row become queens unless move.promotion says otherwise.
+
+        Returns: The record unmake_move needs to restore the position.
+
+        Only use after checking move with move_is_legal"""
+        startrow,startcolumn,endrow,endcolumn,promotion=move[:5]
+        Board=self.Board
+        Pieceboards=self.Pieceboards
+        movedpiece=Board[startrow][startcolumn]
+        capturedpiece=Board[endrow][endcolumn]
         if movedpiece is None:
-            raise ValueError("applymove is not meant to be called from squares without pieces")
+            raise ValueError("make_move is not meant to be called from squares without pieces")
         if movedpiece.is_white()!=self.whitesmove:
             strpiececolor="white" if movedpiece.is_white() else "black"
             raise ValueError(f"It's not {strpiececolor}'s move")
+        startsquare=Bitboards.square(startrow,startcolumn)
+        endsquare=Bitboards.square(endrow,endcolumn)
+        capturesquare=endsquare
+        placedpiece=movedpiece
 
-        #Handling en passant
+        #Handling en passant and queening
         newenpassantablefile:int|None=None
-        enpassanthappened=False
+        enpassant=False
         if movedpiece.is_pawn():
             if abs(startrow-endrow)==2:
                 newenpassantablefile=startcolumn
-            enpassanthappened=startcolumn!=endcolumn and (beatenpiece is None)
-            if enpassanthappened:
-                if (endcolumn!=self.enpassantablefile or startrow!=self.en_passant_startrow() or endcolumn!=self.enpassantablefile or self.Board[startrow][endcolumn] is None):
+            elif startcolumn!=endcolumn and capturedpiece is None:
+                if (endcolumn!=self.enpassantablefile or startrow!=self.en_passant_startrow() or Board[startrow][endcolumn] is None):
                     raise IndexError("Something peculiar en-passant-like has happened")
-                NewBoard[startrow][endcolumn]=None
-                
-
-        #Handling Queening
-        if movedpiece.is_pawn() and endrow in [0,7]:
-            movedpiece=ChessPieces.WhiteQueen if movedpiece==ChessPieces.WhitePawn else ChessPieces.BlackQueen
-
-        NewBoard[endrow][endcolumn]=movedpiece
-        NewBoard[startrow][startcolumn]=None
+                enpassant=True
+                capturedpiece=Board[startrow][endcolumn]
+                capturesquare=Bitboards.square(startrow,endcolumn)
+                Board[startrow][endcolumn]=None
+            if endrow in [0,7]:
+                placedpiece=promotion if promotion is not None else PROMOTIONPIECES[self.whitesmove][0]
+        key=self.Zobristkey^Zobrist.PIECES[movedpiece.value-1][startsquare]^Zobrist.PIECES[placedpiece.value-1][endsquare]
+        material=self.Material+POINTVALUES[placedpiece.value-1]-POINTVALUES[movedpiece.value-1]
+        placement=self.Placement+PLACEMENTVALUES[placedpiece.value-1][endsquare]-PLACEMENTVALUES[movedpiece.value-1][startsquare]
+        if capturedpiece is not None:
+            Pieceboards[capturedpiece.value-1]^=1<<capturesquare
+            key^=Zobrist.PIECES[capturedpiece.value-1][capturesquare]
+            material-=POINTVALUES[capturedpiece.value-1]
+            placement-=PLACEMENTVALUES[capturedpiece.value-1][capturesquare]
+
+        Board[endrow][endcolumn]=placedpiece
+        Board[startrow][startcolumn]=None
+        Pieceboards[movedpiece.value-1]^=1<<startsquare
+        Pieceboards[placedpiece.value-1]|=1<<endsquare
 
         #Handling Castling
-        newCastlingrights=self.Castlingrights[:]
+        lostrights=[]
         if movedpiece.is_king():
-            for direction in [Castling.Queenside,Castling(0)]:
-                newCastlingrights[(self.castlingcolour()|direction).value]=False
+            lostrights=[(self.castlingcolour()|direction).value for direction in [Castling.Queenside,Castling(0)]]
             if abs(startcolumn-endcolumn)==2:
-                if endcolumn==2:
-                    direction=Castling.Queenside
-                elif endcolumn==6:
-                    direction=Castling(0)
-                else:
-                    raise ValueError("King castle onto a unexpected square")
-                NewBoard=(self.castlingcolour()|direction).apply_castling_to_rook(NewBoard)
-            
-        if movedpiece.is_rook():
-            if (startcolumn==0 or startcolumn==7) and startrow==self.playing_sides_startrow():
-                direction=Castling(0)
-                if startcolumn==0:
-                    direction=Castling.Queenside
-                newCastlingrights[(self.castlingcolour()|direction).value]=False
-                print(f"Lost {(self.castlingcolour()|direction)} rights")
-        if beatenpiece is not None:
-            if beatenpiece.is_rook():
-                if endcolumn in [0,7] and startrow==self.playing_sides_startrow():
-                    direction=Castling.Queenside if endcolumn==0 else Castling(0)
-                    newCastlingrights[beatenpiece.castlingcolour()|direction]=False
-                    print(f"Lost {beatenpiece.castlingcolour()|direction} rights")
-                    
-        return ChessPosition(NewBoard,not self.whitesmove,newenpassantablefile,newCastlingrights)
+                rook,rookstart,rookend=self._move_castling_rook(startrow,endcolumn,False)
+                key^=Zobrist.PIECES[rook.value-1][rookstart]^Zobrist.PIECES[rook.value-1][rookend]
+                placement+=PLACEMENTVALUES[rook.value-1][rookend]-PLACEMENTVALUES[rook.value-1][rookstart]
+        for corner in [(startrow,startcolumn),(endrow,endcolumn)]:
+            if corner in CORNERCASTLINGRIGHTS:
+                lostrights.append(CORNERCASTLINGRIGHTS[corner])
+        oldCastlingrights=self.Castlingrights
+        if any(oldCastlingrights[i] for i in lostrights):
+            self.Castlingrights=[right and i not in lostrights for i,right in enumerate(oldCastlingrights)]
+            key^=Zobrist.castling_key(oldCastlingrights)^Zobrist.castling_key(self.Castlingrights)
+        if self.enpassantablefile is not None:
+            key^=Zobrist.ENPASSANT[self.enpassantablefile]
+        if newenpassantablefile is not None:
+            key^=Zobrist.ENPASSANT[newenpassantablefile]
+
+        undo=Undo(move,movedpiece,capturedpiece,enpassant,self.enpassantablefile,oldCastlingrights,None if placedpiece is movedpiece else placedpiece,
+                  self.Zobristkey,self.Material,self.Placement,self.Halfmoveclock)
+        self.History.append(self.Zobristkey)
+        self.Halfmoveclock=0 if capturedpiece is not None or movedpiece.is_pawn() else self.Halfmoveclock+1
+        self.enpassantablefile=newenpassantablefile
+        self.whitesmove=not self.whitesmove
+        self.Zobristkey=key^Zobrist.BLACKTOMOVE
+        self.Material=material
+        self.Placement=placement
+        return undo
+
+    def unmake_move(self, undo: Undo) -> None:
+        """Takes back the move make_move returned undo for. Moves have to be taken back in reverse order."""
+        startrow,startcolumn,endrow,endcolumn=undo.move[:4]
+        Board=self.Board
+        Pieceboards=self.Pieceboards
+        self.whitesmove=not self.whitesmove
+        self.enpassantablefile=undo.enpassantablefile
+        self.Castlingrights=undo.Castlingrights
+        self.Zobristkey=undo.Zobristkey
+        self.Material=undo.Material
+        self.Placement=undo.Placement
+        self.Halfmoveclock=undo.Halfmoveclock
+        self.History.pop()
+        movedpiece=undo.movedpiece
+        Pieceboards[Board[endrow][endcolumn].value-1]^=1<<Bitboards.square(endrow,endcolumn)
+        Pieceboards[movedpiece.value-1]|=1<<Bitboards.square(startrow,startcolumn)
+        Board[startrow][startcolumn]=movedpiece
+        Board[endrow][endcolumn]=None
+        if undo.capturedpiece is not None:
+            capturerow=startrow if undo.enpassant else endrow
+            Board[capturerow][endcolumn]=undo.capturedpiece
+            Pieceboards[undo.capturedpiece.value-1]|=1<<Bitboards.square(capturerow,endcolumn)
+        if movedpiece.is_king() and abs(startcolumn-endcolumn)==2:
+            self._move_castling_rook(startrow,endcolumn,True)
+
+    def _move_castling_rook(self, row: int, kingcolumn: int, takeback: bool) -> tuple[ChessPieces,int,int]:
+        """Returns: The rook and the squares it moved from and to."""
+        rookcolumns=(0,3) if kingcolumn==2 else (7,5)
+        if kingcolumn not in [2,6]:
+            raise ValueError("King castle onto a unexpected square")
+        fromcolumn,tocolumn=rookcolumns[::-1] if takeback else rookcolumns
+        rook=self.Board[row][fromcolumn]
+        self.Board[row][tocolumn]=rook
+        self.Board[row][fromcolumn]=None
+        fromsquare=Bitboards.square(row,fromcolumn)
+        tosquare=Bitboards.square(row,tocolumn)
+        self.Pieceboards[rook.value-1]^=(1<<fromsquare)|(1<<tosquare)
+        return rook,fromsquare,tosquare
     
     def en_passant_startrow(self) -> int:
         return 4 if self.whitesmove else 3
@@ -463,46 +786,105 @@ class ChessPosition():
     '''def en_passant_endrow(self)->bool:
         return 5 if self.whitesmove else 2'''
     def only_kings_on_board(self) -> bool:
-        for i in range(8):
-            for j in range(8):
-                if self.Board[i][j] not in [ChessPieces.BlackKing,ChessPieces.WhiteKing, None]:
-                    return False
-        return True
+        return not any(self.Pieceboards[i] for i in range(12) if i not in (Bitboards.WHITE+Bitboards.KING,Bitboards.BLACK+Bitboards.KING))
+    def is_repetition(self, times: int=2) -> bool:
+        """Returns: Whether the position has occurred times times, counting this one.
+
+        Only the positions since the last capture or pawn move, with the same player to move, are compared."""
+        History=self.History
+        key=self.Zobristkey
+        seen=1
+        for i in range(len(History)-2,max(0,len(History)-self.Halfmoveclock)-1,-2):
+            if History[i]==key:
+                seen+=1
+                if seen>=times:
+                    return True
+        return False
+
+    def is_draw(self) -> bool:
+        """Returns: Whether the game is drawn by threefold repetition or the fifty-move rule (unless the last move mated)."""
+        return self.is_repetition(3) or (self.Halfmoveclock>=100 and (self.has_legal_move() or not self.is_check()))
+
     def eval_by_material(self) -> float:
-        return sum(piece.pointvalue_in_game() for row in self.Board for piece in row if piece is not None)
+        return self.Material
     
     def eval_by_placement(self) -> float:
-        return sum((abs(3.5-i)+abs(3.5-j))*(piece.is_white()-0.5)/500 for i in range(8) for j in range(8) if (piece:=self.Board[i][j]) is not None)
+        return self.Placement
+
+    def recompute_evaluation(self) -> None:
+        """Sets Material and Placement from scratch, e.g. after changing a piece-square table."""
+        self.Material=sum(POINTVALUES[i]*self.Pieceboards[i].bit_count() for i in range(12))
+        self.Placement=sum(PLACEMENTVALUES[i][sq] for i in range(12) for sq in Bitboards.squares(self.Pieceboards[i]))
     
     def eval_without_depth(self) -> float:
         return self.eval_by_material()+self.eval_by_placement()
 
-    def is_check(self):
-        ChessPosition(self.Board,not self.whitesmove,None,self.Castlingrights)
-
-    def eval(self, depth: int, depth0method=eval_by_material) -> tuple[float,"ChessPosition"]:
-        """Returns: Evaluation of the position and the best move"""
-        moves=self.possibleMoves()
-        if len(moves)==0:
-            #Player is out of moves so he either lost or it's a draw
-            sign=-1 if self.whitesmove else 1
-            value=float('inf') if self.is_check() else 0
-            return sign*value, self
-        if depth<=0:
-            return depth0method(self),self.randommove()
-        
-        cost=math.log(len(moves))#Incentivizing forcing moves
-        eval_and_move=[]
-        for move in moves:
-            directgain:float =abs(self.eval_by_material()-move.eval_by_material())#incentivizing captures
-            evaluation,_=move.eval(depth-(cost/(1+directgain)),depth0method)
-            eval_and_move.append((evaluation,move))
-        if self.whitesmove:
-            return max(eval_and_move, key=lambda x: x[0])
-        return min(eval_and_move, key=lambda x: x[0])
+    def is_check(self) -> bool:
+        """Returns: Whether the player to move is in check."""
+        return self.attacked_by(*divmod(self.kingsquare(self.whitesmove),8),not self.whitesmove)
+
+    def eval(self, depth: int, depth0method=eval_by_material, table: TranspositionTable|None=None, alphabeta: bool=True, quiescence: bool=True, tablebase=None, stats=None) -> tuple[float,"ChessPosition"]:
+        """Returns: Evaluation of the position and the best move
+
+        Pass a TranspositionTable to keep searched positions between calls, otherwise a fresh one is used.
+        With alphabeta the same tree is searched, but lines that can't change the result are cut off.
+        With quiescence (see Search) leaves are searched until no captures are left, otherwise depth 0 plays a random move.
+        With a Tablebase.Tablebase, endgames it covers are looked up once the search reaches them.
+        With a Searchstats.SearchStats the search counts its nodes and times its phases into it."""
+        if depth<=0 and not quiescence:
+            move=self.random_legal_move()
+            if move is not None:
+                return depth0method(self),self.apply(move)
+        evaluation,move=new_search(depth0method,table,alphabeta,quiescence,tablebase,stats).run(self,depth)
+        if move is None:
+            return evaluation,self
+        return evaluation,self.apply(move)
+
+    def search(self, depth: float, depth0method=eval_by_material, table: TranspositionTable|None=None, alphabeta: bool=True, quiescence: bool=True, tablebase=None, stats=None) -> Search:
+        """Returns: The finished Search with the evaluation (value), the best move (move) and the number of nodes searched (nodes).
+        With a Searchstats.SearchStats it is an InstrumentedSearch that counted and timed into it."""
+        search=new_search(depth0method,table,alphabeta,quiescence,tablebase,stats)
+        search.run(self,depth)
+        return search
     
-    def bestmove(self,*args):
-        return self.eval(*args)[1]
+    def bestmove(self, depth: float|None=None, depth0method=eval_by_material, table: TranspositionTable|None=None, alphabeta: bool=True, time_ms: float|None=None, nodes: int|None=None, workers: int|None=None, quiescence: bool=True, book=None, tablebase=None, stats=None):
+        """Returns: A SearchResult holding the position after the best move, the move, its evaluation and the principal variation.
+
+        Searches to depth, or given a time (in milliseconds) or node budget with iterative deepening, using depth as maximal depth.
+        Given a number of workers, searches the root moves to depth in that many processes (see Parallelsearch); that search has no budget.
+        Given an Openingbook.OpeningBook that knows the position, plays one of its moves, chosen by weight, without searching,
+        and likewise the best move of a Tablebase.Tablebase that covers it. Otherwise the search looks endgames up in the tablebase.
+        A Searchstats.SearchStats collects the counters and phase timings of the search, unless it runs in worker processes."""
+        budgeted=time_ms is not None or nodes is not None
+        if workers is not None and budgeted:
+            raise ValueError("bestmove can't search with workers under a time or node budget")
+        if depth is None and not budgeted:
+            raise ValueError("bestmove needs a depth, time or node limit")
+        move=None
+        if book is not None:
+            move=book.choose(self,random)
+        if move is None and tablebase is not None:
+            move=tablebase.best_move(self)
+            if move is not None:
+                Position=self.apply(move)
+                value=-value_from_table(tablebase.value(Position),1)
+                return SearchResult(Position,move,value if self.whitesmove else -value,0,[move],0)
+        if move is None and not budgeted and depth<=0 and not quiescence:
+            move=self.random_legal_move()
+        if move is not None:
+            Position=self.apply(move)
+            return SearchResult(Position,move,depth0method(Position),0,[move],0)
+        if workers is not None:
+            from Parallelsearch import parallel_search
+            result=parallel_search(self,depth,workers,depth0method,quiescence)
+            return SearchResult(result.position,result.move,result.value,depth,[] if result.move is None else [result.move],result.nodes)
+        search=new_search(depth0method,table,alphabeta,quiescence,tablebase,stats)
+        if budgeted:
+            return search.iterative_deepening(self,time_ms,nodes,depth)
+        value,move=search.run(self,depth)
+        if move is None:
+            return SearchResult(self,None,value,depth,[],search.nodes)
+        return SearchResult(self.apply(move),move,value,depth,search.principal_variation(self,move,depth),search.nodes)
     
     def castlingcolour(self) -> Castling:
         if self.whitesmove:
@@ -522,8 +904,7 @@ class ChessPosition():
         return piece.is_white()!=self.whitesmove
     
     def can_take_king(self)->bool:
-        row,col=self.findnonMovingPlayersKing()
-        return self.square_reachable(row,col,True)
+        return self.nonmovingPlayerinCheck()
 
     def square_reachable(self,row:int,col:int,allow_hanging_king:bool=True)->bool:
         for startrow in range(8):
@@ -533,13 +914,9 @@ class ChessPosition():
         return False
 
 
-    def square_attacked(self,row:int,col:int,allow_hanging_king:bool=True)->bool:
-        Position_with_switched_player=ChessPosition(self.Board,not self.whitesmove, None, self.Castlingrights)
-        for startrow in range(8):
-            for endrow in range(8):
-                if Position_with_switched_player.move_is_legal(startrow,endrow,row,col,allow_hanging_king):
-                    return True
-        return False
+    def square_attacked(self,row:int,col:int)->bool:
+        """Returns: Whether the player who is not to move attacks the square."""
+        return self.attacked_by(row,col,not self.whitesmove)
 
            
 
@@ -558,12 +935,23 @@ def eval_in_randomgame(moves_before_eval,depth=0):
     print(str(Position))
     print(Position.eval(depth))
 
-def Game_of_bestmoves(depth):
+def Game_of_bestmoves(depth,time_ms=None,bookpath=None,tablebasedirectory=None):
     Position=ChessPosition()
+    book=None
+    if bookpath is not None:
+        from Openingbook import OpeningBook
+        book=OpeningBook(bookpath)
+    tablebase=None
+    if tablebasedirectory is not None:
+        from Tablebase import Tablebase
+        tablebase=Tablebase(tablebasedirectory)
     while True:
         print(str(Position))
+        if Position.is_draw():
+            print("Draw")
+            break
         print(len(Position.possibleMoves()))
-        Position=Position.bestmove(depth)
+        Position=Position.bestmove(depth if time_ms is None else None,time_ms=time_ms,book=book,tablebase=tablebase).position
 
 
 if __name__=="__main__":
@@ -0,0 +1,167 @@
+"""Runs the engine on an EPD test suite such as WAC or STS and reports which positions it solves.
+
+The file is read line by line and only a few positions per worker are in flight at a time, so suites of any size can be run.
+Every result is printed (and written to a CSV file) as soon as it is done:
+
+    python EPDrunner.py wac.epd --time 1000 --workers 4 --csv wac.csv
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple, Iterator
+from Chessposition import ChessPosition
+from Search import Search
+import Notation
+
+#An opcode followed by its operands (possibly quoted strings containing spaces) up to the next semicolon
+OPERATION=re.compile(r'\s*([A-Za-z][A-Za-z0-9_]*)((?:\s*(?:"[^"]*"|[^;"\s]+))*)\s*;')
+OPERAND=re.compile(r'"([^"]*)"|([^\s"]+)')
+
+class EPDRecord(NamedTuple):
+    linenumber: int
+    fen: str#The four position fields of the EPD line with move counters added
+    operations: dict[str,list[str]]
+    error: str|None=None#Why the line couldn't be read, it is then reported instead of searched
+
+    def name(self) -> str:
+        return self.operations.get("id",[str(self.linenumber)])[0]
+
+    def expected(self) -> str:
+        """Returns: The bm moves, or the am moves each prefixed with !"""
+        return " ".join(self.operations.get("bm",[])) or "!"+" !".join(self.operations.get("am",[]))
+
+class EPDResult(NamedTuple):
+    linenumber: int
+    id: str
+    move: str#SAN of the move the engine chose
+    expected: str#bm moves, or !am moves
+    solved: bool
+    depth: float
+    value: float
+    nodes: int
+    seconds: float
+    nps: float
+    solvedafter: float|None#Seconds until the engine settled on a right move for good
+    error: str|None=None#Why the record couldn't be searched, e.g. a bm move that isn't legal
+
+def error_result(record: EPDRecord, error: str) -> EPDResult:
+    return EPDResult(record.linenumber,record.name(),"",record.expected(),False,0,0.0,0,0.0,0.0,None,error)
+
+def parse_epd(line: str, linenumber: int=0) -> EPDRecord:
+    """Returns: The position and the operations (like bm, am and id) of one EPD line."""
+    fields=line.split(None,4)
+    if len(fields)<4:
+        raise ValueError(f"Not an EPD line: {line}")
+    operations={}
+    rest=fields[4] if len(fields)>4 else ""
+    for opcode,operands in OPERATION.findall(rest):
+        operations[opcode]=[quoted or plain for quoted,plain in OPERAND.findall(operands)]
+    return EPDRecord(linenumber," ".join(fields[:4])+" 0 1",operations)
+
+def read_epd(path: str) -> Iterator[EPDRecord]:
+    """Yields: The records of an EPD file one at a time, skipping empty lines and # comments.
+    A line that isn't EPD gives a record with the error, so that the rest of the suite still runs."""
+    with open(path) as file:
+        for linenumber,line in enumerate(file,1):
+            line=line.strip()
+            if line and not line.startswith("#"):
+                try:
+                    yield parse_epd(line,linenumber)
+                except ValueError as error:
+                    yield EPDRecord(linenumber,"",{},str(error))
+
+def solve(record: EPDRecord, time_ms: float|None, nodes: int|None, maxdepth: float|None=None) -> EPDResult:
+    """Returns: Whether the engine finds a bm move (or avoids all am moves) of the record within the budget,
+    or an error result if its position or moves can't be read."""
+    if record.error is not None:
+        return error_result(record,record.error)
+    try:
+        Position=ChessPosition.from_fen(record.fen)
+        legalmoves=Position.legalmovelist()
+        best={Notation.san_to_move(Position,san,legalmoves) for san in record.operations.get("bm",[])}
+        avoid={Notation.san_to_move(Position,san,legalmoves) for san in record.operations.get("am",[])}
+    except (ValueError,KeyError,IndexError) as error:
+        return error_result(record,str(error) or type(error).__name__)
+    def is_solution(move) -> bool:
+        return move in best if best else move not in avoid
+    start=time.perf_counter()
+    solvedafter=None
+    def oniteration(result) -> None:
+        nonlocal solvedafter
+        if not is_solution(result.move):
+            solvedafter=None
+        elif solvedafter is None:
+            solvedafter=time.perf_counter()-start
+    result=Search(ChessPosition.eval_without_depth).iterative_deepening(Position,time_ms,nodes,maxdepth,oniteration)
+    seconds=time.perf_counter()-start
+    solved=result.move is not None and is_solution(result.move)
+    return EPDResult(record.linenumber,record.name(),"" if result.move is None else Notation.move_to_san(Position,result.move,legalmoves),
+                     record.expected(),solved,result.depth,result.value,result.nodes,seconds,result.nodes/seconds if seconds else 0.0,
+                     solvedafter if solved else None)
+
+def run(records: Iterator[EPDRecord], time_ms: float|None, nodes: int|None, maxdepth: float|None=None, workers: int|None=None) -> Iterator[EPDResult]:
+    """Yields: The result of every record in the order they finish. At most two records per worker are read ahead.
+    A record whose search fails gives an error result instead of ending the run."""
+    workers=workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: dict=dict()
+        def collect(done) -> Iterator[EPDResult]:
+            for future in done:
+                record=pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as error:
+                    yield error_result(record,repr(error))
+        for record in records:
+            pending[executor.submit(solve,record,time_ms,nodes,maxdepth)]=record
+            if len(pending)>=2*workers:
+                done,_=wait(pending,return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        while pending:
+            done,_=wait(pending,return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+def main():
+    parser=argparse.ArgumentParser(description="Run the engine on an EPD test suite")
+    parser.add_argument("epdfile")
+    parser.add_argument("--time",type=float,help="milliseconds per position")
+    parser.add_argument("--nodes",type=int,help="nodes per position")
+    parser.add_argument("--depth",type=float,help="maximal depth per position")
+    parser.add_argument("--workers",type=int,help="number of processes (default: one per core)")
+    parser.add_argument("--csv",help="also write the results to this CSV file")
+    args=parser.parse_args()
+    if args.time is None and args.nodes is None and args.depth is None:
+        parser.error("give a --time, --nodes or --depth budget")
+    csvfile=open(args.csv,"w",newline="") if args.csv else None
+    writer=None
+    if csvfile is not None:
+        writer=csv.writer(csvfile)
+        writer.writerow(EPDResult._fields)
+    total=solved=errors=totalnodes=0
+    totalseconds=0.0
+    try:
+        for result in run(read_epd(args.epdfile),args.time,args.nodes,args.depth,args.workers):
+            total+=1
+            solved+=result.solved
+            errors+=result.error is not None
+            totalnodes+=result.nodes
+            totalseconds+=result.seconds
+            if result.error is not None:
+                print(f"{result.id:20} {'error':8} line {result.linenumber}: {result.error}",flush=True)
+            else:
+                print(f"{result.id:20} {'solved' if result.solved else 'unsolved':8} {result.move:8} expected {result.expected:16} depth {result.depth:5.2f} "
+                      f"{result.nodes:>9} nodes {result.nps:>8.0f} nps {'' if result.solvedafter is None else f'solved after {result.solvedafter:.2f}s'}",flush=True)
+            if writer is not None:
+                writer.writerow(result)
+                csvfile.flush()
+    finally:
+        if csvfile is not None:
+            csvfile.close()
+    print(f"Solved {solved} of {total}, {errors} errors, {totalnodes} nodes, {totalnodes/totalseconds if totalseconds else 0:.0f} nps",file=sys.stderr)
+
+if __name__=="__main__":
+    main()
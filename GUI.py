@@ -1,32 +1,86 @@
+import io
+import os
+import re
+import queue
+import threading
 import pygame
 import Chessposition
+from Search import Search
 from typing import Iterable
 
-pygame.init()
-
 size = 400
 rows, cols = 8, 8
 cell_size = size // rows
-screen = pygame.display.set_mode((size, size))
-font = pygame.font.Font(None, 36)
 WHITE = (200, 200, 200)
 BLACK = (100, 100, 100)
 RED_TINGE_AMMOUNT=50
 LIGHT_RED_TINGE_AMMOUNT=30
 FRAMETHICKNESS_WHEN_MARKED=5
-Piece_Images= {Chessposition.ChessPieces.BlackBishop: pygame.image.load('Schachfiguren\Chess_bdt45.svg'),
-               Chessposition.ChessPieces.BlackQueen: pygame.image.load('Schachfiguren\Chess_qdt45.svg'),
-               Chessposition.ChessPieces.BlackKing: pygame.image.load('Schachfiguren\Chess_kdt45.svg'),
-               Chessposition.ChessPieces.WhiteKing: pygame.image.load('Schachfiguren\Chess_klt45.svg'),
-               Chessposition.ChessPieces.WhiteBishop: pygame.image.load('Schachfiguren\Chess_blt45.svg'),
-               Chessposition.ChessPieces.BlackKnight: pygame.image.load('Schachfiguren\Chess_ndt45.svg'),
-               Chessposition.ChessPieces.WhiteKnight: pygame.image.load('Schachfiguren\Chess_nlt45.svg'),
-               Chessposition.ChessPieces.BlackPawn: pygame.image.load('Schachfiguren\Chess_pdt45.svg'),
-               Chessposition.ChessPieces.WhitePawn: pygame.image.load('Schachfiguren\Chess_plt45.svg'),
-               Chessposition.ChessPieces.WhiteQueen: pygame.image.load('Schachfiguren\Chess_qlt45.svg'),
-               Chessposition.ChessPieces.BlackRook: pygame.image.load('Schachfiguren\Chess_rdt45.svg'),
-               Chessposition.ChessPieces.WhiteRook: pygame.image.load('Schachfiguren\Chess_rlt45.svg'),}
+FPS=30
+ENGINE_TIME_MS=1000
+PIECE_DIRECTORY=os.path.join(os.path.dirname(os.path.abspath(__file__)),"Schachfiguren")
+PIECE_FILES= {Chessposition.ChessPieces.BlackBishop: 'Chess_bdt45.svg',
+              Chessposition.ChessPieces.BlackQueen: 'Chess_qdt45.svg',
+              Chessposition.ChessPieces.BlackKing: 'Chess_kdt45.svg',
+              Chessposition.ChessPieces.WhiteKing: 'Chess_klt45.svg',
+              Chessposition.ChessPieces.WhiteBishop: 'Chess_blt45.svg',
+              Chessposition.ChessPieces.BlackKnight: 'Chess_ndt45.svg',
+              Chessposition.ChessPieces.WhiteKnight: 'Chess_nlt45.svg',
+              Chessposition.ChessPieces.BlackPawn: 'Chess_pdt45.svg',
+              Chessposition.ChessPieces.WhitePawn: 'Chess_plt45.svg',
+              Chessposition.ChessPieces.WhiteQueen: 'Chess_qlt45.svg',
+              Chessposition.ChessPieces.BlackRook: 'Chess_rdt45.svg',
+              Chessposition.ChessPieces.WhiteRook: 'Chess_rlt45.svg',}
+SVG_PIXELS=45#Size the piece SVGs are drawn at
+SVG_TAG=re.compile(rb"<svg\b[^>]*>")
+#Rewritten to the cell size, with a viewBox so the drawing is scaled along. The attributes may be split over lines
+SVG_SIZE=re.compile(rb'\b(width|height)\s*=\s*"[^"]*"')
+
+#Set up by init_display, so that importing this module doesn't open a window
+screen: pygame.Surface
+Piece_Atlas: pygame.Surface
+
+def rasterise_piece(filename: str, pixels: int) -> pygame.Surface:
+    """Returns: The piece drawn from its SVG at pixels x pixels, rather than scaling up the 45 pixel default."""
+    with open(os.path.join(PIECE_DIRECTORY,filename),"rb") as file:
+        svg=file.read()
+    tag=SVG_TAG.search(svg)
+    if tag is not None:
+        resized=SVG_SIZE.sub(lambda match: match.group(1)+f'="{pixels}"'.encode(),tag.group())
+        if b"viewBox" not in resized:
+            resized=resized[:-1]+f' viewBox="0 0 {SVG_PIXELS} {SVG_PIXELS}">'.encode()
+        svg=svg[:tag.start()]+resized+svg[tag.end():]
+    surface=pygame.image.load(io.BytesIO(svg),filename)
+    if surface.get_size()!=(pixels,pixels):
+        #An SVG the rewrite didn't fit still has to fill its cell
+        surface=pygame.transform.smoothscale(surface,(pixels,pixels))
+    return surface
 
+def load_piece_atlas(pixels: int) -> pygame.Surface:
+    """Returns: One surface with all twelve pieces side by side, pixels wide each, in the order of ChessPieces.
+
+    Rasterising the SVGs is the slow part of starting the GUI, so the atlas is saved as a PNG per size next to them
+    and only redrawn when an SVG or this module is newer. Needs the display to be set up."""
+    path=os.path.join(PIECE_DIRECTORY,f"atlas_{pixels}.png")
+    newest=max([os.path.getmtime(os.path.join(PIECE_DIRECTORY,filename)) for filename in PIECE_FILES.values()]+[os.path.getmtime(__file__)])
+    if os.path.exists(path) and os.path.getmtime(path)>=newest:
+        return pygame.image.load(path).convert_alpha()
+    atlas=pygame.Surface((len(PIECE_FILES)*pixels,pixels),pygame.SRCALPHA)
+    for piece in Chessposition.ChessPieces:
+        atlas.blit(rasterise_piece(PIECE_FILES[piece],pixels),((piece.value-1)*pixels,0))
+    try:
+        temporary=os.path.join(PIECE_DIRECTORY,f"atlas_{pixels}.tmp.png")
+        pygame.image.save(atlas,temporary)
+        os.replace(temporary,path)
+    except (pygame.error,OSError):
+        pass#A read-only checkout rasterises on every start
+    return atlas.convert_alpha()
+
+def init_display() -> None:
+    global screen, Piece_Atlas
+    pygame.init()
+    screen = pygame.display.set_mode((size, size))
+    Piece_Atlas = load_piece_atlas(cell_size)
 
 def draw_cell(row,col,marked=False,lightlymarked=False):
     if marked and lightlymarked:
@@ -35,65 +89,99 @@ def draw_cell(row,col,marked=False,lightlymarked=False):
     color = (200+red_tinge, 200, 200) if (row + col) % 2 == 0 else (100+red_tinge, 100, 100)
     pygame.draw.rect(screen, color, (col * cell_size, row * cell_size, cell_size, cell_size))
 
-def draw_board(cellmarked:bool, markedrow:int ,markedcol:int, othersquares_to_highlight: list[tuple[int,int]])->None:
-    for row in range(rows):
-        for col in range(cols):
-            draw_cell(row,col,cellmarked and markedrow==row and markedcol==col, cellmarked and ((row,col) in othersquares_to_highlight))
-
-def draw_text(row: int, col: int, text: str) -> None:
-    TEXT_COLOR=BLACK
-    text_surface = font.render(text, True, TEXT_COLOR)
-    text_rect = text_surface.get_rect(center=(col * cell_size + cell_size // 2, row * cell_size + cell_size // 2))
-    screen.blit(text_surface, text_rect)
-
 def draw_piece(row: int, col: int, piece: Chessposition.ChessPieces|None) -> None:
     if piece is None:
         return
-    screen.blit(Piece_Images[piece], (col * cell_size, row * cell_size))
-    
+    screen.blit(Piece_Atlas, (col * cell_size, row * cell_size), ((piece.value-1) * cell_size, 0, cell_size, cell_size))
+
+def draw_square(row: int, col: int, Position: Chessposition.ChessPosition, selected: tuple[int,int]|None, targets: Iterable[tuple[int,int]]) -> pygame.Rect:
+    """Draws one cell with its highlighting and piece. Returns: The area of the screen that changed."""
+    draw_cell(row,col,selected==(row,col),selected is not None and selected!=(row,col) and (row,col) in targets)
+    draw_piece(row,col,Position.Board[row][col])
+    return pygame.Rect(col * cell_size, row * cell_size, cell_size, cell_size)
+
+def legal_move_map(Position: Chessposition.ChessPosition) -> dict[tuple[int,int],dict[tuple[int,int],Chessposition.Move]]:
+    """Returns: For every square of a piece that can move, its legal moves by target square. Pawns promote to a queen."""
+    movemap: dict[tuple[int,int],dict[tuple[int,int],Chessposition.Move]]={}
+    for move in Position.legal_moves():
+        #The queen comes first among the promotions
+        movemap.setdefault((move.startrow,move.startcol),{}).setdefault((move.endrow,move.endcol),move)
+    return movemap
+
+def changed_squares(Old: Chessposition.ChessPosition, New: Chessposition.ChessPosition) -> set[tuple[int,int]]:
+    return {(row,col) for row in range(rows) for col in range(cols) if Old.Board[row][col]!=New.Board[row][col]}
+
+def start_engine(Position: Chessposition.ChessPosition, results: queue.Queue, time_ms: float=ENGINE_TIME_MS) -> Search:
+    """Searches for a move on a background thread and puts the SearchResult into results.
+    Returns: The Search, whose stop() ends it early."""
+    search=Search(Chessposition.ChessPosition.eval_without_depth)
+    Position=Position.copy()
+    threading.Thread(target=lambda: results.put(search.iterative_deepening(Position,time_ms)),daemon=True).start()
+    return search
 
-def draw_position(Position:Chessposition.ChessPosition) -> None:
-    for row in range(8):
-        for col in range(8):
-            draw_piece(row, col, Position.Board[row][col])
+def main(engine_plays_white: bool|None=None, engine_time_ms: float=ENGINE_TIME_MS):
+    """Plays a game by clicking on a piece and then on its target square.
 
-def main():
+    With engine_plays_white True or False the engine plays that side, searching on a background thread so the window stays responsive.
+    The legal moves are worked out once per position and only squares that changed are redrawn, at most FPS times a second."""
+    init_display()
     Position=Chessposition.ChessPosition()
+    movemap=legal_move_map(Position)
+    clock=pygame.time.Clock()
+    results: queue.Queue=queue.Queue()
+    search: Search|None=None
 
     running = True
-    PIECE_SELECTED=False
-    selected_row=0
-    selected_col=0
-    Possible_Moves=[]
+    selected: tuple[int,int]|None=None
+    Possible_Moves: dict[tuple[int,int],Chessposition.Move]={}
+    dirty: set[tuple[int,int]]={(row,col) for row in range(rows) for col in range(cols)}
     while running:
+        NewPosition=None
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.MOUSEBUTTONDOWN and search is None:
                 x, y = event.pos
                 row, col = y // cell_size, x // cell_size
                 piece=Position.Board[row][col]
                 print(f"Clicked on {row}, {col}. Found a {piece}")
-                if PIECE_SELECTED:
-                    PIECE_SELECTED=False
-                    if not (row==selected_row and col==selected_col):
-                        if Position.move_is_legal(selected_row,selected_col,row,col,False):
-                            Position=Position.applymove(selected_row,selected_col,row,col)
-                        else:
-                            print("not a legal move")
-                    pass
-                elif piece is not None:
-                    selected_row=row
-                    selected_col=col
-                    PIECE_SELECTED=True
-                    Possible_Moves=Position.new_pieces_possible_moves(selected_row,selected_col,False)
-                    Possible_Moves=list(Possible_Moves)
-        screen.fill((0, 0, 0))
-        draw_board(PIECE_SELECTED,selected_row,selected_col,Possible_Moves)
-        draw_position(Position)
-        pygame.display.flip()
+                dirty.update(Possible_Moves)
+                if selected is not None:
+                    dirty.add(selected)
+                if selected is not None and selected!=(row,col):
+                    if (row,col) in Possible_Moves:
+                        NewPosition=Position.apply(Possible_Moves[(row,col)])
+                    else:
+                        print("not a legal move")
+                    selected=None
+                    Possible_Moves={}
+                elif selected is None and piece is not None:
+                    selected=(row,col)
+                    Possible_Moves=movemap.get(selected,{})
+                    dirty.add(selected)
+                    dirty.update(Possible_Moves)
+                else:
+                    selected=None
+                    Possible_Moves={}
+        if search is not None and not results.empty():
+            NewPosition=Position.apply(results.get().move)
+            search=None
+        if NewPosition is not None:
+            dirty.update(changed_squares(Position,NewPosition))
+            Position=NewPosition
+            movemap=legal_move_map(Position)
+            if not movemap or Position.is_draw():
+                print("Game over")
+        if running and search is None and movemap and not Position.is_draw() and engine_plays_white is not None and Position.whitesmove==engine_plays_white:
+            search=start_engine(Position,results,engine_time_ms)
+        if dirty:
+            pygame.display.update([draw_square(row,col,Position,selected,Possible_Moves) for row,col in dirty])
+            dirty=set()
+        clock.tick(FPS)
 
+    if search is not None:
+        search.stop()
     pygame.quit()
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
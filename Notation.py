@@ -0,0 +1,97 @@
+"""Standard algebraic notation (SAN, e.g. Nbd7, exd6, O-O, e8=Q+) and coordinate notation (e2e4, e7e8q) of moves."""
+import re
+from Chessposition import ChessPosition, ChessPieces, Move, squarename
+
+PIECELETTERS="PRNBQKPRNBQK"#Indexed by ChessPieces.value-1
+PROMOTIONLETTERS={"Q": ChessPieces.WhiteQueen,"R": ChessPieces.WhiteRook,"B": ChessPieces.WhiteBishop,"N": ChessPieces.WhiteKnight}
+#Annotations that may follow a move and aren't part of it
+SUFFIXES="+#!?"
+SAN=re.compile(r"^(?:(O-O-O|O-O)|([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=([NBRQ]))?)$")
+
+def move_to_san(Position: ChessPosition, move: Move, legalmoves: list[Move]|None=None) -> str:
+    """Returns: The SAN of a legal move, including + or # if it gives check or mate."""
+    piece=Position.Board[move.startrow][move.startcol]
+    if piece.is_king() and abs(move.endcol-move.startcol)==2:
+        san="O-O" if move.endcol==6 else "O-O-O"
+    else:
+        if legalmoves is None:
+            legalmoves=Position.legalmovelist()
+        target=squarename(move.endrow,move.endcol)
+        capture=Position.Board[move.endrow][move.endcol] is not None or (piece.is_pawn() and move.startcol!=move.endcol)
+        if piece.is_pawn():
+            san=("abcdefgh"[move.startcol]+"x" if capture else "")+target
+            if move.promotion is not None:
+                san+="="+PIECELETTERS[move.promotion.value-1]
+        else:
+            rivals=[other for other in legalmoves if (other.endrow,other.endcol)==(move.endrow,move.endcol) and other!=move
+                    and Position.Board[other.startrow][other.startcol]==piece]
+            disambiguation=""
+            if rivals:
+                if all(other.startcol!=move.startcol for other in rivals):
+                    disambiguation="abcdefgh"[move.startcol]
+                elif all(other.startrow!=move.startrow for other in rivals):
+                    disambiguation=str(move.startrow+1)
+                else:
+                    disambiguation=squarename(move.startrow,move.startcol)
+            san=PIECELETTERS[piece.value-1]+disambiguation+("x" if capture else "")+target
+    undo=Position.make_move(move)
+    if Position.is_check():
+        san+="+" if Position.has_legal_move() else "#"
+    Position.unmake_move(undo)
+    return san
+
+def san_to_move(Position: ChessPosition, san: str, legalmoves: list[Move]|None=None) -> Move:
+    """Returns: The legal move written as san. Also accepts 0-0, a missing = before the promotion piece,
+    overly specific disambiguation like Ng1f3 and annotations like ! or ?.
+
+    Without legalmoves only the pseudo-legal moves fitting the text are checked for legality."""
+    match=SAN.match(_normalize(san))
+    if match is None:
+        raise ValueError(f"{san} is not a move in SAN")
+    castling,letter,file,rank,target,promotion=match.groups()
+    Board=Position.Board
+    row=0 if Position.whitesmove else 7
+    if castling:
+        letter="K"
+        file,rank="e",str(row+1)
+        target=squarename(row,6 if castling=="O-O" else 2)
+    endrow,endcol=int(target[1])-1,"abcdefgh".index(target[0])
+    candidates=Position.pseudolegal_movelist() if legalmoves is None else legalmoves
+    matches=[]
+    for move in candidates:
+        if (move.endrow,move.endcol)!=(endrow,endcol):
+            continue
+        piece=Board[move.startrow][move.startcol]
+        if PIECELETTERS[piece.value-1]!=(letter or "P"):
+            continue
+        if (file is not None and "abcdefgh"[move.startcol]!=file) or (rank is not None and move.startrow+1!=int(rank)):
+            continue
+        if castling and abs(move.endcol-move.startcol)!=2:
+            continue
+        if piece.is_pawn() and endrow in [0,7]:
+            if promotion is None:
+                raise ValueError(f"{san} is missing the promotion piece")
+            if PIECELETTERS[move.promotion.value-1]!=promotion:
+                continue
+        elif promotion is not None:
+            continue
+        if legalmoves is None and not Position.is_legal(move):
+            continue
+        matches.append(move)
+    if len(matches)!=1:
+        raise ValueError(f"{san} is {'an ambiguous' if matches else 'not a legal'} move in this position")
+    return matches[0]
+
+def _normalize(san: str) -> str:
+    san=san.strip().rstrip(SUFFIXES).replace("0","O")
+    if len(san)>=2 and san[-1] in PROMOTIONLETTERS and san[-2]!="=" and san[0] in "abcdefgh":
+        san=san[:-1]+"="+san[-1]
+    return san
+
+def coordinate_to_move(Position: ChessPosition, text: str) -> Move:
+    """Returns: The legal move written in coordinate notation like e2e4 or e7e8q."""
+    text=text.strip().lower()
+    for move in Position.legalmovelist():
+        if str(move)==text:
+            return move
+    raise ValueError(f"{text} is not a legal move in this position")
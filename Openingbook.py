@@ -0,0 +1,152 @@
+"""Opening book: a sorted binary file of (position key, move, weight) entries, memory-mapped and searched by bisection.
+
+Entries use the 16 byte Polyglot layout, all big endian: 8 bytes key, 2 bytes move, 2 bytes weight, 4 bytes unused.
+A move packs the target square in bits 0-5, the start square in bits 6-11 (squares numbered row*8+column)
+and the promotion piece in bits 12-14 (0 none, 1 knight, 2 bishop, 3 rook, 4 queen). Castling is written as the king taking its rook.
+The keys are ChessPosition.Zobristkey, not the Polyglot keys, so books have to be built with build() from PGN files:
+
+    python Openingbook.py build games.pgn.gz book.bin --plies 20
+"""
+import argparse
+import mmap
+import random
+import struct
+from collections import defaultdict
+from Chessposition import ChessPosition, ChessPieces, Move, MoveFlags
+import PGNreader
+
+ENTRY=struct.Struct(">QHHI")
+KEY=struct.Struct(">Q")
+MAXWEIGHT=0xFFFF
+PROMOTIONCODES={ChessPieces.WhiteKnight: 1,ChessPieces.WhiteBishop: 2,ChessPieces.WhiteRook: 3,ChessPieces.WhiteQueen: 4}
+
+def encode_move(move: Move) -> int:
+    endcol=move.endcol
+    if move.flags&MoveFlags.Castling:
+        endcol=7 if move.endcol==6 else 0
+    promotion=0 if move.promotion is None else PROMOTIONCODES[move.promotion.white_version_of_self()]
+    return (promotion<<12)|((move.startrow*8+move.startcol)<<6)|(move.endrow*8+endcol)
+
+def decode_move(Position: ChessPosition, code: int) -> Move|None:
+    """Returns: The legal move of Position the code stands for, None if there is none."""
+    for move in Position.legal_moves():
+        if encode_move(move)==code:
+            return move
+    return None
+
+class OpeningBook():
+    """A book file opened with mmap: opening costs nothing and only the pages a probe touches are read."""
+    def __init__(self, path: str):
+        self.path:str = path
+        self.file=open(path,"rb")
+        size=self.file.seek(0,2)
+        if size%ENTRY.size:
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book, its size isn't a multiple of {ENTRY.size}")
+        self.entries:int = size//ENTRY.size
+        self.map=mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ) if size else None
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map=None
+        self.file.close()
+
+    def _key(self, index: int) -> int:
+        return KEY.unpack_from(self.map,index*ENTRY.size)[0]
+
+    def lookup(self, key: int) -> list[tuple[int,int]]:
+        """Returns: (move code, weight) of every entry for key."""
+        low,high=0,self.entries
+        while low<high:
+            middle=(low+high)//2
+            if self._key(middle)<key:
+                low=middle+1
+            else:
+                high=middle
+        found=[]
+        while low<self.entries:
+            entrykey,move,weight,_=ENTRY.unpack_from(self.map,low*ENTRY.size)
+            if entrykey!=key:
+                break
+            found.append((move,weight))
+            low+=1
+        return found
+
+    def moves(self, Position: ChessPosition) -> list[tuple[Move,int]]:
+        """Returns: The book moves of the position with their weights, heaviest first."""
+        found=[]
+        for code,weight in self.lookup(Position.Zobristkey):
+            move=decode_move(Position,code)
+            if move is not None:
+                found.append((move,weight))
+        return sorted(found,key=lambda entry: -entry[1])
+
+    def choose(self, Position: ChessPosition, rng: random.Random|None=None) -> Move|None:
+        """Returns: A book move, picked with probability proportional to its weight if rng is given, else the heaviest one."""
+        found=[(move,weight) for move,weight in self.moves(Position) if weight>0]
+        if not found:
+            return None
+        if rng is None:
+            return found[0][0]
+        return rng.choices([move for move,_ in found],[weight for _,weight in found])[0]
+
+def build(pgnpaths: list[str], output: str, plies: int=20, minimum: int=1, results: bool=True, workers: int|None=1) -> int:
+    """Writes a book with every move played in the first plies of the games, seen at least minimum times.
+
+    The weight of a move is how often it was played, with results counting a win of the moving side twice,
+    a draw once and a loss not at all. Weights are scaled down to fit into 16 bits if necessary,
+    but never below 1, so that every entry written stays playable.
+    Returns: The number of entries written."""
+    counts: defaultdict[tuple[int,int],list[int]]=defaultdict(lambda: [0,0])
+    for path in pgnpaths:
+        for game in PGNreader.read_games(path,workers):
+            score={"1-0": (2,0),"0-1": (0,2),"1/2-1/2": (1,1)}.get(game.result,(1,1))
+            for ply,(Position,move) in enumerate(game.replay()):
+                if ply>=plies:
+                    break
+                entry=counts[(Position.Zobristkey,encode_move(move))]
+                entry[0]+=1
+                entry[1]+=score[0] if Position.whitesmove else score[1]
+    weights={key: (entry[1] if results else entry[0]) for key,entry in counts.items() if entry[0]>=minimum}
+    heaviest=max(weights.values(),default=0)
+    scale=min(1.0,MAXWEIGHT/heaviest) if heaviest else 1.0
+    entries=sorted(((key,move,max(1,int(weight*scale))) for (key,move),weight in weights.items()),key=lambda entry: (entry[0],-entry[2],entry[1]))
+    with open(output,"wb") as file:
+        for key,move,weight in entries:
+            file.write(ENTRY.pack(key,move,weight,0))
+    return len(entries)
+
+def main():
+    parser=argparse.ArgumentParser(description="Build or probe an opening book")
+    commands=parser.add_subparsers(dest="command",required=True)
+    builder=commands.add_parser("build",help="build a book from PGN files")
+    builder.add_argument("pgnfiles",nargs="+")
+    builder.add_argument("output")
+    builder.add_argument("--plies",type=int,default=20,help="moves per game that go into the book")
+    builder.add_argument("--minimum",type=int,default=1,help="how often a move has to be played to be kept")
+    builder.add_argument("--frequency",action="store_true",help="weigh moves by how often they were played only, ignoring results")
+    builder.add_argument("--workers",type=int,default=1,help="processes reading the PGN files (0: one per core)")
+    prober=commands.add_parser("probe",help="list the book moves of a position")
+    prober.add_argument("book")
+    prober.add_argument("fen",nargs="?",default=None,help="position to look up (default: the starting position)")
+    args=parser.parse_args()
+    if args.command=="build":
+        print(f"{build(args.pgnfiles,args.output,args.plies,args.minimum,not args.frequency,args.workers or None)} entries written to {args.output}")
+    else:
+        Position=ChessPosition() if args.fen is None else ChessPosition.from_fen(args.fen)
+        with OpeningBook(args.book) as book:
+            for move,weight in book.moves(Position):
+                print(move,weight)
+
+if __name__=="__main__":
+    main()
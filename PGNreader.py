@@ -0,0 +1,162 @@
+"""Reads PGN archives game by game, plain or gzip-compressed, and resolves their SAN moves.
+
+Only one batch of games per worker is held in memory, so files of any size can be replayed:
+
+    for game in read_games("lichess.pgn.gz",workers=4):
+        for Position,move in game.replay():
+            ...
+"""
+import argparse
+import gzip
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Iterator, TextIO
+from Chessposition import ChessPosition, Move
+import Notation
+
+#Greedy, so unescaped quotes inside a value, which some writers produce, are kept
+HEADER=re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+#Comments, variation brackets, NAGs, move numbers, results and everything else as a move
+TOKEN=re.compile(r"\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{}();$]+")
+RESULTS={"1-0","0-1","1/2-1/2","*"}
+BATCHSIZE=64
+
+class PGNGame(NamedTuple):
+    headers: dict[str,str]
+    moves: list[Move]#Up to the first move that couldn't be read if there is an error
+    result: str
+    error: str|None
+
+    def start_position(self) -> ChessPosition:
+        if "FEN" in self.headers:
+            return ChessPosition.from_fen(self.headers["FEN"])
+        return ChessPosition()
+
+    def replay(self) -> Iterator[tuple[ChessPosition,Move]]:
+        """Yields: The position before every move together with the move.
+
+        It's the same position object each time, changed in place, so copy it to keep it."""
+        Position=self.start_position()
+        for move in self.moves:
+            yield Position,move
+            Position.make_move(move)
+
+    def final_position(self) -> ChessPosition:
+        Position=self.start_position()
+        for move in self.moves:
+            Position.make_move(move)
+        return Position
+
+def open_pgn(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path,"rt",encoding="utf-8",errors="replace")
+    return open(path,encoding="utf-8",errors="replace")
+
+def split_games(lines) -> Iterator[str]:
+    """Yields: The text of every game, split where a header line follows movetext."""
+    game: list[str]=[]
+    movetext=False
+    for line in lines:
+        stripped=line.strip()
+        if stripped.startswith("["):
+            if movetext:
+                yield "".join(game)
+                game=[]
+                movetext=False
+        elif stripped and not stripped.startswith("%"):
+            movetext=True
+        game.append(line)
+    if movetext or any(line.strip() for line in game):
+        yield "".join(game)
+
+def parse_game(text: str) -> PGNGame:
+    """Returns: The headers, moves and result of the text of one game. Comments and variations are skipped."""
+    headers={}
+    position=0
+    for line in text.splitlines(keepends=True):
+        if line.strip():
+            match=HEADER.match(line.strip())
+            if match is None:
+                break
+            headers[match.group(1)]=match.group(2).replace('\\"','"').replace("\\\\","\\")
+        position+=len(line)
+    result=headers.get("Result","*")
+    moves: list[Move]=[]
+    try:
+        Position=ChessPosition.from_fen(headers["FEN"]) if "FEN" in headers else ChessPosition()
+    except ValueError as error:
+        return PGNGame(headers,moves,result,str(error))
+    variationdepth=0
+    for token in TOKEN.findall(text,position):
+        first=token[0]
+        if first=="(":
+            variationdepth+=1
+        elif first==")":
+            variationdepth=max(0,variationdepth-1)
+        elif variationdepth or first in "{;$" or first.isdigit() and token.endswith("."):
+            continue
+        elif token in RESULTS:
+            result=token
+        else:
+            try:
+                move=Notation.san_to_move(Position,token)
+            except ValueError as error:
+                return PGNGame(headers,moves,result,f"Move {len(moves)//2+1}: {error}")
+            Position.make_move(move)
+            moves.append(move)
+    return PGNGame(headers,moves,result,None)
+
+def _parse_batch(texts: list[str]) -> list[PGNGame]:
+    return [parse_game(text) for text in texts]
+
+def _batches(games: Iterator[str], size: int) -> Iterator[list[str]]:
+    batch=[]
+    for game in games:
+        batch.append(game)
+        if len(batch)==size:
+            yield batch
+            batch=[]
+    if batch:
+        yield batch
+
+def read_games(path: str, workers: int|None=1, batchsize: int=BATCHSIZE) -> Iterator[PGNGame]:
+    """Yields: Every game of the file in order.
+
+    With more than one worker (None: one per core) the games are parsed in a process pool in batches of batchsize,
+    with at most two batches per worker waiting."""
+    workers=workers or os.cpu_count() or 1
+    with open_pgn(path) as file:
+        if workers==1:
+            for text in split_games(file):
+                yield parse_game(text)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending=deque()
+            for batch in _batches(split_games(file),batchsize):
+                pending.append(executor.submit(_parse_batch,batch))
+                if len(pending)>=2*workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+def main():
+    parser=argparse.ArgumentParser(description="Replay the games of a PGN file and report the throughput")
+    parser.add_argument("pgnfile")
+    parser.add_argument("--workers",type=int,default=1,help="number of processes (0: one per core)")
+    args=parser.parse_args()
+    start=time.perf_counter()
+    games=moves=errors=0
+    for game in read_games(args.pgnfile,args.workers or None):
+        games+=1
+        moves+=len(game.moves)
+        if game.error is not None:
+            errors+=1
+            print(f"Game {games} ({game.headers.get('White','?')} - {game.headers.get('Black','?')}): {game.error}")
+    seconds=time.perf_counter()-start
+    print(f"{games} games, {moves} moves, {errors} with errors in {seconds:.1f}s: {games/seconds if seconds else 0:.1f} games/s, {moves/seconds if seconds else 0:.0f} moves/s")
+
+if __name__=="__main__":
+    main()
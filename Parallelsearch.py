@@ -0,0 +1,104 @@
+"""Root-parallel search: the moves of the root position are searched by alphabeta in separate processes.
+
+The first move in search order is searched alone, its value then bounds the search of all other moves, which run in parallel.
+Positions are sent to the workers in their packed form (ChessPosition.to_packed) together with the halfmove clock and the keys of
+the positions since the last capture or pawn move, so the workers see repetitions and fifty-move draws like a serial search.
+The pool of worker processes is started by the first search and kept for the following ones, shutdown() ends it.
+Each root move gets a fresh transposition table, so the result doesn't depend on which worker searched what or when:
+the best value wins and ties go to the move ordered first.
+"""
+import atexit
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Any
+from Chessposition import ChessPosition
+from Search import Search
+
+class WorkerStats(NamedTuple):
+    moves: int
+    nodes: int
+    seconds: float
+
+class ParallelResult(NamedTuple):
+    position: Any#Position after the best move
+    move: Any
+    value: float#From white's point of view
+    nodes: int
+    workers: int
+    workerstats: dict[int,WorkerStats]#Keyed by process id
+    rootvalues: list[tuple[Any,float]]#Every root move with its value, in search order. Moves worse than the first one only get a bound
+
+_pool:ProcessPoolExecutor|None = None
+_poolworkers:int = 0
+
+def pool(workers: int) -> ProcessPoolExecutor:
+    """Returns: The pool of workers processes, started on first use and only restarted for another number of workers."""
+    global _pool, _poolworkers
+    if _pool is None or _poolworkers!=workers:
+        shutdown()
+        _pool=ProcessPoolExecutor(max_workers=workers)
+        _poolworkers=workers
+    return _pool
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool=None
+
+atexit.register(shutdown)
+
+def _search_root_move(encoded: bytes, halfmoveclock: int, history: tuple[int,...], move, depth: float, depth0method, quiescence: bool,
+                      alpha: float=-math.inf) -> tuple[float,int,int,float]:
+    """Returns: Value of the move for the player making it, nodes searched, process id and seconds spent.
+
+    Values up to alpha are only upper bounds."""
+    start=time.perf_counter()
+    Position=ChessPosition.from_packed(encoded)
+    Position.Halfmoveclock=halfmoveclock
+    Position.History=list(history)
+    Position.make_move(move)
+    search=Search(depth0method,quiescence=quiescence)
+    search.ply=1
+    value=search.known_value(Position)
+    if value is None:
+        value,_=search.alphabeta(Position,depth,-math.inf,-alpha)
+    return -value,search.nodes,os.getpid(),time.perf_counter()-start
+
+def parallel_search(Position: ChessPosition, depth: float, workers: int|None=None, depth0method=ChessPosition.eval_by_material, quiescence: bool=True) -> ParallelResult:
+    """Searches every root move in its own task on the pool of workers processes (default: one per core).
+
+    Returns: The best move and per-worker node statistics. Searches the same tree as ChessPosition.search(depth),
+    only the moves after the first are all cut off against its value instead of against the best one so far."""
+    workers=workers or os.cpu_count() or 1
+    moves=Position.legalmovelist()
+    sign=1 if Position.whitesmove else -1
+    rootsearch=Search(depth0method,quiescence=quiescence)
+    if quiescence:
+        depth=max(depth,1)
+    if len(moves)==0 or depth<=0:
+        value,move=rootsearch.run(Position,depth,moves)
+        return ParallelResult(Position if move is None else Position.apply(move),move,value,rootsearch.nodes,0,{},[])
+    moves=rootsearch.order_moves(Position,moves)
+    cost=math.log(len(moves))
+    material=Position.eval_by_material()
+    childdepths=[]
+    for move in moves:
+        undo=Position.make_move(move)
+        childdepths.append(rootsearch.childdepth(Position,depth,cost,material))
+        Position.unmake_move(undo)
+    root=(Position.to_packed(),Position.Halfmoveclock,tuple(Position.History[max(0,len(Position.History)-Position.Halfmoveclock):]))
+    executor=pool(workers)
+    results=[executor.submit(_search_root_move,*root,moves[0],childdepths[0],depth0method,quiescence).result()]
+    futures=[executor.submit(_search_root_move,*root,move,childdepth,depth0method,quiescence,results[0][0]) for move,childdepth in zip(moves[1:],childdepths[1:])]
+    results+=[future.result() for future in futures]
+    workerstats: dict[int,WorkerStats]={}
+    for value,nodes,pid,seconds in results:
+        previous=workerstats.get(pid,WorkerStats(0,0,0.0))
+        workerstats[pid]=WorkerStats(previous.moves+1,previous.nodes+nodes,previous.seconds+seconds)
+    bestindex=max(range(len(moves)),key=lambda i: (results[i][0],-i))
+    bestmove=moves[bestindex]
+    return ParallelResult(Position.apply(bestmove),bestmove,sign*results[bestindex][0],sum(result[1] for result in results),workers,workerstats,
+                          [(move,sign*result[0]) for move,result in zip(moves,results)])
@@ -0,0 +1,84 @@
+"""Perft benchmark and correctness check of the move generator.
+
+Counts the legal move sequences of reference positions, compares them with the published numbers
+and writes node counts and nodes per second to a JSON file, so runs on different commits can be compared:
+
+    python Perft.py --depth 3 --output perft.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+from Chessposition import ChessPosition
+
+#(name, FEN, perft results for depth 1, 2, ...)
+REFERENCE_POSITIONS=[
+    ("start","rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",[20,400,8902,197281,4865609]),
+    ("kiwipete","r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",[48,2039,97862,4085603]),
+    ("endgame","8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",[14,191,2812,43238,674624]),
+    ("promotions","r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",[6,264,9467,422333]),
+    ("middlegame","rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",[44,1486,62379,2103487]),
+    ("symmetric","r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",[46,2079,89890,3894594]),
+    ("en passant discovers check","8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",[15,126,1928,13931]),
+    ("en passant leaves king in check","8/5bk1/8/2Pp4/8/1K6/8/8 w - d6 0 1",[8,104,736,9287]),
+    ("short castling gives check","5k2/8/8/8/8/8/8/4K2R w K - 0 1",[15,66,1198,6399]),
+    ("long castling gives check","3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",[16,71,1286,7418]),
+    ("castling through attacked squares","r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",[26,1141,27826,1274206]),
+    ("castling rights lost by captures","r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",[44,1494,50509,1720476]),
+]
+
+def perft_by_possiblemoves(Position: ChessPosition, depth: int) -> int:
+    """Returns: perft, counted through possibleMoves instead of make_move/unmake_move."""
+    if depth==0:
+        return 1
+    children=Position.possibleMoves()
+    if depth==1:
+        return len(children)
+    return sum(perft_by_possiblemoves(child,depth-1) for child in children)
+
+def current_commit() -> str|None:
+    try:
+        return subprocess.run(["git","rev-parse","--short","HEAD"],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def run(maxdepth: int, names: list[str]|None=None, compare_depth: int=0) -> dict:
+    """Returns: Node counts, expected counts, time and nodes per second for every reference position and depth up to maxdepth.
+
+    Up to compare_depth the count is also taken through possibleMoves and both counts have to agree."""
+    results=[]
+    for name,fen,expected in REFERENCE_POSITIONS:
+        if names and name not in names:
+            continue
+        Position=ChessPosition.from_fen(fen)
+        for depth in range(1,maxdepth+1):
+            start=time.perf_counter()
+            nodes=Position.perft(depth)
+            seconds=time.perf_counter()-start
+            result={"name": name,"fen": fen,"depth": depth,"nodes": nodes,
+                    "expected": expected[depth-1] if depth<=len(expected) else None,
+                    "seconds": seconds,"nps": nodes/seconds if seconds else None}
+            result["correct"]=None if result["expected"] is None else nodes==result["expected"]
+            if depth<=compare_depth:
+                result["possiblemoves_agree"]=perft_by_possiblemoves(Position,depth)==nodes
+            results.append(result)
+            print(f"{name:35} depth {depth}: {nodes:>10} nodes {'' if result['correct'] is None else 'ok' if result['correct'] else 'WRONG, expected '+str(result['expected'])}  {result['nps'] or 0:>10.0f} nps")
+    return {"commit": current_commit(),"python": platform.python_version(),"maxdepth": maxdepth,"results": results}
+
+def main():
+    parser=argparse.ArgumentParser(description="Perft benchmark and correctness check of the move generator")
+    parser.add_argument("--depth",type=int,default=3,help="deepest perft to run on each position")
+    parser.add_argument("--output",default="perft.json",help="JSON file the results are written to")
+    parser.add_argument("--position",action="append",help="only run the named reference position (repeatable)")
+    parser.add_argument("--compare-depth",type=int,default=0,help="also count through possibleMoves up to this depth")
+    args=parser.parse_args()
+    report=run(args.depth,args.position,args.compare_depth)
+    with open(args.output,"w") as file:
+        json.dump(report,file,indent=1)
+    failures=[result for result in report["results"] if result["correct"] is False or result.get("possiblemoves_agree") is False]
+    if failures:
+        raise SystemExit(f"{len(failures)} perft results disagree")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Monte Carlo playouts: random games played to the end from a position, spread over a pool of processes.
+
+A playout runs on a PlayoutBoard, twelve bitboards plus a flat list of the piece on every square that are changed in place.
+Moves are picked uniformly among the legal ones: a random pseudo-legal move is tried and thrown out if it leaves the own king hanging.
+Results are from white's point of view: 1 if white mates, -1 if black mates and 0 for stalemate,
+a board with only kings left or a game cut off after maxplies.
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import Bitboards
+from Bitboards import PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, WHITE, BLACK
+
+MAXPLIES=400
+EMPTY=-1
+PROMOTIONS=[QUEEN,ROOK,BISHOP,KNIGHT]
+#Castlingrights lost when something moves from or to a corner square
+CORNERCASTLINGRIGHTS={0: 3,7: 1,56: 2,63: 0}
+
+class PlayoutResult(NamedTuple):
+    mean: float#From white's point of view
+    variance: float#Sample variance of the single results
+    games: int
+    plies: int#Plies played over all games
+    seconds: float
+    playoutspersecond: float
+
+class PlayoutBoard():
+    """A position reduced to what random games need. reset puts it back to the starting position without allocating."""
+    __slots__=("start","Pieceboards","pieces","whitesmove","enpassantablefile","Castlingrights")
+
+    def __init__(self, Pieceboards, whitesmove: bool, enpassantablefile: int|None, Castlingrights):
+        pieces=[EMPTY]*64
+        for index,bitboard in enumerate(Pieceboards):
+            for sq in Bitboards.squares(bitboard):
+                pieces[sq]=index
+        self.start=(list(Pieceboards),pieces,whitesmove,enpassantablefile,list(Castlingrights))
+        self.Pieceboards:list[int] = list(Pieceboards)
+        self.pieces:list[int] = pieces[:]
+        self.whitesmove:bool = whitesmove
+        self.enpassantablefile:int|None = enpassantablefile
+        self.Castlingrights:list[bool] = list(Castlingrights)
+
+    @classmethod
+    def from_position(cls, Position) -> "PlayoutBoard":
+        return cls(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile,Position.Castlingrights)
+
+    def reset(self) -> None:
+        Pieceboards,pieces,self.whitesmove,self.enpassantablefile,Castlingrights=self.start
+        self.Pieceboards[:]=Pieceboards
+        self.pieces[:]=pieces
+        self.Castlingrights[:]=Castlingrights
+
+    def _leaves_king_hanging(self, start: int, end: int) -> bool:
+        """Returns: Whether the pseudo-legal move start->end leaves the own king attacked. The board is unchanged afterwards."""
+        Pieceboards=self.Pieceboards
+        pieces=self.pieces
+        white=self.whitesmove
+        offset=WHITE if white else BLACK
+        piece=pieces[start]
+        captured=pieces[end]
+        capturesquare=end
+        if captured==EMPTY and piece==offset+PAWN and (start-end)%8!=0:
+            capturesquare=end-8 if white else end+8#en passant
+            captured=pieces[capturesquare]
+        occupied=0
+        for bitboard in Pieceboards:
+            occupied|=bitboard
+        occupied=(occupied&~(1<<start)&~(1<<capturesquare))|(1<<end)
+        Pieceboards[piece]^=(1<<start)|(1<<end)
+        if captured!=EMPTY:
+            Pieceboards[captured]^=1<<capturesquare
+        king=Pieceboards[offset+KING]
+        hanging=Bitboards.square_attacked_by(king.bit_length()-1,not white,Pieceboards,occupied)
+        Pieceboards[piece]^=(1<<start)|(1<<end)
+        if captured!=EMPTY:
+            Pieceboards[captured]^=1<<capturesquare
+        return hanging
+
+    def _move_piece(self, piece: int, start: int, end: int) -> None:
+        self.Pieceboards[piece]^=(1<<start)|(1<<end)
+        self.pieces[start]=EMPTY
+        self.pieces[end]=piece
+
+    def make_move(self, start: int, end: int, rng: random.Random) -> None:
+        """Plays a legal move. Promotions pick a random piece."""
+        Pieceboards=self.Pieceboards
+        pieces=self.pieces
+        white=self.whitesmove
+        offset=WHITE if white else BLACK
+        piece=pieces[start]
+        captured=pieces[end]
+        if captured!=EMPTY:
+            Pieceboards[captured]^=1<<end
+        self._move_piece(piece,start,end)
+        self.enpassantablefile=None
+        if piece==offset+PAWN:
+            if captured==EMPTY and (start-end)%8!=0:
+                capturesquare=end-8 if white else end+8#en passant
+                Pieceboards[pieces[capturesquare]]^=1<<capturesquare
+                pieces[capturesquare]=EMPTY
+            elif abs(end-start)==16:
+                self.enpassantablefile=end%8
+            elif end>=56 or end<8:
+                promotion=offset+rng.choice(PROMOTIONS)
+                Pieceboards[piece]^=1<<end
+                Pieceboards[promotion]|=1<<end
+                pieces[end]=promotion
+        elif piece==offset+KING:
+            if abs(end-start)==2:
+                if end>start:
+                    self._move_piece(offset+ROOK,end+1,end-1)
+                else:
+                    self._move_piece(offset+ROOK,end-2,end+1)
+            self.Castlingrights[int(white)]=False
+            self.Castlingrights[2+int(white)]=False
+        if start in CORNERCASTLINGRIGHTS:
+            self.Castlingrights[CORNERCASTLINGRIGHTS[start]]=False
+        if end in CORNERCASTLINGRIGHTS:
+            self.Castlingrights[CORNERCASTLINGRIGHTS[end]]=False
+        self.whitesmove=not white
+
+    def only_kings_left(self) -> bool:
+        Pieceboards=self.Pieceboards
+        for index,bitboard in enumerate(Pieceboards):
+            if bitboard and index!=WHITE+KING and index!=BLACK+KING:
+                return False
+        return True
+
+    def playout(self, rng: random.Random, maxplies: int=MAXPLIES) -> tuple[int,int]:
+        """Plays one random game from the current position, leaving the board at its end.
+
+        Returns: The result from white's point of view and the number of plies played."""
+        for ply in range(maxplies):
+            moves=Bitboards.pseudolegal_moves(self.Pieceboards,self.whitesmove,self.enpassantablefile,self.Castlingrights)
+            while moves:
+                index=rng.randrange(len(moves))
+                start,end=moves[index]
+                if not self._leaves_king_hanging(start,end):
+                    break
+                moves[index]=moves[-1]
+                moves.pop()
+            else:
+                offset=WHITE if self.whitesmove else BLACK
+                king=self.Pieceboards[offset+KING].bit_length()-1
+                occupied=Bitboards.occupancy(self.Pieceboards,True)|Bitboards.occupancy(self.Pieceboards,False)
+                if Bitboards.square_attacked_by(king,not self.whitesmove,self.Pieceboards,occupied):
+                    return (-1 if self.whitesmove else 1),ply
+                return 0,ply
+            self.make_move(start,end,rng)
+            if self.only_kings_left():
+                return 0,ply+1
+        return 0,maxplies
+
+def _run_playouts(encoded: tuple, games: int, seed: int, maxplies: int) -> tuple[int,int,int]:
+    """Returns: Sum and sum of squares of the results and the plies played."""
+    board=PlayoutBoard(*encoded)
+    rng=random.Random(seed)
+    total=squares=plies=0
+    for _ in range(games):
+        board.reset()
+        result,length=board.playout(rng,maxplies)
+        total+=result
+        squares+=result*result
+        plies+=length
+    return total,squares,plies
+
+def playouts(Position, games: int=100, workers: int|None=1, maxplies: int=MAXPLIES, seed: int|None=None) -> PlayoutResult:
+    """Plays games random games from Position, split evenly over workers processes (None: one per core, 1: in this process).
+
+    Every worker gets its own generator seeded from seed, so the result only depends on seed, games and workers.
+    Returns: Mean and variance of the results and the number of playouts per second."""
+    if games<=0:
+        raise ValueError("playouts needs at least one game")
+    workers=min(workers or os.cpu_count() or 1,games)
+    encoded=(tuple(Position.Pieceboards),Position.whitesmove,Position.enpassantablefile,tuple(Position.Castlingrights))
+    master=random.Random(seed)
+    seeds=[master.getrandbits(64) for _ in range(workers)]
+    shares=[games//workers+(1 if i<games%workers else 0) for i in range(workers)]
+    start=time.perf_counter()
+    if workers==1:
+        results=[_run_playouts(encoded,games,seeds[0],maxplies)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures=[executor.submit(_run_playouts,encoded,share,workerseed,maxplies) for share,workerseed in zip(shares,seeds)]
+            results=[future.result() for future in futures]
+    seconds=time.perf_counter()-start
+    total=sum(result[0] for result in results)
+    squares=sum(result[1] for result in results)
+    plies=sum(result[2] for result in results)
+    mean=total/games
+    variance=(squares-games*mean*mean)/(games-1) if games>1 else 0.0
+    return PlayoutResult(mean,variance,games,plies,seconds,games/seconds if seconds else math.inf)
@@ -0,0 +1,366 @@
+"""Tree search over ChessPositions, making and unmaking moves in place."""
+import math
+import threading
+import time
+from typing import NamedTuple, Any
+from Transpositiontable import TranspositionTable, Bound
+
+HASHMOVE_SCORE=10000
+PROMOTION_SCORE=1000
+CAPTURE_SCORE=100
+ASPIRATION_WINDOW=0.5#Half a pawn around the previous iteration's value
+DELTA_MARGIN=2#Captures that can't bring the value within two pawns of alpha are skipped in quiescence
+MAXDEPTH=64
+MATEVALUE=1000#Value of a won position, less the plies to mate, so that search prefers quicker mates
+MATETHRESHOLD=MATEVALUE/2#Values further from 0 are mates, no evaluation comes near
+
+def value_to_table(value: float, ply: int) -> float:
+    """Returns: A value of a node ply plies below the root with its mate counted from the node, as the transposition table keeps it."""
+    if value>=MATETHRESHOLD:
+        return value+ply
+    if value<=-MATETHRESHOLD:
+        return value-ply
+    return value
+
+def value_from_table(value: float, ply: int) -> float:
+    """Returns: A value with its mate counted from a node ply plies below the root counted from the root instead."""
+    if value>=MATETHRESHOLD:
+        return value-ply
+    if value<=-MATETHRESHOLD:
+        return value+ply
+    return value
+
+class SearchStopped(Exception):
+    """Raised inside the search once its time or node budget is spent or stop was called."""
+
+class SearchResult(NamedTuple):
+    position: Any#Position after the best move
+    move: Any
+    value: float#From white's point of view
+    depth: float#Depth of the last completed iteration
+    pv: list#Principal variation, starting with move
+    nodes: int
+
+class Search():
+    """One search: the leaf evaluation (depth0method), the transposition table and the number of nodes visited.
+
+    run returns values from white's point of view like ChessPosition.eval. alphabeta scores for the player to move
+    (negamax) and so does the transposition table.
+    With quiescence every move costs one ply and leaves are resolved by a search of captures and promotions,
+    which stands pat on depth0method. Without it leaves take depth0method directly and moves cost less the more forcing they are.
+    Being mated scores -(MATEVALUE-ply), ply counting the moves from the root, so quicker mates score higher.
+    A move into a repetition or a fifty-move draw scores 0 without being searched,
+    and with a Tablebase.Tablebase a move into an endgame it covers scores its tablebase value."""
+    def __init__(self, depth0method, table: TranspositionTable|None=None, alphabeta: bool=True, quiescence: bool=True, tablebase=None):
+        self.depth0method=depth0method
+        self.table:TranspositionTable = TranspositionTable() if table is None else table
+        self.use_alphabeta:bool = alphabeta
+        self.use_quiescence:bool = quiescence
+        self.tablebase=tablebase
+        self.nodes:int = 0
+        self.ply:int = 0#Moves made since the root
+        self.value:float = 0.0
+        self.move=None
+        self.nodelimit:float = math.inf
+        self.deadline:float = math.inf
+        self.deadlineset:bool = False#set_time was called, so iterative_deepening keeps the deadline
+        self.budgetlock:threading.Lock = threading.Lock()
+        self.stopped:bool = False
+
+    def stop(self) -> None:
+        """Ends the search at the next node, from any thread. iterative_deepening then returns its last completed iteration."""
+        self.stopped=True
+
+    def set_time(self, time_ms: float) -> None:
+        """Gives iterative_deepening time_ms milliseconds from now instead of its own time budget, from any thread.
+        Called before iterative_deepening has started, the deadline is kept once it does."""
+        with self.budgetlock:
+            self.deadline=time.perf_counter()+time_ms/1000
+            self.deadlineset=True
+
+    def check_budget(self) -> None:
+        if self.stopped or self.nodes>=self.nodelimit or time.perf_counter()>=self.deadline:
+            raise SearchStopped()
+
+    def run(self, Position, depth: float, moves: list|None=None) -> tuple[float,object]:
+        """Returns: Evaluation of the position and the best move. Also kept as self.value and self.move.
+
+        With quiescence the root is always searched at least one ply deep, so there is a move."""
+        if self.use_quiescence:
+            depth=max(depth,1)
+        if self.use_alphabeta:
+            value,move=self.alphabeta(Position,depth,-math.inf,math.inf,moves)
+            if not Position.whitesmove:
+                value=-value
+        else:
+            value,move=self.minimax(Position,depth,moves)
+        self.value,self.move=value,move
+        return value,move
+
+    def minimax(self, Position, depth: float, moves: list|None=None) -> tuple[float,object]:
+        """Returns: Evaluation of the position and the best move, looking at every move."""
+        self.nodes+=1
+        sign=1 if Position.whitesmove else -1
+        entry=self.table.probe(Position.Zobristkey)
+        if entry is not None and entry.depth>=depth and entry.bound==Bound.Exact:
+            return sign*value_from_table(entry.value,self.ply),entry.move
+        if moves is None:
+            moves=self.generate_moves(Position)
+        if len(moves)==0:
+            #Player is out of moves so he either lost or it's a draw
+            value=self.ply-MATEVALUE if Position.is_check() else 0
+            self.table.store(Position.Zobristkey,math.inf,value_to_table(value,self.ply),Bound.Exact)
+            return sign*value,None
+        if depth<=0:
+            if self.use_quiescence:
+                return sign*self.quiescence(Position,-math.inf,math.inf),None
+            return self.depth0method(Position),None
+
+        cost=math.log(len(moves))#Incentivizing forcing moves
+        material=Position.eval_by_material()
+        bestevaluation=0.0
+        bestmove=None
+        for move in moves:
+            undo=Position.make_move(move)
+            self.ply+=1
+            known=self.known_value(Position)
+            if known is None:
+                evaluation,_=self.minimax(Position,self.childdepth(Position,depth,cost,material))
+            else:
+                evaluation=known if Position.whitesmove else -known
+            self.ply-=1
+            Position.unmake_move(undo)
+            if bestmove is None or (evaluation>bestevaluation if Position.whitesmove else evaluation<bestevaluation):
+                bestevaluation,bestmove=evaluation,move
+        self.table.store(Position.Zobristkey,depth,value_to_table(sign*bestevaluation,self.ply),Bound.Exact,bestmove)
+        return bestevaluation,bestmove
+
+    def alphabeta(self, Position, depth: float, alpha: float, beta: float, moves: list|None=None) -> tuple[float,object]:
+        """Returns: Evaluation of the position for the player to move and the best move.
+
+        Values outside of (alpha, beta) are only bounds: lines the opponent would avoid are cut off.
+        Uses the same depth cost as minimax, so both search the same tree."""
+        if depth<=0 and self.use_quiescence:
+            return self.quiescence(Position,alpha,beta),None
+        self.check_budget()
+        self.nodes+=1
+        key=Position.Zobristkey
+        entry=self.table.probe(key)
+        hashmove=None
+        if entry is not None:
+            hashmove=entry.move
+            if entry.depth>=depth:
+                value=value_from_table(entry.value,self.ply)
+                if entry.bound==Bound.Exact or (entry.bound==Bound.Lower and value>=beta) or (entry.bound==Bound.Upper and value<=alpha):
+                    return value,entry.move
+        if moves is None:
+            moves=self.generate_moves(Position)
+        if len(moves)==0:
+            value=self.ply-MATEVALUE if Position.is_check() else 0
+            self.table.store(key,math.inf,value_to_table(value,self.ply),Bound.Exact)
+            return value,None
+        if depth<=0:
+            return (1 if Position.whitesmove else -1)*self.depth0method(Position),None
+
+        cost=math.log(len(moves))#Incentivizing forcing moves
+        material=Position.eval_by_material()
+        originalalpha=alpha
+        bestevaluation=-math.inf
+        bestmove=None
+        for move in self.order_moves(Position,moves,hashmove):
+            undo=Position.make_move(move)
+            self.ply+=1
+            try:
+                evaluation=self.known_value(Position)
+                if evaluation is None:
+                    evaluation,_=self.alphabeta(Position,self.childdepth(Position,depth,cost,material),-beta,-alpha)
+            finally:
+                self.ply-=1
+                Position.unmake_move(undo)
+            evaluation=-evaluation
+            if bestmove is None or evaluation>bestevaluation:
+                bestevaluation,bestmove=evaluation,move
+            alpha=max(alpha,evaluation)
+            if alpha>=beta:
+                break
+        if bestevaluation<=originalalpha:
+            bound=Bound.Upper
+        elif bestevaluation>=beta:
+            bound=Bound.Lower
+        else:
+            bound=Bound.Exact
+        self.table.store(key,depth,value_to_table(bestevaluation,self.ply),bound,bestmove)
+        return bestevaluation,bestmove
+
+    def generate_moves(self, Position) -> list:
+        """Returns: The legal moves of a node. Subclasses like Searchstats.InstrumentedSearch hook in here."""
+        return Position.legalmovelist()
+
+    def generate_noisy_moves(self, Position) -> list:
+        """Returns: The legal captures and promotions of a quiescence node that isn't in check."""
+        return Position.noisy_movelist()
+
+    def known_value(self, Position) -> float|None:
+        """Returns: The value of the position a move just led to for the player to move if it needs no search, else None.
+
+        Repeating a position of the search path once is scored as the draw it would become, since the side that could avoid it
+        has already had the chance. Tablebase values come next, their mates counted from the root."""
+        if Position.is_repetition() or (Position.Halfmoveclock>=100 and Position.is_draw()):
+            return 0.0
+        if self.tablebase is None:
+            return None
+        value=self.tablebase.value(Position)
+        return None if value is None else value_from_table(value,self.ply)
+
+    def childdepth(self, Position, depth: float, cost: float, material: float) -> float:
+        """Returns: The depth left after the move just made on Position.
+
+        One ply with quiescence, otherwise cost (log of the number of moves) shrunk by the material the move changed."""
+        if self.use_quiescence:
+            return depth-1
+        directgain:float =abs(material-Position.eval_by_material())#incentivizing captures
+        return depth-(cost/(1+directgain))
+
+    def quiescence(self, Position, alpha: float, beta: float) -> float:
+        """Returns: Evaluation of the position for the player to move once no captures or promotions are left.
+
+        The player to move may stand pat on depth0method instead of capturing, unless in check, where every evasion is tried.
+        Out of check only captures and promotions are generated, once standing pat didn't already reach beta, so stalemates
+        are only recognised by the main search. Captures that couldn't raise the value to alpha even with two pawns to spare
+        are skipped (delta pruning)."""
+        self.check_budget()
+        self.nodes+=1
+        incheck=Position.is_check()
+        if incheck:
+            moves=self.generate_moves(Position)
+            if len(moves)==0:
+                return self.ply-MATEVALUE
+            standpat=-math.inf
+        else:
+            standpat=(1 if Position.whitesmove else -1)*self.depth0method(Position)
+            if standpat>=beta:
+                return standpat
+            alpha=max(alpha,standpat)
+            moves=self.generate_noisy_moves(Position)
+        Board=Position.Board
+        bestevaluation=standpat
+        for move in self.order_moves(Position,moves):
+            if not incheck and move.promotion is None:
+                victim=Board[move.endrow][move.endcol]
+                gain=1 if victim is None else abs(victim.pointvalue_in_game())#en passant takes a pawn
+                if standpat+gain+DELTA_MARGIN<alpha:
+                    continue
+            undo=Position.make_move(move)
+            self.ply+=1
+            try:
+                evaluation=self.known_value(Position)
+                evaluation=-(self.quiescence(Position,-beta,-alpha) if evaluation is None else evaluation)
+            finally:
+                self.ply-=1
+                Position.unmake_move(undo)
+            if evaluation>bestevaluation:
+                bestevaluation=evaluation
+            alpha=max(alpha,evaluation)
+            if alpha>=beta:
+                break
+        return bestevaluation
+
+    def order_moves(self, Position, moves: list, hashmove=None) -> list:
+        """Returns: moves sorted so that the hash move comes first, then promotions, then captures by MVV-LVA."""
+        Board=Position.Board
+        def score(move) -> float:
+            if move==hashmove:
+                return HASHMOVE_SCORE
+            value=0.0
+            if move.promotion is not None:
+                value+=PROMOTION_SCORE+abs(move.promotion.pointvalue_in_game())
+            attacker=Board[move.startrow][move.startcol]
+            victim=Board[move.endrow][move.endcol]
+            if victim is None and attacker.is_pawn() and move.startcol!=move.endcol:
+                victim=attacker#en passant
+            if victim is not None:
+                value+=CAPTURE_SCORE+10*abs(victim.pointvalue_in_game())-abs(attacker.pointvalue_in_game())
+            return value
+        return sorted(moves,key=score,reverse=True)
+
+    def iterative_deepening(self, Position, time_ms: float|None=None, nodes: int|None=None, maxdepth: float|None=None, oniteration=None) -> SearchResult:
+        """Searches with alphabeta to depth 1, 2, 3, ... until the time (in milliseconds) or node budget is spent.
+
+        Every iteration after the first starts with a window around the previous value and only widens it if the value falls outside.
+        The transposition table carries the best moves of an iteration over to order the next one.
+        Once an iteration finds a mate within its depth, there is no quicker one and the search ends.
+        oniteration, if given, is called with the SearchResult of every completed iteration.
+        A deadline given with set_time replaces time_ms.
+        Returns: The best move of the last completed iteration."""
+        with self.budgetlock:
+            if time_ms is None and nodes is None and maxdepth is None and not self.deadlineset:
+                raise ValueError("iterative_deepening needs a time, node or depth limit")
+            if not self.deadlineset:
+                self.deadline=math.inf if time_ms is None else time.perf_counter()+time_ms/1000
+        self.nodelimit=math.inf if nodes is None else nodes
+        sign=1 if Position.whitesmove else -1
+        moves=Position.legalmovelist()
+        if len(moves)==0:
+            self._clear_budget()
+            value,_=self.minimax(Position,0,moves)
+            return SearchResult(Position,None,value,0,[],self.nodes)
+        #Fallback in case not even the first iteration completes
+        move=self.order_moves(Position,moves,self._hashmove(Position))[0]
+        value=sign*self.depth0method(Position)
+        completeddepth=0
+        depth=1
+        while depth<=min(MAXDEPTH,math.inf if maxdepth is None else maxdepth):
+            try:
+                value,move=self._aspiration_search(Position,depth,value if completeddepth else None,moves)
+            except SearchStopped:
+                break
+            completeddepth=depth
+            if oniteration is not None:
+                oniteration(SearchResult(Position.apply(move),move,sign*value,depth,self.principal_variation(Position,move,depth),self.nodes))
+            if abs(value)>=MATETHRESHOLD and MATEVALUE-abs(value)<=depth:
+                break
+            depth+=1
+        self._clear_budget()
+        self.value,self.move=sign*value,move
+        return SearchResult(Position.apply(move),move,sign*value,completeddepth,self.principal_variation(Position,move,completeddepth),self.nodes)
+
+    def _clear_budget(self) -> None:
+        with self.budgetlock:
+            self.deadline=self.nodelimit=math.inf
+            self.deadlineset=False
+
+    def _aspiration_search(self, Position, depth: float, previousvalue: float|None, moves: list) -> tuple[float,object]:
+        if previousvalue is None or abs(previousvalue)>=MATETHRESHOLD:
+            return self.alphabeta(Position,depth,-math.inf,math.inf,moves)
+        window=ASPIRATION_WINDOW
+        while True:
+            alpha=previousvalue-window
+            beta=previousvalue+window
+            value,move=self.alphabeta(Position,depth,alpha,beta,moves)
+            if alpha<value<beta:
+                return value,move
+            window*=4
+            if window>100:
+                return self.alphabeta(Position,depth,-math.inf,math.inf,moves)
+
+    def _hashmove(self, Position):
+        entry=self.table.probe(Position.Zobristkey)
+        return None if entry is None else entry.move
+
+    def principal_variation(self, Position, move, depth: float) -> list:
+        """Returns: move followed by the best moves the transposition table remembers for the positions after it."""
+        pv=[move]
+        undos=[Position.make_move(move)]
+        seen={Position.Zobristkey}
+        while len(pv)<max(1,int(depth)):
+            move=self._hashmove(Position)
+            if move is None or move not in Position.legalmovelist():
+                break
+            pv.append(move)
+            undos.append(Position.make_move(move))
+            if Position.Zobristkey in seen:
+                break
+            seen.add(Position.Zobristkey)
+        for undo in reversed(undos):
+            Position.unmake_move(undo)
+        return pv
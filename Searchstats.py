@@ -0,0 +1,217 @@
+"""Instrumentation of a search: node counters, wall time per phase and a Chrome trace, to find out where the time goes.
+
+A plain Search counts nothing but its nodes, so searches without instrumentation don't pay for it. InstrumentedSearch is a Search
+that times its phases (move generation, leaf evaluation, move ordering, known-value lookups, quiescence trees) and counts into
+a SearchStats:
+
+    stats=SearchStats(trace=True)
+    ChessPosition.from_fen(fen).search(4,stats=stats)
+    print(stats.report())
+    stats.write_trace("search.json")#Open in chrome://tracing or ui.perfetto.dev
+
+or from the command line: python Searchstats.py "<fen>" --time 2000 --trace search.json
+Phase times are inclusive: quiescence contains the move generation and evaluation done inside it.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from Search import Search, SearchResult
+
+MAXEVENTS=200000#Trace events kept per SearchStats, the counters go on after that
+
+class SearchStats():
+    """Counters and phase timings, added up over every search that is given this object."""
+    def __init__(self, trace: bool=False, maxevents: int=MAXEVENTS):
+        self.searches:int = 0
+        self.nodes:int = 0#All nodes, as Search.nodes counts them
+        self.quiescencenodes:int = 0#The nodes of them in quiescence
+        self.leafevaluations:int = 0
+        self.movesgenerated:int = 0
+        self.legalityrejections:int = 0#Pseudo-legal moves the legal move generator threw out
+        self.ttprobes:int = 0
+        self.tthits:int = 0
+        self.cutoffs:int = 0#Main search nodes that failed high
+        self.quiescencecutoffs:int = 0#Quiescence nodes that failed high after searching captures
+        self.standpatcutoffs:int = 0#Quiescence nodes whose static evaluation alone reached beta
+        self.knownvalues:int = 0#Repetitions, fifty-move draws and tablebase hits
+        self.seconds:float = 0.0
+        self.phaseseconds:defaultdict[str,float] = defaultdict(float)
+        self.phasecalls:defaultdict[str,int] = defaultdict(int)
+        self.trace:bool = trace
+        self.maxevents:int = maxevents
+        self.events:list[dict] = []
+        self.origin:float = time.perf_counter()
+
+    def add(self, phase: str, start: float, end: float) -> None:
+        """Books the time from start to end (time.perf_counter) on phase and, when tracing, as a trace event."""
+        self.phaseseconds[phase]+=end-start
+        self.phasecalls[phase]+=1
+        if self.trace and len(self.events)<self.maxevents:
+            self.events.append({"name": phase,"ph": "X","ts": (start-self.origin)*1e6,"dur": (end-start)*1e6,
+                                "pid": os.getpid(),"tid": threading.get_ident()})
+
+    def nps(self) -> float:
+        return self.nodes/self.seconds if self.seconds else 0.0
+
+    def counters(self) -> dict[str,float]:
+        """Returns: Every counter by name, e.g. to log or compare runs."""
+        return {"searches": self.searches,"nodes": self.nodes,"quiescencenodes": self.quiescencenodes,"leafevaluations": self.leafevaluations,
+                "movesgenerated": self.movesgenerated,"legalityrejections": self.legalityrejections,"ttprobes": self.ttprobes,
+                "tthits": self.tthits,"cutoffs": self.cutoffs,"quiescencecutoffs": self.quiescencecutoffs,
+                "standpatcutoffs": self.standpatcutoffs,"knownvalues": self.knownvalues,"seconds": self.seconds,"nps": self.nps()}
+
+    def report(self) -> str:
+        """Returns: The counters and a table of the phases with their share of the search time."""
+        lines=[f"{self.nodes} nodes, {self.quiescencenodes} of them in quiescence, in {self.seconds:.3f}s ({self.nps():.0f} nps), {self.searches} searches",
+               f"{self.leafevaluations} leaf evaluations, {self.movesgenerated} moves generated, {self.legalityrejections} legality rejections",
+               f"{self.tthits} of {self.ttprobes} transposition table probes hit ({100*self.tthits/self.ttprobes if self.ttprobes else 0:.1f}%), "
+               f"{self.cutoffs} cutoffs, {self.quiescencecutoffs} quiescence cutoffs, {self.standpatcutoffs} stand-pat cutoffs, {self.knownvalues} known values",
+               f"{'phase':12} {'seconds':>9} {'calls':>9} {'share':>6}"]
+        for phase,seconds in sorted(self.phaseseconds.items(),key=lambda item: -item[1]):
+            share=100*seconds/self.seconds if self.seconds else 0.0
+            lines.append(f"{phase:12} {seconds:9.3f} {self.phasecalls[phase]:9} {share:5.1f}%")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        """Returns: The trace events with the final counters, in the Chrome trace event format."""
+        counters={"name": "counters","ph": "C","ts": (time.perf_counter()-self.origin)*1e6,"pid": os.getpid(),"tid": threading.get_ident(),
+                  "args": {name: value for name,value in self.counters().items() if name not in ("seconds","nps")}}
+        return {"traceEvents": self.events+[counters],"displayTimeUnit": "ms"}
+
+    def write_trace(self, path: str) -> None:
+        with open(path,"w") as file:
+            json.dump(self.chrome_trace(),file)
+
+class InstrumentedSearch(Search):
+    """A Search that counts and times into stats (a fresh SearchStats if none is given). Searches the same tree as Search."""
+    def __init__(self, depth0method, table=None, alphabeta: bool=True, quiescence: bool=True, tablebase=None, stats: SearchStats|None=None):
+        super().__init__(depth0method,table,alphabeta,quiescence,tablebase)
+        self.stats:SearchStats = SearchStats() if stats is None else stats
+        self.evaluation=depth0method
+        self.depth0method=self._evaluate
+        self.inquiescence:bool = False
+        self.rejected:list[int] = [0]#Filled in by the move generator, see Bitboards.legal_moves
+        self.generations:int = 0
+
+    def _evaluate(self, Position) -> float:
+        start=time.perf_counter()
+        value=self.evaluation(Position)
+        self.stats.add("evaluation",start,time.perf_counter())
+        self.stats.leafevaluations+=1
+        return value
+
+    def _measured(self, phase: str, function, *args):
+        """Returns: What function returns, with the search's time, node and table counters booked on stats."""
+        stats=self.stats
+        nodes,probes,hits=self.nodes,self.table.probes,self.table.hits
+        start=time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            end=time.perf_counter()
+            stats.add(phase,start,end)
+            stats.searches+=1
+            stats.seconds+=end-start
+            stats.nodes+=self.nodes-nodes
+            stats.ttprobes+=self.table.probes-probes
+            stats.tthits+=self.table.hits-hits
+            stats.legalityrejections+=self.rejected[0]
+            self.rejected[0]=0
+
+    def run(self, Position, depth: float, moves: list|None=None) -> tuple[float,object]:
+        return self._measured("search",super().run,Position,depth,moves)
+
+    def iterative_deepening(self, Position, time_ms: float|None=None, nodes: int|None=None, maxdepth: float|None=None, oniteration=None) -> SearchResult:
+        iterationstart=time.perf_counter()
+        def timed_iteration(result: SearchResult) -> None:
+            nonlocal iterationstart
+            end=time.perf_counter()
+            self.stats.add(f"depth {result.depth:g}",iterationstart,end)
+            iterationstart=end
+            if oniteration is not None:
+                oniteration(result)
+        return self._measured("search",super().iterative_deepening,Position,time_ms,nodes,maxdepth,timed_iteration)
+
+    def alphabeta(self, Position, depth: float, alpha: float, beta: float, moves: list|None=None) -> tuple[float,object]:
+        value,move=super().alphabeta(Position,depth,alpha,beta,moves)
+        if depth>0 and value>=beta:
+            self.stats.cutoffs+=1
+        return value,move
+
+    def quiescence(self, Position, alpha: float, beta: float) -> float:
+        self.stats.quiescencenodes+=1
+        generations=self.generations
+        if self.inquiescence:
+            value=super().quiescence(Position,alpha,beta)
+        else:
+            #Only whole quiescence trees are timed, one event per leaf of the main search
+            self.inquiescence=True
+            start=time.perf_counter()
+            try:
+                value=super().quiescence(Position,alpha,beta)
+            finally:
+                self.inquiescence=False
+                self.stats.add("quiescence",start,time.perf_counter())
+        if value>=beta:
+            #Without generating moves a quiescence node can only fail high by standing pat
+            if self.generations==generations:
+                self.stats.standpatcutoffs+=1
+            else:
+                self.stats.quiescencecutoffs+=1
+        return value
+
+    def generate_moves(self, Position) -> list:
+        start=time.perf_counter()
+        moves=Position.legalmovelist(self.rejected)
+        self.stats.add("movegen",start,time.perf_counter())
+        self.stats.movesgenerated+=len(moves)
+        self.generations+=1
+        return moves
+
+    def generate_noisy_moves(self, Position) -> list:
+        start=time.perf_counter()
+        moves=Position.noisy_movelist(self.rejected)
+        self.stats.add("movegen",start,time.perf_counter())
+        self.stats.movesgenerated+=len(moves)
+        self.generations+=1
+        return moves
+
+    def order_moves(self, Position, moves: list, hashmove=None) -> list:
+        start=time.perf_counter()
+        ordered=super().order_moves(Position,moves,hashmove)
+        self.stats.add("ordering",start,time.perf_counter())
+        return ordered
+
+    def known_value(self, Position) -> float|None:
+        start=time.perf_counter()
+        value=super().known_value(Position)
+        self.stats.add("known",start,time.perf_counter())
+        if value is not None:
+            self.stats.knownvalues+=1
+        return value
+
+def main():
+    from Chessposition import ChessPosition
+    parser=argparse.ArgumentParser(description="Search a position with instrumentation and report where the time goes")
+    parser.add_argument("fen",nargs="?",default=None,help="position to search (default: the starting position)")
+    parser.add_argument("--depth",type=float,help="maximal depth")
+    parser.add_argument("--time",type=float,help="milliseconds to search")
+    parser.add_argument("--nodes",type=int)
+    parser.add_argument("--trace",help="write a Chrome trace JSON file")
+    args=parser.parse_args()
+    if args.depth is None and args.time is None and args.nodes is None:
+        args.depth=3
+    Position=ChessPosition() if args.fen is None else ChessPosition.from_fen(args.fen)
+    stats=SearchStats(trace=args.trace is not None)
+    result=InstrumentedSearch(ChessPosition.eval_without_depth,stats=stats).iterative_deepening(Position,args.time,args.nodes,args.depth)
+    print(f"Best move {result.move}, value {result.value}, depth {result.depth}")
+    print(stats.report())
+    if args.trace:
+        stats.write_trace(args.trace)
+        print(f"Trace with {len(stats.events)} events written to {args.trace}")
+
+if __name__=="__main__":
+    main()
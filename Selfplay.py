@@ -0,0 +1,214 @@
+"""Self-play training data: games of the engine against itself, written as (position, search score, game result) records
+into shards of SHARDSIZE records, .npy files that the reader memory-maps:
+
+    python Selfplay.py data --games 10000 --workers 4 --policy bestmove --depth 2
+
+Every game is played in a worker process and sent back whole, and this process appends its records to the shards.
+A shard is written under a temporary name and renamed once complete, so an interrupted run leaves only whole shards behind.
+A new run continues the numbering after the highest shard in the directory. The last shard of a run may be shorter.
+"""
+import argparse
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from Chessposition import ChessPosition
+from Search import Search
+import Batchevaluation
+
+SHARDSIZE=1<<16
+MAXPLIES=300#Games still going after this many plies count as draws
+GAMESPERTASK=4
+SHARDNAME=re.compile(r"^shard_(\d{6})\.npy$")
+#pieceboards are the twelve bitboards indexed by ChessPieces.value-1, castling has bit i set for Castlingrights[i],
+#enpassant is the en-passant file or -1, score and result are from white's point of view, result 1, 0 or -1.
+#Mates the search finds are scored as +-(Search.MATEVALUE less the plies to mate)
+RECORD=np.dtype([("pieceboards","<u8",(12,)),("whitesmove","u1"),("castling","u1"),("enpassant","i1"),("ply","<u2"),
+                 ("score","<f4"),("result","i1")])
+POLICIES=("bestmove","random")
+
+def _record(Position: ChessPosition, ply: int, score: float) -> tuple:
+    castling=sum(1<<i for i,right in enumerate(Position.Castlingrights) if right)
+    return (tuple(Position.Pieceboards),Position.whitesmove,castling,-1 if Position.enpassantablefile is None else Position.enpassantablefile,ply,score,0)
+
+def play_game(rng: random.Random, policy: str="bestmove", depth: float=2, randomplies: int=8, maxplies: int=MAXPLIES) -> np.ndarray:
+    """Plays one game from the starting position.
+
+    The first randomplies plies are random moves, so that games differ. After that the bestmove policy plays the move of a search
+    to depth and records its value; the random policy plays random moves and records eval_without_depth.
+    Returns: The records of the positions before every move, labelled with the result of the game."""
+    Position=ChessPosition()
+    records=[]
+    result=0
+    for ply in range(maxplies):
+        if Position.is_draw():
+            break
+        moves=Position.legalmovelist()
+        if not moves:
+            if Position.is_check():
+                result=-1 if Position.whitesmove else 1
+            break
+        if policy=="random" or ply<randomplies:
+            move=rng.choice(moves)
+            score=ChessPosition.eval_without_depth(Position)
+        else:
+            score,move=Search(ChessPosition.eval_without_depth).run(Position,depth,moves)
+        records.append(_record(Position,ply,score))
+        Position.make_move(move)
+    array=np.array(records,dtype=RECORD)
+    array["result"]=result
+    return array
+
+def _play_games(games: int, seed: int, policy: str, depth: float, randomplies: int, maxplies: int) -> list[np.ndarray]:
+    rng=random.Random(seed)
+    return [play_game(rng,policy,depth,randomplies,maxplies) for _ in range(games)]
+
+def shard_numbers(directory: str) -> list[int]:
+    """Returns: The numbers of the complete shards in the directory, in order."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(match.group(1)) for match in map(SHARDNAME.match,os.listdir(directory)) if match)
+
+class ShardWriter():
+    """Appends records to shards of shardsize records, numbered on from the shards already in the directory."""
+    def __init__(self, directory: str, shardsize: int=SHARDSIZE):
+        os.makedirs(directory,exist_ok=True)
+        self.directory:str = directory
+        self.shardsize:int = shardsize
+        numbers=shard_numbers(directory)
+        self.number:int = numbers[-1]+1 if numbers else 0
+        self.shard:np.memmap|None = None
+        self.filled:int = 0
+        self.written:int = 0#Records in completed shards
+
+    def path(self, number: int) -> str:
+        return os.path.join(self.directory,f"shard_{number:06d}.npy")
+
+    def _open(self, size: int) -> None:
+        self.shard=np.lib.format.open_memmap(self.path(self.number)+".tmp",mode="w+",dtype=RECORD,shape=(size,))
+        self.filled=0
+
+    def _finish(self) -> None:
+        self.shard.flush()
+        del self.shard
+        self.shard=None
+        os.replace(self.path(self.number)+".tmp",self.path(self.number))
+        self.number+=1
+        self.written+=self.filled
+        self.filled=0
+
+    def write(self, records: np.ndarray) -> None:
+        while len(records):
+            if self.shard is None:
+                self._open(self.shardsize)
+            count=min(len(records),self.shardsize-self.filled)
+            self.shard[self.filled:self.filled+count]=records[:count]
+            self.filled+=count
+            records=records[count:]
+            if self.filled==self.shardsize:
+                self._finish()
+
+    def close(self) -> None:
+        """Writes the records of an unfinished shard as a shorter shard."""
+        if self.shard is None:
+            return
+        if self.filled:
+            rest=np.array(self.shard[:self.filled])
+            del self.shard
+            os.remove(self.path(self.number)+".tmp")
+            self._open(len(rest))
+            self.shard[:]=rest
+            self.filled=len(rest)
+            self._finish()
+        else:
+            del self.shard
+            self.shard=None
+            os.remove(self.path(self.number)+".tmp")
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+def generate(directory: str, games: int, workers: int|None=None, policy: str="bestmove", depth: float=2, randomplies: int=8,
+             maxplies: int=MAXPLIES, shardsize: int=SHARDSIZE, seed: int|None=None, log=print) -> int:
+    """Plays games games in workers processes (None: one per core) and appends their records to the shards in directory.
+    Returns: The number of records written."""
+    if policy not in POLICIES:
+        raise ValueError(f"policy has to be one of {POLICIES}, not {policy}")
+    workers=workers or os.cpu_count() or 1
+    master=random.Random(seed)
+    tasks=[min(GAMESPERTASK,games-start) for start in range(0,games,GAMESPERTASK)]
+    start=time.perf_counter()
+    played=0
+    with ShardWriter(directory,shardsize) as writer, ProcessPoolExecutor(max_workers=workers) as executor:
+        pending=set()
+        def collect(done) -> None:
+            nonlocal played
+            for future in done:
+                for records in future.result():
+                    writer.write(records)
+                    played+=1
+            seconds=time.perf_counter()-start
+            log(f"{played}/{games} games, {writer.written+writer.filled} records, {played/seconds if seconds else 0:.2f} games/s")
+        for count in tasks:
+            pending.add(executor.submit(_play_games,count,master.getrandbits(64),policy,depth,randomplies,maxplies))
+            if len(pending)>=2*workers:
+                done,pending=wait(pending,return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done,pending=wait(pending,return_when=FIRST_COMPLETED)
+            collect(done)
+    return writer.written
+
+class ShardReader():
+    """The shards of a directory, memory-mapped: only the records a batch touches are read from disk."""
+    def __init__(self, directory: str):
+        self.shards:list[np.ndarray] = [np.load(os.path.join(directory,f"shard_{number:06d}.npy"),mmap_mode="r") for number in shard_numbers(directory)]
+        for shard in self.shards:
+            if shard.dtype!=RECORD:
+                raise ValueError(f"{directory} holds shards of another record layout: {shard.dtype}")
+        self.offsets:np.ndarray = np.cumsum([0]+[len(shard) for shard in self.shards])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def records(self, indices: np.ndarray) -> np.ndarray:
+        """Returns: The records with the given indices over all shards, in that order."""
+        indices=np.asarray(indices,dtype=np.int64)
+        shardindices=np.searchsorted(self.offsets,indices,side="right")-1
+        batch=np.empty(len(indices),dtype=RECORD)
+        for number in np.unique(shardindices):
+            chosen=shardindices==number
+            batch[chosen]=self.shards[number][indices[chosen]-self.offsets[number]]
+        return batch
+
+    def sample(self, batchsize: int, rng: np.random.Generator|None=None) -> np.ndarray:
+        """Returns: batchsize records drawn uniformly at random with replacement."""
+        rng=np.random.default_rng() if rng is None else rng
+        return self.records(rng.integers(0,len(self),batchsize))
+
+def planes(records: np.ndarray) -> np.ndarray:
+    """Returns: The (N,12,8,8) piece planes of records, see Batchevaluation.encode."""
+    return Batchevaluation.encode_pieceboards(records["pieceboards"])
+
+def main():
+    parser=argparse.ArgumentParser(description="Generate self-play training data")
+    parser.add_argument("directory")
+    parser.add_argument("--games",type=int,default=100)
+    parser.add_argument("--workers",type=int,help="number of processes (default: one per core)")
+    parser.add_argument("--policy",choices=POLICIES,default="bestmove")
+    parser.add_argument("--depth",type=float,default=2,help="search depth of the bestmove policy")
+    parser.add_argument("--randomplies",type=int,default=8,help="random moves at the start of every game")
+    parser.add_argument("--maxplies",type=int,default=MAXPLIES)
+    parser.add_argument("--shardsize",type=int,default=SHARDSIZE,help="records per shard")
+    parser.add_argument("--seed",type=int)
+    args=parser.parse_args()
+    written=generate(args.directory,args.games,args.workers,args.policy,args.depth,args.randomplies,args.maxplies,args.shardsize,args.seed)
+    print(f"{written} records written to {args.directory}")
+
+if __name__=="__main__":
+    main()
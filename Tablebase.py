@@ -0,0 +1,388 @@
+"""Endgame tablebases for positions without pawns: the distance to mate of every placement of up to MAXPIECES pieces.
+
+A table covers one material signature like KQvK or KRvKB (white pieces, v, black pieces) and is a file of one byte per position:
+0 for a draw, 255 for impossible placements and otherwise 1 + the number of plies to mate with best play,
+which the side to move wins if that number is odd. A position is indexed by the squares of its pieces
+(white king, black king, the other white and then black pieces in signature order) and the side to move,
+after turning the board with the one of its eight symmetries that brings the white king into the a1-d1-d4 triangle
+(and gives the smaller index if two do). Tables are memory-mapped when probed and built by retrograde analysis:
+
+    python Tablebase.py KQvK KRvK KQvKR --workers 4
+
+Castling rights are ignored, so positions that still have any aren't probed.
+"""
+import argparse
+import mmap
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import Bitboards
+from Bitboards import PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, WHITE, BLACK
+from Search import MATEVALUE
+
+MAXPIECES=4
+DIRECTORY=os.path.join(os.path.dirname(os.path.abspath(__file__)),"Tablebases")
+DRAW=0
+INVALID=255
+PIECETYPES={"K": KING,"Q": QUEEN,"R": ROOK,"B": BISHOP,"N": KNIGHT}
+PIECEORDER="KQRBN"
+CHUNKSIZE=1<<15
+
+def _transform(sq: int, symmetry: int) -> int:
+    row,col=divmod(sq,8)
+    if symmetry&1:
+        col=7-col
+    if symmetry&2:
+        row=7-row
+    if symmetry&4:
+        row,col=col,row
+    return row*8+col
+
+TRANSFORMS=[[_transform(sq,symmetry) for sq in range(64)] for symmetry in range(8)]
+TRIANGLE=[sq for sq in range(64) if sq//8<=sq%8<=3]
+TRIANGLEINDEX={sq: i for i,sq in enumerate(TRIANGLE)}
+#The symmetries that move a square into the triangle, two for squares on a diagonal
+CANONICAL=[[symmetry for symmetry in range(8) if TRANSFORMS[symmetry][sq] in TRIANGLEINDEX] for sq in range(64)]
+
+def signature(Pieceboards: list[int]) -> str|None:
+    """Returns: The material signature of the position, e.g. KRvK, None if there are pawns."""
+    if Pieceboards[WHITE+PAWN] or Pieceboards[BLACK+PAWN]:
+        return None
+    white="".join(letter*Pieceboards[WHITE+PIECETYPES[letter]].bit_count() for letter in PIECEORDER)
+    black="".join(letter*Pieceboards[BLACK+PIECETYPES[letter]].bit_count() for letter in PIECEORDER)
+    return white+"v"+black
+
+def _strength(side: str) -> tuple:
+    return (len(side),tuple(-PIECEORDER.index(letter) for letter in side))
+
+def canonical(material: str) -> tuple[str,bool]:
+    """Returns: The signature tables are stored under, with the stronger side as white, and whether the colours were swapped."""
+    white,black=material.split("v")
+    if _strength(black)>_strength(white):
+        return black+"v"+white,True
+    return material,False
+
+def subtables(material: str) -> list[str]:
+    """Returns: The signatures a capture can lead to that have a table, i.e. that still have a piece besides the kings."""
+    white,black=material.split("v")
+    found=set()
+    for i in range(1,len(white)):
+        found.add(canonical(white[:i]+white[i+1:]+"v"+black)[0])
+    for i in range(1,len(black)):
+        found.add(canonical(white+"v"+black[:i]+black[i+1:])[0])
+    return sorted(table for table in found if len(table)>3)
+
+def _mirror(bitboard: int) -> int:
+    return int.from_bytes(bitboard.to_bytes(8,"little"),"big")
+
+class Layout():
+    """The pieces of one table in index order and the index arithmetic."""
+    def __init__(self, material: str):
+        white,black=material.split("v")
+        self.material:str = material
+        self.pieces:list[int] = [WHITE+KING,BLACK+KING]+[WHITE+PIECETYPES[letter] for letter in white[1:]]+[BLACK+PIECETYPES[letter] for letter in black[1:]]
+        #Slots holding the same kind of piece, whose squares are sorted so that swapping them doesn't change the index
+        self.samepieces:list[tuple[int,int]] = [(a,b) for a in range(len(self.pieces)) for b in range(a+1,len(self.pieces)) if self.pieces[a]==self.pieces[b]]
+        self.size:int = len(TRIANGLE)*64**(len(self.pieces)-1)*2
+
+    def index(self, squares: list[int], whitesmove: bool) -> int:
+        best=-1
+        for symmetry in CANONICAL[squares[0]]:
+            transform=TRANSFORMS[symmetry]
+            placed=[transform[sq] for sq in squares]
+            for a,b in self.samepieces:
+                if placed[a]>placed[b]:
+                    placed[a],placed[b]=placed[b],placed[a]
+            index=TRIANGLEINDEX[placed[0]]
+            for sq in placed[1:]:
+                index=index*64+sq
+            if best<0 or index<best:
+                best=index
+        return best*2+(0 if whitesmove else 1)
+
+    def decode(self, index: int) -> tuple[list[int],bool]:
+        index,black=divmod(index,2)
+        squares=[]
+        for _ in range(len(self.pieces)-1):
+            index,sq=divmod(index,64)
+            squares.append(sq)
+        squares.append(TRIANGLE[index])
+        return squares[::-1],not black
+
+    def pieceboards(self, squares: list[int]) -> list[int]:
+        Pieceboards=[0]*12
+        for piece,sq in zip(self.pieces,squares):
+            Pieceboards[piece]|=1<<sq
+        return Pieceboards
+
+    def squares(self, Pieceboards: list[int]) -> list[int]:
+        squares=[]
+        taken: dict[int,list[int]]={}
+        for piece in self.pieces:
+            if piece not in taken:
+                taken[piece]=list(Bitboards.squares(Pieceboards[piece]))
+            squares.append(taken[piece].pop(0))
+        return squares
+
+class Tablebase():
+    """The tables found in a directory, each memory-mapped on first use."""
+    def __init__(self, directory: str=DIRECTORY):
+        self.directory:str = directory
+        self.tables:dict[str,tuple[Layout,mmap.mmap]|None] = {}
+
+    def path(self, material: str) -> str:
+        return os.path.join(self.directory,material+".tb")
+
+    def _table(self, material: str) -> tuple[Layout,mmap.mmap]|None:
+        if material not in self.tables:
+            path=self.path(material)
+            if os.path.exists(path):
+                with open(path,"rb") as file:
+                    self.tables[material]=(Layout(material),mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ))
+            else:
+                self.tables[material]=None
+        return self.tables[material]
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            if table is not None:
+                table[1].close()
+        self.tables={}
+
+    def entry(self, Pieceboards: list[int], whitesmove: bool) -> int|None:
+        """Returns: The table byte of the position, None if there is no table for its material."""
+        occupied=0
+        for bitboard in Pieceboards:
+            occupied|=bitboard
+        if occupied.bit_count()>MAXPIECES:
+            return None
+        material=signature(Pieceboards)
+        if material is None:
+            return None
+        if len(material)==3:
+            return DRAW#Only the kings are left
+        material,swapped=canonical(material)
+        table=self._table(material)
+        if table is None:
+            return None
+        if swapped:
+            Pieceboards=[_mirror(Pieceboards[(i+6)%12]) for i in range(12)]
+            whitesmove=not whitesmove
+        layout,data=table
+        return data[layout.index(layout.squares(Pieceboards),whitesmove)]
+
+    def probe(self, Position) -> tuple[int,int]|None:
+        """Returns: (1 won, 0 drawn or -1 lost for the side to move, plies to mate with best play), None if the position isn't covered."""
+        if any(Position.Castlingrights):
+            return None
+        entry=self.entry(Position.Pieceboards,Position.whitesmove)
+        if entry is None or entry==INVALID:
+            return None
+        if entry==DRAW:
+            return 0,0
+        plies=entry-1
+        return (1 if plies%2 else -1),plies
+
+    def value(self, Position) -> float|None:
+        """Returns: Evaluation for the player to move like Search.alphabeta's, None if the position isn't covered."""
+        probed=self.probe(Position)
+        if probed is None:
+            return None
+        result,plies=probed
+        return result*(MATEVALUE-plies) if result else 0.0
+
+    def best_move(self, Position):
+        """Returns: The move keeping the best result: the quickest mate, else a draw, else the longest resistance. None if not covered."""
+        if self.probe(Position) is None:
+            return None
+        best=None
+        bestvalue=-2*MATEVALUE
+        for move in Position.legal_moves():
+            undo=Position.make_move(move)
+            childvalue=self.value(Position)
+            Position.unmake_move(undo)
+            if childvalue is None:
+                return None
+            if -childvalue>bestvalue:
+                best,bestvalue=move,-childvalue
+        return best
+
+def _attacks(piece: int, sq: int, occupied: int) -> int:
+    kind=piece%6
+    if kind==KNIGHT:
+        return Bitboards.KNIGHT_ATTACKS[sq]
+    if kind==KING:
+        return Bitboards.KING_ATTACKS[sq]
+    if kind==ROOK:
+        return Bitboards.rook_attacks(sq,occupied)
+    if kind==BISHOP:
+        return Bitboards.bishop_attacks(sq,occupied)
+    return Bitboards.queen_attacks(sq,occupied)
+
+NOCASTLING=[False]*4
+_tablebases: dict[str,Tablebase]={}
+
+def _initialise(material: str, directory: str, first: int, last: int) -> tuple[int,bytes,bytes,bytes,list[tuple[int,int]]]:
+    """Looks at every position of an index range once.
+
+    Returns: For each position whether it is impossible, the number of distinct positions of the same table its moves lead to,
+    the longest mate among captures that lose, and (distance, index) of the positions whose result is known already:
+    mates, and wins by capturing into a lost position of a smaller table."""
+    layout=Layout(material)
+    tablebase=_tablebases.setdefault(directory,Tablebase(directory))
+    values=bytearray(last-first)
+    remaining=bytearray(last-first)
+    capturemax=bytearray(last-first)
+    known=[]
+    for index in range(first,last):
+        squares,whitesmove=layout.decode(index)
+        if len(set(squares))<len(squares) or layout.index(squares,whitesmove)!=index:
+            values[index-first]=INVALID
+            continue
+        Pieceboards=layout.pieceboards(squares)
+        occupied=Bitboards.occupancy(Pieceboards,True)|Bitboards.occupancy(Pieceboards,False)
+        waiting=Pieceboards[(BLACK if whitesmove else WHITE)+KING].bit_length()-1
+        if Bitboards.square_attacked_by(waiting,whitesmove,Pieceboards,occupied):
+            values[index-first]=INVALID
+            continue
+        moves=Bitboards.legal_moves(Pieceboards,whitesmove,None,NOCASTLING)
+        if not moves:
+            mover=Pieceboards[(WHITE if whitesmove else BLACK)+KING].bit_length()-1
+            if Bitboards.square_attacked_by(mover,not whitesmove,Pieceboards,occupied):
+                known.append((0,index))
+            continue
+        children=set()
+        longest=0
+        losing=True#Every move captures into a won position
+        for start,end in moves:
+            slot=squares.index(start)
+            if occupied>>end&1:
+                child=Pieceboards[:]
+                child[layout.pieces[squares.index(end)]]&=~(1<<end)
+                child[layout.pieces[slot]]^=(1<<start)|(1<<end)
+                entry=tablebase.entry(child,not whitesmove)
+                if entry is None:
+                    raise FileNotFoundError(f"The tables {material} needs aren't all there")
+                if entry==DRAW:
+                    losing=False
+                elif (entry-1)%2==0:
+                    known.append((entry,index))#The capture wins, mate comes one ply later than in the captured position
+                    losing=False
+                else:
+                    longest=max(longest,entry-1)
+            else:
+                children.add(layout.index([end if i==slot else sq for i,sq in enumerate(squares)],not whitesmove))
+        #A capture that draws or wins is a move whose result never arrives, so the position can't be counted down to a loss
+        remaining[index-first]=len(children)+(not losing)
+        capturemax[index-first]=longest
+        if not remaining[index-first]:
+            known.append((longest+1,index))
+    return first,bytes(values),bytes(remaining),bytes(capturemax),known
+
+def _predecessors(layout: Layout, squares: list[int], whitesmove: bool) -> set[int]:
+    """Returns: The indices of the positions that lead to this one by a move that isn't a capture."""
+    occupied=0
+    for sq in squares:
+        occupied|=1<<sq
+    mover=BLACK if whitesmove else WHITE
+    found=set()
+    for slot,piece in enumerate(layout.pieces):
+        if (piece>=BLACK)!=(mover==BLACK):
+            continue
+        for target in Bitboards.squares(_attacks(piece,squares[slot],occupied)&~occupied):
+            placed=squares[:]
+            placed[slot]=target
+            found.add(layout.index(placed,not whitesmove))
+    return found
+
+def generate(material: str, directory: str=DIRECTORY, workers: int|None=None, log=print) -> str:
+    """Builds the table of a material signature and the tables it depends on, unless they exist already.
+
+    The positions are looked at once in parallel, then results spread backwards from the mates one ply at a time:
+    a position is won in n+1 plies if a move leads to a position lost in n, lost in n+1 if all moves lead to won positions,
+    the longest of them won in n. Whatever is left at the end is a draw.
+    Returns: The path of the table."""
+    material,_=canonical(material)
+    if len(material.replace("v",""))>MAXPIECES or "P" in material:
+        raise ValueError(f"Only tables of up to {MAXPIECES} pieces without pawns can be generated, not {material}")
+    tablebase=Tablebase(directory)
+    path=tablebase.path(material)
+    if os.path.exists(path):
+        return path
+    for table in subtables(material):
+        generate(table,directory,workers,log)
+    os.makedirs(directory,exist_ok=True)
+    start=time.perf_counter()
+    layout=Layout(material)
+    values=bytearray(layout.size)
+    remaining=bytearray(layout.size)
+    capturemax=bytearray(layout.size)
+    levels: defaultdict[int,list[int]]=defaultdict(list)
+    ranges=[(chunk,min(chunk+CHUNKSIZE,layout.size)) for chunk in range(0,layout.size,CHUNKSIZE)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures=[executor.submit(_initialise,material,directory,first,last) for first,last in ranges]
+        for future in futures:
+            first,chunkvalues,chunkremaining,chunkcapturemax,known=future.result()
+            values[first:first+len(chunkvalues)]=chunkvalues
+            remaining[first:first+len(chunkremaining)]=chunkremaining
+            capturemax[first:first+len(chunkcapturemax)]=chunkcapturemax
+            for distance,index in known:
+                levels[distance].append(index)
+    distance=0
+    while levels:
+        for index in levels.pop(distance,[]):
+            if values[index]:
+                continue
+            values[index]=distance+1
+            squares,whitesmove=layout.decode(index)
+            for predecessor in _predecessors(layout,squares,whitesmove):
+                if values[predecessor]:
+                    continue
+                if distance%2==0:
+                    levels[distance+1].append(predecessor)
+                else:
+                    remaining[predecessor]-=1
+                    if remaining[predecessor]==0:
+                        levels[max(distance,capturemax[predecessor])+1].append(predecessor)
+        distance+=1
+        if distance>=INVALID-1:
+            raise ValueError(f"Mates in {material} are too long to be stored in a byte")
+    with open(path+".tmp","wb") as file:
+        file.write(values)
+    os.replace(path+".tmp",path)
+    longest=max((value-1 for value in values if DRAW<value<INVALID),default=0)
+    log(f"{material}: {layout.size} positions, longest mate {longest} plies, {time.perf_counter()-start:.1f}s")
+    return path
+
+def all_signatures(pieces: int) -> list[str]:
+    """Returns: The signatures without pawns of the given number of pieces that have a table."""
+    found=set()
+    def sides(count: int, letters: str="QRBN") -> list[str]:
+        if count==0:
+            return [""]
+        return [letter+rest for i,letter in enumerate(letters) for rest in sides(count-1,letters[i:])]
+    for whitecount in range(pieces-1):
+        for white in sides(whitecount):
+            for black in sides(pieces-2-whitecount):
+                if white or black:
+                    found.add(canonical("K"+white+"vK"+black)[0])
+    return sorted(found)
+
+def main():
+    parser=argparse.ArgumentParser(description="Generate endgame tablebases for positions without pawns")
+    parser.add_argument("signatures",nargs="*",help="material like KQvK or KRvKB")
+    parser.add_argument("--all",type=int,choices=range(3,MAXPIECES+1),help="generate every table with up to this many pieces")
+    parser.add_argument("--directory",default=DIRECTORY)
+    parser.add_argument("--workers",type=int,help="processes for the first pass (default: one per core)")
+    args=parser.parse_args()
+    signatures=list(args.signatures)
+    if args.all:
+        signatures+=[material for pieces in range(3,args.all+1) for material in all_signatures(pieces)]
+    if not signatures:
+        parser.error("name the tables to generate or use --all")
+    for material in signatures:
+        generate(material,args.directory,args.workers)
+
+if __name__=="__main__":
+    main()
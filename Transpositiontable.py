@@ -0,0 +1,77 @@
+"""Fixed-size transposition table keyed by Zobrist keys. Values are stored from the point of view of the player to move."""
+from enum import Enum
+from typing import NamedTuple, Any
+
+class Bound(Enum):
+    Exact = 0
+    Lower = 1#The value is at least this high
+    Upper = 2#The value is at most this high
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: float
+    value: float
+    bound: Bound
+    move: Any
+
+#Rough size of one stored entry in CPython (the tuple, its key, value and the slot in the table)
+ENTRY_BYTES=160
+
+class TranspositionTable():
+    """Buckets of two entries: the first slot keeps the deepest search of a bucket, the second is always replaced.
+
+    megabytes caps the memory the table may grow to, the number of buckets is the largest power of two that fits."""
+    def __init__(self, megabytes: float=16):
+        buckets=1
+        while 2*buckets*2*ENTRY_BYTES<=megabytes*2**20:
+            buckets*=2
+        self.megabytes:float = megabytes
+        self.mask:int = buckets-1
+        self.entries:list[TTEntry|None] = [None]*(2*buckets)
+        self.probes:int = 0
+        self.hits:int = 0
+        self.stores:int = 0
+        self.overwrites:int = 0
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.entries)
+
+    def capacity(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        self.entries=[None]*len(self.entries)
+        self.probes=self.hits=self.stores=self.overwrites=0
+
+    def probe(self, key: int) -> TTEntry|None:
+        """Returns: The entry stored for key or None."""
+        self.probes+=1
+        index=2*(key&self.mask)
+        entries=self.entries
+        for entry in (entries[index],entries[index+1]):
+            if entry is not None and entry.key==key:
+                self.hits+=1
+                return entry
+        return None
+
+    def store(self, key: int, depth: float, value: float, bound: Bound, move=None) -> None:
+        self.stores+=1
+        index=2*(key&self.mask)
+        deepest=self.entries[index]
+        if deepest is None or deepest.key==key or depth>=deepest.depth:
+            if deepest is not None and deepest.key!=key:
+                self.overwrites+=1
+                #The replaced entry is still the newest of its own line, keep it in the always-replace slot
+                self.entries[index+1]=deepest
+            self.entries[index]=TTEntry(key,depth,value,bound,move)
+            return
+        if self.entries[index+1] is not None and self.entries[index+1].key!=key:
+            self.overwrites+=1
+        self.entries[index+1]=TTEntry(key,depth,value,bound,move)
+
+    def hitrate(self) -> float:
+        return self.hits/self.probes if self.probes else 0.0
+
+    def stats(self) -> dict[str,float]:
+        return {"probes": self.probes,"hits": self.hits,"hitrate": self.hitrate(),"stores": self.stores,
+                "overwrites": self.overwrites,"filled": len(self)/self.capacity()}
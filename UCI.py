@@ -0,0 +1,226 @@
+"""Universal Chess Interface front end, so match tools and GUIs like cutechess or Arena can drive the engine:
+
+    cutechess-cli -engine cmd="python UCI.py" ...
+
+The search runs on a worker thread, so the engine keeps reading commands while it thinks. stop and quit end it at the next node
+and it streams an info line with depth, score, nodes, nps and principal variation after every completed iteration.
+"""
+import sys
+import threading
+import time
+from Chessposition import ChessPosition
+from Search import Search, SearchResult, MAXDEPTH, MATEVALUE, MATETHRESHOLD
+from Transpositiontable import TranspositionTable
+import Notation
+
+NAME="Chessengines"
+AUTHOR="Chessengines authors"
+MOVESTOGO=30#Moves the remaining clock time is divided between if the GUI doesn't say
+OVERHEAD_MS=50#Kept back from every move for the communication with the GUI
+
+def allotted_time(params: dict[str,float], whitesmove: bool) -> float|None:
+    """Returns: Milliseconds to spend on a move with the time control of a go command, None if there is no time limit."""
+    if "movetime" in params:
+        return max(1.0,params["movetime"]-OVERHEAD_MS)
+    clock=params.get("wtime" if whitesmove else "btime")
+    if clock is None:
+        return None
+    increment=params.get("winc" if whitesmove else "binc",0)
+    movestogo=params.get("movestogo",MOVESTOGO)
+    return max(1.0,min(clock/2,clock/max(1,movestogo)+increment*3/4)-OVERHEAD_MS)
+
+def score(value: float, whitesmove: bool) -> str:
+    """Returns: The UCI score of a value from white's point of view for the player to move:
+    mate in moves for a mate value (MATEVALUE less the plies to mate), else centipawns."""
+    value=value if whitesmove else -value
+    if abs(value)>=MATETHRESHOLD:
+        plies=round(MATEVALUE-abs(value))
+        moves=(plies+1)//2
+        return f"mate {moves if value>0 else -moves}"
+    return f"cp {round(100*value)}"
+
+class UCIEngine():
+    """Reads UCI commands one line at a time (handle) and writes the answers through send."""
+    def __init__(self, send=None):
+        self.output=send or self._print
+        self.lock:threading.Lock = threading.Lock()
+        self.position:ChessPosition = ChessPosition()
+        self.hash:float = 16
+        self.table:TranspositionTable = TranspositionTable(self.hash)
+        self.book=None
+        self.tablebase=None
+        self.search:Search|None = None
+        self.thread:threading.Thread|None = None
+        self.pondering:bool = False
+        self.infinite:bool = False
+        self.ponderbudget:float|None = None
+        self.resultready:threading.Event = threading.Event()#Set once a pondering or infinite search may report its bestmove
+
+    @staticmethod
+    def _print(line: str) -> None:
+        sys.stdout.write(line+"\n")
+        sys.stdout.flush()
+
+    def send(self, line: str) -> None:
+        with self.lock:
+            self.output(line)
+
+    def handle(self, line: str) -> bool:
+        """Executes one command. Returns: False after quit."""
+        words=line.split()
+        if not words:
+            return True
+        command,arguments=words[0],words[1:]
+        if command=="uci":
+            self.send(f"id name {NAME}")
+            self.send(f"id author {AUTHOR}")
+            self.send(f"option name Hash type spin default {int(self.hash)} min 1 max 4096")
+            self.send("option name Ponder type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command=="isready":
+            self.send("readyok")
+        elif command=="setoption":
+            self.setoption(arguments)
+        elif command=="ucinewgame":
+            self.stop()
+            self.table=TranspositionTable(self.hash)
+        elif command=="position":
+            self.stop()
+            self.set_position(arguments)
+        elif command=="go":
+            self.stop()
+            self.go(arguments)
+        elif command=="stop":
+            self.stop()
+        elif command=="ponderhit":
+            self.ponderhit()
+        elif command=="quit":
+            self.stop()
+            return False
+        return True
+
+    def setoption(self, arguments: list[str]) -> None:
+        text=" ".join(arguments)
+        if not text.startswith("name "):
+            return
+        name,_,value=text[5:].partition(" value ")
+        name=name.strip().lower()
+        value=value.strip()
+        if value=="<empty>":
+            value=""
+        if name=="hash":
+            self.hash=float(value)
+            self.table=TranspositionTable(self.hash)
+        elif name=="bookfile":
+            from Openingbook import OpeningBook
+            self.book=OpeningBook(value) if value else None
+        elif name=="tablebasepath":
+            from Tablebase import Tablebase
+            self.tablebase=Tablebase(value) if value else None
+
+    def set_position(self, arguments: list[str]) -> None:
+        """position startpos|fen <fen> [moves <move> ...]"""
+        if "moves" in arguments:
+            split=arguments.index("moves")
+            arguments,moves=arguments[:split],arguments[split+1:]
+        else:
+            moves=[]
+        if arguments and arguments[0]=="fen":
+            Position=ChessPosition.from_fen(" ".join(arguments[1:]))
+        else:
+            Position=ChessPosition()
+        for text in moves:
+            Position.make_move(Notation.coordinate_to_move(Position,text))
+        self.position=Position
+
+    def go(self, arguments: list[str]) -> None:
+        params: dict[str,float]={}
+        flags=set()
+        i=0
+        while i<len(arguments):
+            word=arguments[i]
+            if word in ("infinite","ponder"):
+                flags.add(word)
+            elif i+1<len(arguments) and word in ("wtime","btime","winc","binc","movestogo","movetime","nodes","depth","mate"):
+                params[word]=float(arguments[i+1])
+                i+=1
+            i+=1
+        Position=self.position.copy()
+        budget=allotted_time(params,Position.whitesmove)
+        self.infinite="infinite" in flags
+        self.pondering="ponder" in flags
+        self.ponderbudget=budget
+        if self.pondering or self.infinite:
+            budget=None
+        nodes=int(params["nodes"]) if "nodes" in params else None
+        maxdepth=params.get("depth",MAXDEPTH)
+        if "mate" in params:
+            #A mate in n moves is 2n-1 plies deep, and the search ends as soon as it finds one
+            maxdepth=min(maxdepth,max(1,2*int(params["mate"])-1))
+        self.resultready.clear()
+        if not (self.pondering or self.infinite):
+            self.resultready.set()
+        if self.book is not None and not (self.pondering or self.infinite):
+            move=self.book.choose(Position)
+            if move is not None:
+                self.send(f"bestmove {move}")
+                return
+        self.search=Search(ChessPosition.eval_without_depth,self.table,tablebase=self.tablebase)
+        self.thread=threading.Thread(target=self._think,args=(self.search,Position,budget,nodes,maxdepth),daemon=True)
+        self.thread.start()
+
+    def _think(self, search: Search, Position: ChessPosition, budget: float|None, nodes: int|None, maxdepth: float) -> None:
+        start=time.perf_counter()
+        def oniteration(result: SearchResult) -> None:
+            seconds=time.perf_counter()-start
+            self.send(f"info depth {int(result.depth)} score {score(result.value,Position.whitesmove)} nodes {result.nodes} "
+                      f"nps {int(result.nodes/seconds) if seconds else 0} time {int(1000*seconds)} pv {' '.join(str(move) for move in result.pv)}")
+        try:
+            result=search.iterative_deepening(Position,budget,nodes,maxdepth,oniteration)
+        except Exception as error:
+            #The GUI waits for a bestmove whatever happened, so fall back to any legal move
+            self.send(f"info string search failed: {error!r}")
+            moves=Position.legalmovelist()
+            move=moves[0] if moves else None
+            result=SearchResult(Position,move,0.0,0,[] if move is None else [move],search.nodes)
+        #A pondering or infinite search may only answer once the GUI sends stop or ponderhit
+        self.resultready.wait()
+        if result.move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv)>1:
+            self.send(f"bestmove {result.move} ponder {result.pv[1]}")
+        else:
+            self.send(f"bestmove {result.move}")
+
+    def ponderhit(self) -> None:
+        """The opponent played the move we pondered on: keep searching, now on our own clock."""
+        if self.search is None or not self.pondering:
+            return
+        self.pondering=False
+        if self.ponderbudget is not None:
+            #The search thread may not have started yet, set_time makes iterative_deepening keep this deadline
+            self.search.set_time(self.ponderbudget)
+        if not self.infinite:
+            self.resultready.set()
+
+    def stop(self) -> None:
+        """Ends a running search and waits for its bestmove."""
+        if self.thread is None:
+            return
+        self.search.stop()
+        self.resultready.set()
+        self.thread.join()
+        self.thread=None
+        self.pondering=self.infinite=False
+
+def main():
+    engine=UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Zobrist keys for hashing positions.
+
+A key is the XOR of one random 64-bit number per piece on its square, one for black to move,
+one per castling right still available and one for the file a pawn can be taken en passant on.
+Making a move therefore only has to XOR out what changed.
+"""
+import random
+import Bitboards
+
+_generator=random.Random(20240501)
+
+#PIECES[ChessPieces.value-1][square]
+PIECES=[[_generator.getrandbits(64) for sq in range(64)] for piece in range(12)]
+BLACKTOMOVE=_generator.getrandbits(64)
+#CASTLING[i] belongs to Castlingrights[i]
+CASTLING=[_generator.getrandbits(64) for i in range(4)]
+ENPASSANT=[_generator.getrandbits(64) for file in range(8)]
+
+def castling_key(Castlingrights: list[bool]) -> int:
+    key=0
+    for i,right in enumerate(Castlingrights):
+        if right:
+            key^=CASTLING[i]
+    return key
+
+def hash_position(Pieceboards: list[int], whitesmove: bool, enpassantablefile: int|None, Castlingrights: list[bool]) -> int:
+    """Returns: the Zobrist key of a position, computed from scratch."""
+    key=0
+    for piece in range(12):
+        for sq in Bitboards.squares(Pieceboards[piece]):
+            key^=PIECES[piece][sq]
+    if not whitesmove:
+        key^=BLACKTOMOVE
+    if enpassantablefile is not None:
+        key^=ENPASSANT[enpassantablefile]
+    return key^castling_key(Castlingrights)
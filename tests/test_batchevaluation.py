@@ -0,0 +1,52 @@
+import random
+import numpy as np
+import pytest
+from Chessposition import ChessPosition
+import Batchevaluation
+
+def random_positions(count: int, seed: int=0) -> list[ChessPosition]:
+    rng=random.Random(seed)
+    Positions=[]
+    for _ in range(count):
+        Position=ChessPosition()
+        for _ in range(rng.randrange(100)):
+            move=Position.random_legal_move(rng)
+            if move is None:
+                break
+            Position.make_move(move)
+        Positions.append(Position)
+    return Positions
+
+def planes_by_loop(Position: ChessPosition) -> np.ndarray:
+    planes=np.zeros((12,8,8),dtype=np.uint8)
+    for row in range(8):
+        for col in range(8):
+            piece=Position.Board[row][col]
+            if piece is not None:
+                planes[piece.value-1,row,col]=1
+    return planes
+
+def test_encode_matches_board():
+    Positions=random_positions(40)
+    planes=Batchevaluation.encode(Positions)
+    assert planes.shape==(40,12,8,8) and planes.dtype==np.uint8
+    for Position,encoded in zip(Positions,planes):
+        assert np.array_equal(encoded,planes_by_loop(Position))
+
+def test_evaluation_matches_position():
+    Positions=random_positions(40,1)
+    planes=Batchevaluation.encode(Positions)
+    assert Batchevaluation.material(planes)==pytest.approx([Position.eval_by_material() for Position in Positions])
+    assert Batchevaluation.evaluate(planes)==pytest.approx([Position.eval_without_depth() for Position in Positions])
+    assert Batchevaluation.evaluate_positions(Positions)==pytest.approx(Batchevaluation.evaluate(planes))
+
+def test_encode_state():
+    Positions=[ChessPosition(),ChessPosition.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 1")]
+    whitesmove,castling,enpassant=Batchevaluation.encode_state(Positions)
+    assert whitesmove.tolist()==[True,True]
+    assert castling.tolist()==[Positions[0].Castlingrights,Positions[1].Castlingrights]
+    assert enpassant.tolist()==[-1,5]
+
+def test_empty_batch():
+    assert Batchevaluation.encode([]).shape==(0,12,8,8)
+    assert Batchevaluation.evaluate_positions([]).shape==(0,)
@@ -0,0 +1,28 @@
+import EPDrunner
+
+MATE="6k1/5ppp/8/8/8/8/8/3R2K1 w - -"
+LINES=[f'{MATE} bm Rd8#; id "mate";',
+       f'{MATE} bm Qd8; id "bad";',
+       "garbage",
+       f'{MATE} am Rd7; id "avoid";']
+
+def test_parse_epd():
+    record=EPDrunner.parse_epd('r1b1k2r/8/8/8/8/8/8/4K3 b kq - bm Bb7 Ke7; id "WAC 1"; c0 "a; b";',3)
+    assert record.fen=="r1b1k2r/8/8/8/8/8/8/4K3 b kq - 0 1"
+    assert record.operations["bm"]==["Bb7","Ke7"]
+    assert record.name()=="WAC 1"
+    assert record.error is None
+
+def test_bad_records_are_reported_and_the_rest_is_searched(tmp_path):
+    path=tmp_path/"suite.epd"
+    path.write_text("\n".join(LINES)+"\n")
+    results={result.linenumber: result for result in EPDrunner.run(EPDrunner.read_epd(str(path)),None,None,2,workers=1)}
+    assert sorted(results)==[1,2,3,4]
+    assert results[1].solved and results[1].move=="Rd8#" and results[1].error is None
+    assert not results[2].solved and "Qd8" in results[2].error
+    assert not results[3].solved and "garbage" in results[3].error
+    assert results[4].solved and results[4].error is None
+
+def test_illegal_fen_is_an_error():
+    result=EPDrunner.solve(EPDrunner.parse_epd("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/XNBQKBNR w KQkq - bm e4;",1),None,None,1)
+    assert not result.solved and result.error
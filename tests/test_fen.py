@@ -0,0 +1,68 @@
+import copy
+import pickle
+import random
+import pytest
+from Chessposition import ChessPosition, PACKEDBYTES
+
+FENS=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+      "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+      "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+      "r3k2r/8/8/8/3pP3/8/8/R3K2R b Kq e3 0 1",
+      "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 37 1",
+      "7k/8/8/8/8/8/8/K7 b - - 99 1"]
+
+def random_positions(count: int, seed: int=0):
+    rng=random.Random(seed)
+    for _ in range(count):
+        Position=ChessPosition()
+        for _ in range(rng.randrange(80)):
+            move=Position.random_legal_move(rng)
+            if move is None:
+                break
+            Position.make_move(move)
+        yield Position
+
+@pytest.mark.parametrize("fen",FENS)
+def test_fen_round_trip(fen):
+    assert ChessPosition.from_fen(fen).to_fen()==fen
+
+def test_fen_round_trip_keeps_position():
+    for Position in random_positions(50):
+        Copy=ChessPosition.from_fen(Position.to_fen())
+        assert Copy.to_fen()==Position.to_fen()
+        assert Copy.Zobristkey==Position.Zobristkey
+        assert Copy.Pieceboards==Position.Pieceboards
+
+@pytest.mark.parametrize("fen",FENS)
+def test_packed_round_trip(fen):
+    Position=ChessPosition.from_fen(fen)
+    packed=Position.to_packed()
+    assert len(packed)==PACKEDBYTES==26
+    Copy=ChessPosition.from_packed(packed)
+    #The packed form leaves out the move counters
+    assert Copy.to_fen(0)==Position.to_fen(0)
+    assert Copy.Zobristkey==Position.Zobristkey
+
+def test_packed_round_trip_of_random_positions():
+    for Position in random_positions(50,1):
+        packed=Position.to_packed()
+        assert len(packed)==PACKEDBYTES
+        assert ChessPosition.from_packed(packed).to_fen(0)==Position.to_fen(0)
+
+def test_packed_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        ChessPosition.from_packed(bytes(PACKEDBYTES-1))
+
+@pytest.mark.parametrize("duplicate",[copy.deepcopy,lambda Position: pickle.loads(pickle.dumps(Position))])
+def test_copies_keep_clock_and_history(duplicate):
+    Position=ChessPosition.from_fen(FENS[4])
+    Copy=duplicate(Position)
+    assert Copy.Halfmoveclock==37
+    assert Copy.to_fen()==FENS[4]
+    Position=ChessPosition()
+    for coordinates in ["g1f3","g8f6","f3g1","f6g8"]:
+        Position.make_move(next(move for move in Position.legal_moves() if str(move)==coordinates))
+    assert Position.is_repetition()
+    Copy=duplicate(Position)
+    assert Copy.is_repetition()
+    assert (Copy.Halfmoveclock,Copy.History)==(Position.Halfmoveclock,Position.History)
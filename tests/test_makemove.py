@@ -0,0 +1,54 @@
+import random
+import pytest
+import Zobrist
+from Chessposition import ChessPosition
+
+FENS=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+      "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",#Castling, en passant, promotions soon
+      "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+      "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",#Promotions with capture
+      "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"]#En passant
+
+def state(Position: ChessPosition) -> tuple:
+    return (Position.to_fen(),tuple(Position.Pieceboards),[row[:] for row in Position.Board],Position.Zobristkey,Position.Material,
+            Position.Placement,Position.Halfmoveclock,list(Position.History))
+
+def fresh_key(Position: ChessPosition) -> int:
+    return Zobrist.hash_position(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile,Position.Castlingrights)
+
+@pytest.mark.parametrize("fen",FENS)
+def test_unmake_restores_every_child(fen):
+    Position=ChessPosition.from_fen(fen)
+    before=state(Position)
+    for move in Position.legalmovelist():
+        undo=Position.make_move(move)
+        assert Position.Zobristkey==fresh_key(Position),move
+        Position.unmake_move(undo)
+        assert state(Position)==before,move
+
+@pytest.mark.parametrize("seed",range(5))
+def test_random_line_unwinds_to_start(seed):
+    rng=random.Random(seed)
+    Position=ChessPosition.from_fen(FENS[seed%len(FENS)])
+    states=[state(Position)]
+    undos=[]
+    for _ in range(60):
+        move=Position.random_legal_move(rng)
+        if move is None:
+            break
+        undos.append(Position.make_move(move))
+        assert Position.Zobristkey==fresh_key(Position)
+        states.append(state(Position))
+    while undos:
+        states.pop()
+        Position.unmake_move(undos.pop())
+        assert state(Position)==states[-1]
+
+def test_transposition_gives_same_key():
+    Position=ChessPosition()
+    for text in ["g1f3","g8f6","b1c3","b8c6"]:
+        Position.make_move(next(move for move in Position.legalmovelist() if str(move)==text))
+    Other=ChessPosition()
+    for text in ["b1c3","b8c6","g1f3","g8f6"]:
+        Other.make_move(next(move for move in Other.legalmovelist() if str(move)==text))
+    assert Position.Zobristkey==Other.Zobristkey
@@ -0,0 +1,29 @@
+import itertools
+import Bitboards
+from Chessposition import ChessPosition
+
+PINNED="4r2k/8/8/8/8/8/P3R3/4K3 w - - 0 1"#The rook on e2 can only move along the e-file
+
+def test_legal_moves_checks_only_what_is_taken():
+    Position=ChessPosition.from_fen(PINNED)
+    rejected=[0]
+    first=next(Position.legal_moves(rejected))
+    assert (first.startrow,first.startcol)==(1,0)#Pawn moves come first
+    assert rejected==[0]
+    rejected=[0]
+    moves=Position.legalmovelist(rejected)
+    assert rejected[0]==len(Position.pseudolegal_movelist())-len(moves)>0
+
+def test_lazy_generation_gives_the_full_list():
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",PINNED]:
+        Position=ChessPosition.from_fen(fen)
+        pairs=Bitboards.legal_moves(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile,Position.Castlingrights)
+        assert list(Bitboards.iter_legal_moves(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile,Position.Castlingrights))==pairs
+        assert [str(move) for move in Position.legal_moves()]==[str(move) for move in Position.legalmovelist()]
+        assert [str(move) for move in itertools.islice(Position.legal_moves(),3)]==[str(move) for move in Position.legalmovelist()[:3]]
+
+def test_has_legal_move():
+    assert ChessPosition().has_legal_move()
+    assert not ChessPosition.from_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1").has_legal_move()#Back rank mate
+    assert not ChessPosition.from_fen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1").has_legal_move()#Stalemate
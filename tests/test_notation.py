@@ -0,0 +1,61 @@
+import pytest
+from Chessposition import ChessPosition
+import Notation
+
+FENS=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+      "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+      "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+      "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1"]
+BLACKPROMOTES="4k3/8/8/8/8/8/1p5K/R7 b - - 0 1"
+
+def san(fen: str, coordinates: str) -> str:
+    Position=ChessPosition.from_fen(fen)
+    return Notation.move_to_san(Position,Notation.coordinate_to_move(Position,coordinates))
+
+@pytest.mark.parametrize("fen,coordinates,expected",[
+    (FENS[0],"e2e4","e4"),
+    (FENS[0],"g1f3","Nf3"),
+    (FENS[1],"e1g1","O-O"),
+    (FENS[1],"e1c1","O-O-O"),
+    (FENS[1],"d5e6","dxe6"),
+    (FENS[1],"e2a6","Bxa6"),
+    (FENS[3],"e5f6","exf6"),#En passant
+    (BLACKPROMOTES,"b2a1q","bxa1=Q"),
+    (BLACKPROMOTES,"b2b1n","b1=N"),
+    ("4k3/8/8/8/8/8/8/R4RK1 w - - 0 1","a1d1","Rad1"),#File disambiguation
+    ("4k3/8/8/8/R7/8/8/R3K3 w - - 0 1","a1a2","R1a2"),#Rank disambiguation
+    ("4k3/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1","a1b2","Qa1b2"),#Both
+    ("4k3/8/8/8/8/8/8/4K2R w K - 0 1","h1h8","Rh8+"),
+    ("6k1/5ppp/8/8/8/8/8/3R2K1 w - - 0 1","d1d8","Rd8#"),
+    ("7k/P7/8/8/8/8/8/K7 w - - 0 1","a7a8q","a8=Q+")])
+def test_move_to_san(fen,coordinates,expected):
+    assert san(fen,coordinates)==expected
+
+@pytest.mark.parametrize("fen",FENS+[BLACKPROMOTES])
+def test_san_round_trip(fen):
+    Position=ChessPosition.from_fen(fen)
+    moves=Position.legalmovelist()
+    written=[Notation.move_to_san(Position,move,moves) for move in moves]
+    assert len(set(written))==len(moves)
+    for move,text in zip(moves,written):
+        assert Notation.san_to_move(Position,text,moves)==move
+        assert Notation.san_to_move(Position,text)==move
+
+@pytest.mark.parametrize("text,expected",[("0-0","e1g1"),("O-O-O","e1c1"),("Ne5xf7","e5f7"),("Nxf7!?","e5f7"),("dxe6","d5e6")])
+def test_san_to_move_accepts_variants(text,expected):
+    Position=ChessPosition.from_fen(FENS[1])
+    assert str(Notation.san_to_move(Position,text))==expected
+
+def test_promotion_without_equals_sign():
+    Position=ChessPosition.from_fen(BLACKPROMOTES)
+    assert str(Notation.san_to_move(Position,"bxa1Q"))=="b2a1q"
+
+@pytest.mark.parametrize("text",["e5","Nf4","O-O-O-O","Kxe1",""])
+def test_san_to_move_rejects_illegal(text):
+    with pytest.raises(ValueError):
+        Notation.san_to_move(ChessPosition(),text)
+
+def test_coordinate_round_trip():
+    Position=ChessPosition.from_fen(FENS[2])
+    for move in Position.legalmovelist():
+        assert Notation.coordinate_to_move(Position,str(move))==move
@@ -0,0 +1,82 @@
+import random
+import pytest
+from Chessposition import ChessPosition
+import Notation
+from Openingbook import OpeningBook, build, encode_move, decode_move, ENTRY
+
+GAMES='''[Event "1"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O 1-0
+
+[Event "2"]
+[Result "0-1"]
+
+1. e4 c5 0-1
+
+[Event "3"]
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 1/2-1/2
+
+[Event "4"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 1-0
+'''
+
+def position_after(*sans: str) -> ChessPosition:
+    Position=ChessPosition()
+    for san in sans:
+        Position.make_move(Notation.san_to_move(Position,san))
+    return Position
+
+@pytest.fixture
+def book(tmp_path):
+    pgn=tmp_path/"games.pgn"
+    pgn.write_text(GAMES)
+    path=str(tmp_path/"book.bin")
+    build([str(pgn)],path)
+    with OpeningBook(path) as opened:
+        yield opened
+
+def as_text(Position: ChessPosition, found: list) -> list[tuple[str,int]]:
+    return [(Notation.move_to_san(Position,move),weight) for move,weight in found]
+
+def test_weights_count_results(book):
+    #A win of the moving side counts twice, a draw once, a loss not at all
+    Position=ChessPosition()
+    assert as_text(Position,book.moves(Position))==[("e4",4),("d4",1)]
+
+def test_moves_only_played_by_the_loser_stay_playable(book):
+    Position=position_after("e4")
+    assert as_text(Position,book.moves(Position))==[("c5",2),("e5",1)]
+    assert {Notation.move_to_san(Position,book.choose(Position,random.Random(seed))) for seed in range(50)}=={"c5","e5"}
+
+def test_castling_round_trip(book):
+    Position=position_after("e4","e5","Nf3","Nc6","Bc4","Bc5")
+    move=book.choose(Position)
+    assert str(move)=="e1g1"
+    assert decode_move(Position,encode_move(move))==move
+
+def test_heaviest_move_without_rng(book):
+    assert str(book.choose(ChessPosition()))=="e2e4"
+
+def test_unknown_position(book):
+    assert book.choose(position_after("a4")) is None
+    assert book.moves(position_after("a4"))==[]
+
+def test_minimum_drops_rare_moves(tmp_path):
+    pgn=tmp_path/"games.pgn"
+    pgn.write_text(GAMES)
+    path=str(tmp_path/"book.bin")
+    build([str(pgn)],path,plies=2,minimum=2)
+    with OpeningBook(path) as opened:
+        assert as_text(ChessPosition(),opened.moves(ChessPosition()))==[("e4",4)]
+        assert len(opened)==2#1. e4 and 1... e5, seen twice each
+
+def test_rejects_files_of_wrong_size(tmp_path):
+    path=tmp_path/"broken.bin"
+    path.write_bytes(bytes(ENTRY.size+1))
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
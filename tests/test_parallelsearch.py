@@ -0,0 +1,39 @@
+import pytest
+from Chessposition import ChessPosition
+from Search import MATEVALUE
+import Parallelsearch
+
+FENS=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+      "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+      "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+      "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"]#Mate in one
+
+@pytest.fixture(scope="module",autouse=True)
+def shutdown_pool():
+    yield
+    Parallelsearch.shutdown()
+
+@pytest.mark.parametrize("fen",FENS)
+def test_parallel_matches_serial(fen):
+    Position=ChessPosition.from_fen(fen)
+    serial=Position.search(2)
+    parallel=Parallelsearch.parallel_search(Position,2,workers=2)
+    assert parallel.value==pytest.approx(serial.value)
+    assert parallel.move in Position.legalmovelist()
+    #Every root move is searched once
+    assert len(parallel.rootvalues)==len(Position.legalmovelist())
+    assert sum(stats.moves for stats in parallel.workerstats.values())==len(parallel.rootvalues)
+
+def test_parallel_finds_mate():
+    result=Parallelsearch.parallel_search(ChessPosition.from_fen(FENS[-1]),2,workers=2)
+    assert str(result.move)=="d1d8"
+    assert result.value==MATEVALUE-1
+
+def test_workers_see_the_game_history():
+    #After Nf3 Nf6 Ng1 Ng8 Nf3 Nf6, Ng1 repeats and is a draw
+    Position=ChessPosition()
+    for coordinates in ["g1f3","g8f6","f3g1","f6g8","g1f3","g8f6"]:
+        Position.make_move(next(move for move in Position.legal_moves() if str(move)==coordinates))
+    result=Parallelsearch.parallel_search(Position,1,workers=2)
+    values={str(move): value for move,value in result.rootvalues}
+    assert values["f3g1"]==0.0
@@ -0,0 +1,61 @@
+import gzip
+import pytest
+import PGNreader
+
+SCHOLARSMATE='''[Event "Casual"]
+[White "A \\"Ace\\" B"]
+[Black "C"]
+[Result "1-0"]
+
+1. e4 {King's pawn} e5 2. Qh5 (2. Nf3 Nc6 (2... d6) 3. Bb5) 2... Nc6 $2 3. Bc4 Nf6?? ; greed
+4. Qxf7# 1-0
+'''
+FROMFEN='''[FEN "4k3/8/8/8/8/8/1p5K/R7 b - - 0 1"]
+[Result "*"]
+
+1... bxa1=Q 2. Kg3 *
+'''
+ILLEGAL='''[Result "*"]
+
+1. e4 e5 2. Ke3 *
+'''
+
+def test_parse_game():
+    game=PGNreader.parse_game(SCHOLARSMATE)
+    assert game.error is None
+    assert game.headers["White"]=='A "Ace" B'
+    assert game.result=="1-0"
+    assert [str(move) for move in game.moves]==["e2e4","e7e5","d1h5","b8c6","f1c4","g8f6","h5f7"]
+    Position=game.final_position()
+    assert Position.is_check() and not Position.has_legal_move()
+
+def test_game_from_fen():
+    game=PGNreader.parse_game(FROMFEN)
+    assert game.error is None
+    assert [str(move) for move in game.moves][1]=="h2g3"
+    assert game.final_position().to_fen().split()[:5]==["4k3/8/8/8/8/6K1/8/q7","b","-","-","1"]
+
+def test_illegal_move_keeps_the_moves_before():
+    game=PGNreader.parse_game(ILLEGAL)
+    assert len(game.moves)==2
+    assert game.error.startswith("Move 2:")
+
+def test_replay_gives_position_before_every_move():
+    game=PGNreader.parse_game(SCHOLARSMATE)
+    replayed=[(Position.to_fen(),move) for Position,move in game.replay()]
+    assert replayed[0][0]=="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    assert [move for _,move in replayed]==game.moves
+
+def test_split_games():
+    texts=list(PGNreader.split_games((SCHOLARSMATE+"\n"+FROMFEN+"\n"+ILLEGAL).splitlines(keepends=True)))
+    assert len(texts)==3
+    assert texts[1].startswith("[FEN")
+
+@pytest.mark.parametrize("workers,batchsize",[(1,64),(2,1)])
+def test_read_games_in_order(tmp_path,workers,batchsize):
+    path=str(tmp_path/"games.pgn.gz")
+    with gzip.open(path,"wt") as file:
+        file.write("\n".join([SCHOLARSMATE,FROMFEN,ILLEGAL]*3))
+    games=list(PGNreader.read_games(path,workers,batchsize))
+    assert [game.result for game in games]==["1-0","*","*"]*3
+    assert [len(game.moves) for game in games]==[7,2,2]*3
@@ -0,0 +1,43 @@
+import random
+import pytest
+import Bitboards
+from Chessposition import ChessPosition
+import Playouts
+
+MATED="R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1"
+STALEMATE="7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"
+
+@pytest.mark.parametrize("workers",[1,2])
+def test_same_seed_same_result(workers):
+    Position=ChessPosition()
+    first=Playouts.playouts(Position,20,workers,seed=7)
+    second=Playouts.playouts(Position,20,workers,seed=7)
+    assert (first.mean,first.variance,first.plies)==(second.mean,second.variance,second.plies)
+    assert first.games==20
+
+def test_different_seeds_play_different_games():
+    Position=ChessPosition()
+    assert Playouts.playouts(Position,20,seed=1).plies!=Playouts.playouts(Position,20,seed=2).plies
+
+#Bare kings are noticed after the first move of every game
+@pytest.mark.parametrize("fen,mean,plies",[(MATED,1.0,0),(STALEMATE,0.0,0),("7k/8/8/8/8/8/8/K7 w - - 0 1",0.0,5)])
+def test_finished_games(fen,mean,plies):
+    result=Playouts.playouts(ChessPosition.from_fen(fen),5,seed=0)
+    assert (result.mean,result.variance,result.plies)==(mean,0.0,plies)
+
+def test_board_stays_consistent():
+    #The bitboards and the list of pieces on squares describe the same position after every game
+    board=Playouts.PlayoutBoard.from_position(ChessPosition())
+    rng=random.Random(3)
+    for _ in range(20):
+        board.reset()
+        result,plies=board.playout(rng,200)
+        assert result in (-1,0,1) and 0<plies<=200
+        for sq in range(64):
+            owners=[index for index,bitboard in enumerate(board.Pieceboards) if bitboard>>sq&1]
+            assert owners==([] if board.pieces[sq]==Playouts.EMPTY else [board.pieces[sq]])
+        assert Bitboards.occupancy(board.Pieceboards,True)&Bitboards.occupancy(board.Pieceboards,False)==0
+
+def test_needs_a_game():
+    with pytest.raises(ValueError):
+        Playouts.playouts(ChessPosition(),0)
@@ -0,0 +1,49 @@
+import random
+import pytest
+from Chessposition import ChessPosition
+from Search import MATEVALUE
+
+FENS=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+      "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+      "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+      "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+      "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"]#Mate in one
+
+#Minimax without pruning in quiescence takes minutes on the crowded middlegame, so that one is only searched without it
+@pytest.mark.parametrize("fen,quiescence",[(fen,quiescence) for fen in FENS for quiescence in (False,True) if not (quiescence and fen==FENS[2])])
+@pytest.mark.parametrize("depth0method",[ChessPosition.eval_by_material,ChessPosition.eval_without_depth])
+def test_alphabeta_matches_minimax(fen,quiescence,depth0method):
+    Position=ChessPosition.from_fen(fen)
+    minimax=Position.search(2,depth0method,alphabeta=False,quiescence=quiescence)
+    alphabeta=Position.search(2,depth0method,alphabeta=True,quiescence=quiescence)
+    assert alphabeta.value==pytest.approx(minimax.value)
+    assert alphabeta.nodes<=minimax.nodes
+
+def test_finds_mate_in_one():
+    result=ChessPosition.from_fen(FENS[-1]).bestmove(2)
+    assert str(result.move)=="d1d8"
+    assert result.value==MATEVALUE-1
+
+@pytest.mark.parametrize("fen",["8/8/8/8/6K1/8/Q7/5k2 w - - 0 1","8/8/8/k1K4Q/8/8/8/8 w - - 0 1","8/8/8/1Q6/4K2k/8/8/8 w - - 0 1"])
+def test_prefers_the_quickest_mate(fen):
+    #Mates in two where slower mates are found at the same depth as well
+    Position=ChessPosition.from_fen(fen)
+    result=Position.bestmove(4)
+    assert result.value==MATEVALUE-3
+    Position.make_move(result.move)
+    for reply in Position.legalmovelist():
+        undo=Position.make_move(reply)
+        assert Position.bestmove(2).value==MATEVALUE-1
+        Position.unmake_move(undo)
+
+def test_incremental_evaluation_matches_fresh_one():
+    rng=random.Random(0)
+    Position=ChessPosition()
+    for _ in range(120):
+        move=Position.random_legal_move(rng)
+        if move is None:
+            break
+        Position.make_move(move)
+        Fresh=ChessPosition.from_fen(Position.to_fen())
+        assert Position.Material==pytest.approx(Fresh.Material)
+        assert Position.Placement==pytest.approx(Fresh.Placement)
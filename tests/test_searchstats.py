@@ -0,0 +1,76 @@
+import json
+import pytest
+import Bitboards
+from Chessposition import ChessPosition
+from Searchstats import SearchStats, InstrumentedSearch
+
+FENS=["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+      "4r2k/8/8/8/8/8/P3R3/4K3 w - - 0 1",#Pinned rook
+      "4k3/8/8/8/1b6/8/3N4/4K3 w - - 0 1"]#Pinned knight
+
+def squarepairs(moves: list) -> set[tuple[int,int]]:
+    """Returns: The (startsquare, endsquare) pairs of moves, so a promotion counts once"""
+    return {(move.startrow*8+move.startcol,move.endrow*8+move.endcol) for move in moves}
+
+class CheckedSearch(InstrumentedSearch):
+    """Counts the candidates every generation should reject, independently of the rejected list"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args,**kwargs)
+        self.expected=0
+
+    def generate_moves(self, Position) -> list:
+        moves=super().generate_moves(Position)
+        if not Position.only_kings_on_board():
+            #Castling out of check isn't even a candidate
+            candidates=Bitboards.pseudolegal_moves(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile,Position.Castlingrights,
+                                                   include_castling=not Position.is_check())
+            self.expected+=len(candidates)-len(squarepairs(moves))
+        return moves
+
+    def generate_noisy_moves(self, Position) -> list:
+        moves=super().generate_noisy_moves(Position)
+        if not Position.only_kings_on_board():
+            candidates=Bitboards.noisy_moves(Position.Pieceboards,Position.whitesmove,Position.enpassantablefile)
+            self.expected+=len(candidates)-len(squarepairs(moves))
+        return moves
+
+@pytest.mark.parametrize("fen",FENS)
+def test_rejections_are_counted(fen):
+    stats=SearchStats()
+    search=CheckedSearch(ChessPosition.eval_without_depth,stats=stats)
+    search.run(ChessPosition.from_fen(fen),2)
+    assert stats.legalityrejections==search.expected
+    if fen!=FENS[0]:
+        assert stats.legalityrejections>0
+
+@pytest.mark.parametrize("fen",FENS)
+def test_instrumented_search_searches_the_same_tree(fen):
+    Position=ChessPosition.from_fen(fen)
+    plain=Position.search(2,ChessPosition.eval_without_depth)
+    stats=SearchStats()
+    instrumented=Position.search(2,ChessPosition.eval_without_depth,stats=stats)
+    assert (instrumented.value,instrumented.move,instrumented.nodes)==(plain.value,plain.move,plain.nodes)
+    assert stats.nodes==plain.nodes and stats.searches==1
+    assert stats.quiescencenodes<=stats.nodes
+    assert stats.standpatcutoffs+stats.quiescencecutoffs<=stats.quiescencenodes
+    assert stats.cutoffs>0 and stats.tthits<=stats.ttprobes
+    assert stats.movesgenerated>0 and stats.leafevaluations>0
+
+def test_known_values_are_counted():
+    Position=ChessPosition()
+    for coordinates in ["g1f3","g8f6","f3g1","f6g8","g1f3","g8f6"]:
+        Position.make_move(next(move for move in Position.legal_moves() if str(move)==coordinates))
+    stats=SearchStats()
+    Position.search(1,stats=stats)
+    assert stats.knownvalues>=1#Ng1 repeats
+
+def test_report_and_trace(tmp_path):
+    stats=SearchStats(trace=True)
+    InstrumentedSearch(ChessPosition.eval_without_depth,stats=stats).iterative_deepening(ChessPosition.from_fen(FENS[0]),maxdepth=2)
+    report=stats.report()
+    assert "legality rejections" in report and "movegen" in report
+    path=tmp_path/"trace.json"
+    stats.write_trace(str(path))
+    events=json.loads(path.read_text())["traceEvents"]
+    assert {"search","depth 1","depth 2","movegen"}<={event["name"] for event in events}
+    assert events[-1]["args"]["nodes"]==stats.nodes
@@ -0,0 +1,68 @@
+import os
+import random
+import numpy as np
+import pytest
+import Batchevaluation
+from Chessposition import ChessPosition
+from Search import MATEVALUE
+import Selfplay
+
+def records(count: int, start: int=0) -> np.ndarray:
+    array=np.zeros(count,dtype=Selfplay.RECORD)
+    array["ply"]=np.arange(start,start+count)
+    array["score"]=np.linspace(-1,1,count)
+    array["result"]=1
+    return array
+
+def test_shards_round_trip(tmp_path):
+    directory=str(tmp_path)
+    written=records(25)
+    with Selfplay.ShardWriter(directory,10) as writer:
+        writer.write(written[:13])
+        writer.write(written[13:])
+    assert Selfplay.shard_numbers(directory)==[0,1,2]
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+    reader=Selfplay.ShardReader(directory)
+    assert len(reader)==25
+    assert [len(shard) for shard in reader.shards]==[10,10,5]
+    assert np.array_equal(reader.records(np.arange(25)),written)
+    assert np.array_equal(reader.records([24,3,10]),written[[24,3,10]])
+
+def test_numbering_resumes_after_existing_shards(tmp_path):
+    directory=str(tmp_path)
+    with Selfplay.ShardWriter(directory,10) as writer:
+        writer.write(records(20))
+    open(os.path.join(directory,"shard_000007.npy.tmp"),"w").close()#Left behind by an interrupted run
+    with Selfplay.ShardWriter(directory,10) as writer:
+        assert writer.number==2
+        writer.write(records(4,20))
+    assert Selfplay.shard_numbers(directory)==[0,1,2]
+    reader=Selfplay.ShardReader(directory)
+    assert reader.records(np.arange(24))["ply"].tolist()==list(range(24))
+
+def test_empty_writer_leaves_no_shard(tmp_path):
+    with Selfplay.ShardWriter(str(tmp_path),10):
+        pass
+    assert os.listdir(tmp_path)==[]
+
+def test_play_game_records_every_position():
+    game=Selfplay.play_game(random.Random(0),"random",maxplies=40)
+    assert game["ply"].tolist()==list(range(len(game)))
+    assert len(set(game["result"].tolist()))==1
+    first=game[0]
+    assert first["whitesmove"] and first["castling"]==15 and first["enpassant"]==-1
+    assert first["pieceboards"].tolist()==ChessPosition().Pieceboards
+    assert np.array_equal(Selfplay.planes(game[:1]),Batchevaluation.encode([ChessPosition()]))
+
+def test_mate_scores_are_recorded_with_their_distance():
+    Position=ChessPosition.from_fen("6k1/5ppp/8/8/8/8/8/3R2K1 w - - 0 1")
+    score=Position.search(2).value
+    record=np.array([Selfplay._record(Position,0,score)],dtype=Selfplay.RECORD)
+    assert record["score"][0]==MATEVALUE-1
+
+def test_generate(tmp_path):
+    written=Selfplay.generate(str(tmp_path),3,workers=1,policy="random",maxplies=20,shardsize=25,seed=1,log=lambda *args: None)
+    reader=Selfplay.ShardReader(str(tmp_path))
+    assert len(reader)==written>0
+    with pytest.raises(ValueError):
+        Selfplay.generate(str(tmp_path),1,policy="greedy")
@@ -0,0 +1,87 @@
+import random
+import pytest
+from Chessposition import ChessPosition
+import Tablebase
+
+#Longest mates with best defence, in plies from the side that gets mated to move
+LONGESTMATES={"KQvK": 20,"KRvK": 32}
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    directory=str(tmp_path_factory.mktemp("tablebases"))
+    for material in LONGESTMATES:
+        Tablebase.generate(material,directory,workers=1,log=lambda *args: None)
+    return Tablebase.Tablebase(directory)
+
+@pytest.mark.parametrize("material,plies",LONGESTMATES.items())
+def test_longest_mate(tablebase,material,plies):
+    with open(tablebase.path(material),"rb") as file:
+        table=file.read()
+    assert max(entry for entry in table if entry not in (Tablebase.DRAW,Tablebase.INVALID))-1==plies
+
+@pytest.mark.parametrize("fen,expected",[
+    ("k7/8/1K6/8/8/8/7Q/8 w - - 0 1",(1,1)),#Qh8#
+    ("k6Q/8/1K6/8/8/8/8/8 b - - 0 1",(-1,0)),#Mated
+    ("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1",(0,0)),#Stalemate
+    ("8/8/8/8/8/3Qk3/8/K7 b - - 0 1",(0,0)),#The queen hangs
+    ("k7/8/1K6/8/8/8/8/7R w - - 0 1",(1,1)),#Rh8#
+    ("K7/8/1k6/8/8/8/8/7r b - - 0 1",(1,1))])#The same with the colours swapped
+def test_probe(tablebase,fen,expected):
+    assert tablebase.probe(ChessPosition.from_fen(fen))==expected
+
+def test_not_covered(tablebase):
+    assert tablebase.probe(ChessPosition()) is None
+    assert tablebase.probe(ChessPosition.from_fen("k7/8/1K6/8/8/8/8/6BB w - - 0 1")) is None
+
+def random_position(rng: random.Random, pieces: str) -> ChessPosition:
+    while True:
+        squares=rng.sample(range(64),len(pieces))
+        rows=[["1"]*8 for _ in range(8)]#Runs of 1s are valid FEN
+        for piece,sq in zip(pieces,squares):
+            rows[7-sq//8][sq%8]=piece
+        Position=ChessPosition.from_fen(f"{'/'.join(''.join(row) for row in rows)} {rng.choice('wb')} - - 0 1")
+        #The side not to move mustn't be in check
+        Position.whitesmove=not Position.whitesmove
+        legal=not Position.is_check()
+        Position.whitesmove=not Position.whitesmove
+        if legal:
+            return Position
+
+@pytest.mark.parametrize("pieces",["KQk","KRk"])
+def test_distance_to_mate_is_consistent_with_children(tablebase,pieces):
+    #Won in n: some move leads to a position lost in n-1. Lost in n: every move leads to a win, the slowest in n-1
+    rng=random.Random(0)
+    for _ in range(300):
+        Position=random_position(rng,pieces)
+        result,plies=tablebase.probe(Position)
+        children=[]
+        for move in Position.legalmovelist():
+            undo=Position.make_move(move)
+            children.append(tablebase.probe(Position) or (0,0))#A captured rook or queen leaves a draw
+            Position.unmake_move(undo)
+        if not children:
+            assert (result,plies)==((-1,0) if Position.is_check() else (0,0))
+        elif result==1:
+            assert plies==1+min(childplies for childresult,childplies in children if childresult==-1)
+        elif result==-1:
+            assert all(childresult==1 for childresult,_ in children)
+            assert plies==1+max(childplies for _,childplies in children)
+        else:
+            assert not any(childresult==-1 for childresult,_ in children)
+
+def test_best_move_mates(tablebase):
+    Position=ChessPosition.from_fen("k7/8/1K6/8/8/8/8/7R w - - 0 1")
+    Position.make_move(tablebase.best_move(Position))
+    assert Position.is_check() and not Position.has_legal_move()
+
+@pytest.mark.parametrize("pieces",["KQk","KRk"])
+def test_search_counts_tablebase_mates_from_the_root(tablebase,pieces):
+    rng=random.Random(1)
+    for _ in range(20):
+        Position=random_position(rng,pieces)
+        result,plies=tablebase.probe(Position)
+        if result==0 or not Position.has_legal_move():
+            continue
+        sign=1 if Position.whitesmove else -1
+        assert sign*Position.search(1,tablebase=tablebase).value==result*(Tablebase.MATEVALUE-plies)
+        assert sign*Position.bestmove(1,tablebase=tablebase).value==result*(Tablebase.MATEVALUE-plies)
@@ -0,0 +1,65 @@
+import math
+import pytest
+from Chessposition import ChessPosition
+from Search import Search, MATEVALUE, MAXDEPTH
+import UCI
+
+@pytest.mark.parametrize("value,whitesmove,expected",[
+    (0.25,True,"cp 25"),
+    (0.25,False,"cp -25"),
+    (MATEVALUE-1,True,"mate 1"),
+    (MATEVALUE-3,True,"mate 2"),
+    (-(MATEVALUE-2),True,"mate -1"),
+    (-(MATEVALUE-3),False,"mate 2"),#Black mates in two
+    (MATEVALUE-4,False,"mate -2")])
+def test_score(value,whitesmove,expected):
+    assert UCI.score(value,whitesmove)==expected
+
+MATEINTWO="8/8/8/8/6K1/8/Q7/5k2 w - - 0 1"
+
+def engine_with_output() -> tuple[UCI.UCIEngine,list[str]]:
+    lines=[]
+    return UCI.UCIEngine(lines.append),lines
+
+def bestmove(engine: UCI.UCIEngine, lines: list[str], timeout: float=20) -> str:
+    engine.thread.join(timeout)
+    assert not engine.thread.is_alive()
+    return next(line for line in lines if line.startswith("bestmove"))
+
+def test_go_depth():
+    engine,lines=engine_with_output()
+    engine.handle("position startpos moves e2e4")
+    engine.handle("go depth 2")
+    assert bestmove(engine,lines).split()[1] in {str(move) for move in engine.position.legal_moves()}
+    assert any(line.startswith("info depth 2") for line in lines)
+
+def test_go_mate():
+    engine,lines=engine_with_output()
+    engine.handle(f"position fen {MATEINTWO}")
+    engine.handle("go mate 2")
+    assert bestmove(engine,lines).split()[1]=="g4f3"
+    assert "score mate 2" in [line for line in lines if line.startswith("info")][-1]
+
+def test_ponderhit_before_the_search_starts():
+    #The search thread must keep the deadline of a ponderhit that comes before iterative_deepening even started
+    engine,lines=engine_with_output()
+    engine.handle("position startpos")
+    engine.handle("go ponder movetime 200")
+    engine.handle("ponderhit")
+    assert bestmove(engine,lines)
+
+def test_search_keeps_a_deadline_set_before_it_starts():
+    search=Search(ChessPosition.eval_without_depth)
+    search.set_time(100)
+    result=search.iterative_deepening(ChessPosition(),maxdepth=MAXDEPTH)
+    assert result.move is not None and result.depth<MAXDEPTH
+    assert search.deadline==math.inf and not search.deadlineset
+
+def test_pondering_waits_for_ponderhit():
+    engine,lines=engine_with_output()
+    engine.handle(f"position fen {MATEINTWO}")
+    engine.handle("go ponder wtime 1000 btime 1000")
+    engine.thread.join(1)
+    assert not any(line.startswith("bestmove") for line in lines)
+    engine.handle("ponderhit")
+    assert bestmove(engine,lines).split()[1]=="g4f3"